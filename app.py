@@ -1,9 +1,28 @@
 import streamlit as st
+from startup_timing import finish_run, inject_css, mark, start_run_timer
+
+# 启动计时从这里开始（包括下面各模块的导入时间）
+run_timer = start_run_timer('app.py')
+
 import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
-import numpy as np
+from session_cache import (
+    get_dataset_artifact, get_student_section, lazy_section, prefetch_student_sections
+)
+from cohort_filters import FilterEngine, render_filter_builder
+from student_navigation import get_filtered_positions, neighbor_positions, render_student_selector
+from data_quality import get_score_anomalies, profile_dataset, render_data_profile, render_score_anomalies
+from canonical_codes import build_canonical_codes, canonical_filter_columns
+from cohort_export import render_export_panel
+from data_ingest import (
+    UPLOAD_TYPES, render_ingest_benchmark, render_ingest_status, render_stored_roster_loader, start_ingest, wait_for_ingest
+)
+from dataset_pipeline import render_pipeline_status, wait_for_pipeline
+from roster_store import current_roster_upload, load_roster_student, render_student_history, search_current_roster
+from counselor_scope import build_counselor_partitions, render_counselor_scope, restrict_to_scope
+from student_search import StudentSearchIndex
+from display_values import (
+    CLASS_DISPLAY_COLUMNS, first_display, format_display_value, get_display_frame, get_student_display
+)
 
 # 页面配置
 st.set_page_config(
@@ -12,9 +31,11 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="collapsed"
 )
+# 记录主页文件名，其他页面（如奖助学金评定）用 st.switch_page 跳回学生详情
+st.session_state.home_page = 'app.py'
 
-# 自定义CSS样式
-st.markdown("""
+# 自定义CSS样式（压缩后的文本按进程缓存）
+inject_css("""
 <style>
 .main-header {
     background: linear-gradient(90deg, #3b82f6 0%, #8b5cf6 100%);
@@ -145,20 +166,147 @@ div, section {
     /* box-shadow: none !important; */ /* 暂时注释掉，允许metric-card有阴影 */
 }
 </style>
-""", unsafe_allow_html=True)
+""")
 
 # 工具函数：处理空值显示
 def format_value(value):
-    """将空值、NaN、None等转换为'无'"""
-    if pd.isna(value) or value is None or str(value).lower() in ['nan', 'none', '']:
-        return '无'
-    return str(value)
+    """将空值、NaN、None等转换为'无'（整列的显示文字见 display_values.build_display_frame）"""
+    return format_display_value(value)
+
+def metric_card_html(label, value):
+    """生成雷达图下方的单个得分卡片"""
+    return f"""
+    <div class="metric-card">
+        <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">{label}</div>
+        <div style="color: #3b82f6; font-weight: bold; font-size: 1.2rem;">{format_value(value)}</div>
+    </div>
+    """
+
+def build_radar_section(student_data):
+    """计算综合素质雷达图及两列得分卡片（仅在板块展开时调用）"""
+    def normalize_value(value, min_val, max_val):
+        if pd.isna(value) or value is None:
+            return 0
+        try:
+            float_value = float(value)
+            return max(0, min(100, ((float_value - min_val) / (max_val - min_val)) * 100))
+        except (ValueError, TypeError):
+            return 0
+    
+    moral = student_data.get('第一学年德育', student_data.get('德育'))
+    intellect = student_data.get('第一学年智育', student_data.get('智育'))
+    physical = student_data.get('第一学年体测成绩', student_data.get('体测成绩'))
+    physical_rating = student_data.get('第一学年体测评级', student_data.get('体测等级'))
+    bonus = student_data.get('第一学年附加分', student_data.get('附加分', student_data.get('23-24附加分')))
+    total = student_data.get('第一学年综测总分', student_data.get('第一学年总分', student_data.get('测评总分')))
+    
+    radar_data = [
+        ("第一学年德育", normalize_value(moral, 12, 15)),
+        ("第一学年智育", normalize_value(intellect, 15, 80)),
+        ("第一学年体测", normalize_value(physical, 15, 110)),
+        ("第一学年附加分", normalize_value(bonus, -1, 6)),
+        ("第一学年总分", normalize_value(total, 20, 100))
+    ]
+    
+    categories = [item[0] for item in radar_data]
+    values = [item[1] for item in radar_data]
+    
+    # 创建雷达图（plotly 在第一次画图时才导入）
+    import plotly.graph_objects as go
+    fig = go.Figure()
+    
+    fig.add_trace(go.Scatterpolar(
+        r=values,
+        theta=categories,
+        fill='toself',
+        name='综合评分',
+        line_color='#3b82f6',
+        fillcolor='rgba(59, 130, 246, 0.3)'
+    ))
+    
+    fig.update_layout(
+        polar=dict(
+            radialaxis=dict(
+                visible=True,
+                range=[0, 100],
+                gridcolor='#e5e7eb'
+            ),
+            angularaxis=dict(
+                gridcolor='#e5e7eb'
+            )
+        ),
+        showlegend=False,
+        height=400,
+        margin=dict(t=50, b=50, l=50, r=50)
+    )
+    
+    # 第一列：德育、智育、附加分；第二列：体测成绩、体测等级、综测总分
+    metric_columns = (
+        [metric_card_html("第一学年德育", moral),
+         metric_card_html("第一学年智育", intellect),
+         metric_card_html("第一学年附加分", bonus)],
+        [metric_card_html("第一学年体测成绩", physical),
+         metric_card_html("第一学年体测等级", physical_rating),
+         metric_card_html("第一学年综测总分", total)]
+    )
+    return fig, metric_columns
+
+def build_gpa_section(student_data):
+    """计算学期绩点折线图（仅在板块展开时调用），无绩点数据时返回 (None, [])"""
+    gpa_data = []
+    for semester in ['第一学期绩点', '第二学期绩点', '第三学期绩点']:
+        value = student_data.get(semester)
+        if pd.notna(value) and value is not None:
+            try:
+                float_value = float(value)
+                gpa_data.append({
+                    'semester': semester.replace('绩点', ''),
+                    'gpa': float_value
+                })
+            except (ValueError, TypeError):
+                continue
+    
+    if not gpa_data:
+        return None, []
+    
+    semesters = [item['semester'] for item in gpa_data]
+    gpas = [item['gpa'] for item in gpa_data]
+    
+    # 创建折线图
+    import plotly.graph_objects as go
+    fig = go.Figure()
+    
+    fig.add_trace(go.Scatter(
+        x=semesters,
+        y=gpas,
+        mode='lines+markers',
+        name='绩点',
+        line=dict(color='#8b5cf6', width=3),
+        marker=dict(size=8, color='#8b5cf6')
+    ))
+    
+    fig.update_layout(
+        xaxis_title="学期",
+        yaxis_title="绩点",
+        yaxis=dict(range=[0, 4]),
+        height=300,
+        margin=dict(t=30, b=30, l=30, r=30),
+        showlegend=False
+    )
+    return fig, gpa_data
+
+def build_student_sections(student_data, sections):
+    """为一名学生计算指定的图表板块（在后台预取线程中执行，不调用 st.* 接口）"""
+    builders = {'radar': build_radar_section, 'gpa': build_gpa_section}
+    return {name: builders[name](student_data) for name in sections}
 
 # 初始化session state
 if 'students_data' not in st.session_state:
     st.session_state.students_data = None
 if 'selected_student_index' not in st.session_state:
     st.session_state.selected_student_index = 0
+if 'upload_error' not in st.session_state:
+    st.session_state.upload_error = None
 
 # 主标题
 st.markdown("""
@@ -188,47 +336,65 @@ for i in range(0, len(required_columns_list_for_info), columns_per_row):
 
 st.info(info_message)
 
-uploaded_file = st.file_uploader(
-    "选择Excel文件上传学生数据",
-    type=['xlsx', 'xls'],
-    help="支持Excel格式文件。上传前请参考上方列表确保表头正确。" # 更新help文本
-)
+# 上传文件的表头校验和预计算（在后台读取线程中执行，不能调用 st.* 接口）
+def prepare_uploaded_dataset(df):
+    # 定义必需的表头列表
+    required_columns = [
+        "序号", "学号", "姓名", "原班级", "新班级", "原专业", "分流专业", "辅导员", "政治面貌",
+        "入团申请书编号", "是否递交入党申请书", "是否积极分子", "民族", "性别", "是否过四级", "是否过六级",
+        "第一学期绩点", "第二学期绩点", "第三学期绩点", "第一学年德育", "第一学年智育", "第一学年附加分",
+        "第一学年体测成绩", "第一学年体测评级", "第一学年综测总分", "心理评测等级", "第一学年困难等级",
+        "第二学年困难等级", "有无需要学院协助解决的困难", "有何困难", "去年困难生", "今年困难生",
+        "挂科", "所获学分", "奖项", "人民奖学金", "助学奖学金", "助学金"
+    ]
 
-if uploaded_file is not None:
-    try:
-        # 读取Excel文件
-        df = pd.read_excel(uploaded_file)
-
-        # 在这里插入表头检查逻辑
-        # 定义必需的表头列表
-        required_columns = [
-            "序号", "学号", "姓名", "原班级", "新班级", "原专业", "分流专业", "辅导员", "政治面貌",
-            "入团申请书编号", "是否递交入党申请书", "是否积极分子", "民族", "性别", "是否过四级", "是否过六级",
-            "第一学期绩点", "第二学期绩点", "第三学期绩点", "第一学年德育", "第一学年智育", "第一学年附加分",
-            "第一学年体测成绩", "第一学年体测评级", "第一学年综测总分", "心理评测等级", "第一学年困难等级",
-            "第二学年困难等级", "有无需要学院协助解决的困难", "有何困难", "去年困难生", "今年困难生",
-            "挂科", "所获学分", "奖项", "人民奖学金", "助学奖学金", "助学金"
-        ]
+    # 检查缺失字段
+    missing_columns = [col for col in required_columns if col not in df.columns]
 
-        # 检查缺失字段
-        missing_columns = [col for col in required_columns if col not in df.columns]
+    # 如果有缺失，报错并阻止后续流程
+    if missing_columns:
+        return f"❌ Excel文件校验失败：缺少以下必需的列名，请检查文件后重新上传：\n\n{', '.join(missing_columns)}", {}
+
+    # 按辅导员把学生行号分组；数据质量检查、标准代码、搜索索引等在切换数据集后由预计算流水线在后台计算
+    return None, {
+        'counselor_partitions': build_counselor_partitions(df)
+    }
 
-        # 如果有缺失，报错并阻止后续流程
-        if missing_columns:
-            st.error(f"❌ Excel文件校验失败：缺少以下必需的列名，请检查文件后重新上传：\n\n{', '.join(missing_columns)}")
-            st.session_state.students_data = None # 清空数据，阻止后续执行
-            # 使用 st.stop() 会完全停止脚本，如果希望只是阻止后续UI渲染，可以不加
-            # st.stop() 
-        else:
-            # 如果表头检查通过，才将数据存入 session_state
-            st.session_state.students_data = df
-            st.success(f"✅ 成功加载 {len(df)} 名学生的数据，表头校验通过。")
 
-    except Exception as e:
-        st.error(f"❌ 文件读取或处理失败: {str(e)}")
-        st.session_state.students_data = None
+uploaded_file = st.file_uploader(
+    "选择Excel/CSV/Parquet文件上传学生数据",
+    type=UPLOAD_TYPES,
+    help="支持Excel、CSV（UTF-8或GBK编码）和Parquet格式文件。上传前请参考上方列表确保表头正确。" # 更新help文本
+)
+
+ingest_placeholder = None
+pipeline_placeholder = None
+if uploaded_file is not None:
+    # 同一个文件只在首次上传时读取；读取、校验和质量检查在后台线程中进行，页面保持可操作，
+    # 表头检查通过后才一次性切换到新数据集
+    if st.session_state.get('uploaded_file_id') != uploaded_file.file_id:
+        st.session_state.uploaded_file_id = uploaded_file.file_id
+        start_ingest(uploaded_file, prepare_uploaded_dataset)
+    ingest_placeholder = render_ingest_status("❌ 文件读取或处理失败: ")
+
+    if st.session_state.upload_error:
+        st.error(st.session_state.upload_error)
+    elif st.session_state.students_data is not None:
+        st.success(f"✅ 成功加载 {len(st.session_state.students_data)} 名学生的数据，表头校验通过。")
+        render_ingest_benchmark(uploaded_file)
+        pipeline_placeholder = render_pipeline_status()
+        with st.expander("📋 数据质量报告", expanded=False):
+            render_data_profile(get_dataset_artifact('data_profile', lambda: profile_dataset(st.session_state.students_data)))
+            render_score_anomalies(get_score_anomalies(st.session_state.students_data))
+elif st.session_state.students_data is None:
+    # 没有上传文件时可以直接读取本地数据库中上次保存的数据
+    render_stored_roster_loader(prepare_uploaded_dataset)
+    if st.session_state.upload_error:
+        st.error(st.session_state.upload_error)
 
 st.markdown('</div>', unsafe_allow_html=True)
+# 服务端脚本执行到上传区域结束的时间，不含网络传输和浏览器渲染
+mark(run_timer, '首屏脚本')
 
 # 如果没有数据，显示欢迎界面
 if st.session_state.students_data is None:
@@ -249,65 +415,78 @@ else:
     col1, col2, col3 = st.columns([3, 1, 1])
     
     with col1:
+        # 辅导员范围：搜索、筛选和统计只在所选辅导员的学生中进行
+        scope_positions = render_counselor_scope(df)
+        roster_upload = current_roster_upload()
+        
         # 搜索功能
-        search_term = st.text_input("🔍 搜索学生", placeholder="输入姓名、学号或班级进行搜索...")
-        
-        # 过滤学生数据
-        if search_term:
-            mask = (
-                df['姓名'].astype(str).str.contains(search_term, case=False, na=False) |
-                df['学号'].astype(str).str.contains(search_term, case=False, na=False) |
-                df.apply(lambda row: any(
-                    str(val).lower().find(search_term.lower()) != -1
-                    for col in ['班级', '班级_基本信息', '班 级', '班 级_基本信息'] 
-                    if col in df.columns 
-                    for val in [row.get(col, '')] 
-                    if pd.notna(val)
-                ), axis=1)
-            )
-            filtered_df = df[mask]
-        else:
-            filtered_df = df
+        search_term = st.text_input("🔍 搜索学生", placeholder="输入姓名、学号、班级或拼音（如 zs）进行搜索...")
+        
+        # 组合筛选条件（编译为一个布尔掩码，与搜索条件同时生效）
+        canonical_codes = get_dataset_artifact('canonical_codes', lambda: build_canonical_codes(df))
+        filter_engine = get_dataset_artifact(
+            'filter_engine', lambda: FilterEngine(df, canonical_filter_columns(canonical_codes))
+        )
+        filter_mask = render_filter_builder(filter_engine)
+        
+        # 过滤学生数据：只在搜索词或筛选条件变化时重新计算，结果为整表中的行号数组
+        def compute_filtered_positions():
+            if not search_term:
+                return scope_positions[filter_mask[scope_positions]]
+            # 数据已保存到本地数据库时，先按索引查找学号、姓名、班级、分流专业或辅导员以搜索词开头的学生；
+            # 没有前缀匹配时在数据集的搜索索引中查找（子串、拼音、错别字），结果按匹配程度排序，
+            # 搜索结果按搜索词缓存，逐字输入时只在上一个搜索词的结果中继续筛选；最后限定在辅导员范围内
+            positions = search_current_roster(roster_upload, search_term)
+            if positions is None or not len(positions):
+                search_index = get_dataset_artifact('search_index', lambda: StudentSearchIndex(df))
+                positions = search_index.search(search_term)
+            positions = restrict_to_scope(positions, scope_positions)
+            return positions[filter_mask[positions]]
+        
+        filter_signature = (st.session_state.counselor_scope, search_term, tuple(st.session_state.filter_conditions))
+        filtered_positions = get_filtered_positions(filter_signature, compute_filtered_positions)
     
     with col2:
-        st.metric("总学生数", len(df))
+        st.metric("总学生数", len(scope_positions))
     
     with col3:
-        st.metric("筛选结果", len(filtered_df))
+        st.metric("筛选结果", len(filtered_positions))
     
-    if len(filtered_df) > 0:
-        # 学生选择下拉框
-        student_options = []
-        for idx, row in filtered_df.iterrows():
-            # 获取班级值，尝试多种可能的列名
-            班级值 = ''
-            for col in ['班级', '班级_基本信息', '班 级', '班 级_基本信息']:
-                if col in filtered_df.columns and pd.notna(row.get(col)):
-                    班级值 = row.get(col)
-                    break
-                    
-            student_options.append(f"{format_value(row['姓名'])} - {format_value(row['学号'])} ")
-        
-        selected_student = st.selectbox(
-            "选择学生",
-            options=range(len(student_options)),
-            format_func=lambda x: student_options[x],
-            key="student_selector"
+    if len(filtered_positions) > 0:
+        # 导出当前筛选结果（含派生指标），文件在后台线程中生成
+        render_export_panel(df, filtered_positions)
+        
+        # 学生选择下拉框（选项文本按数据集一次性生成）
+        display_frame = get_display_frame(df)
+        student_labels = get_dataset_artifact(
+            'student_labels',
+            lambda: (display_frame['姓名'] + ' - ' + display_frame['学号'] + ' ').to_numpy()
         )
-        
-        # 导航按钮
-        col1, col2, col3 = st.columns([1, 1, 1])
-        with col1:
-            if st.button("⬅️ 上一个", disabled=selected_student == 0):
-                selected_student = max(0, selected_student - 1)
-        with col3:
-            if st.button("下一个 ➡️", disabled=selected_student >= len(student_options) - 1):
-                selected_student = min(len(student_options) - 1, selected_student + 1)
+        selected_student = render_student_selector(student_labels, filtered_positions)
+        mark(run_timer, '学生选择')
         
         st.markdown('</div>', unsafe_allow_html=True)
         
         # 获取选中的学生数据
-        student_data = filtered_df.iloc[selected_student]
+        student_position = int(filtered_positions[selected_student])
+        # 数据已保存到本地数据库时按学号做索引点查询
+        student_data = load_roster_student(roster_upload, df, student_position)
+        # 各字段的显示文字按列预先生成，这里只按行号取出
+        display = get_student_display(df, student_position)
+        # 当前学生的缓存键（数据集内的行标签 + 学号）
+        student_key = (student_data.name, display.get('学号', '无'))
+        
+        # 后台预取相邻学生已展开的图表板块，翻页时直接读取缓存
+        prefetch_sections = [name for name, toggle_key in [('radar', 'show_radar_section'), ('gpa', 'show_gpa_section')]
+                             if st.session_state.get(toggle_key)]
+        if prefetch_sections:
+            prefetch_jobs = []
+            for position in neighbor_positions(filtered_positions, selected_student):
+                neighbor_key = (df.index[position], get_student_display(df, position).get('学号', '无'))
+                prefetch_jobs.append((neighbor_key, prefetch_sections, lambda position=position: build_student_sections(
+                    load_roster_student(roster_upload, df, position), prefetch_sections
+                )))
+            prefetch_student_sections(prefetch_jobs)
         
         # 个人信息卡片
         st.markdown('<div class="card">', unsafe_allow_html=True)
@@ -319,27 +498,27 @@ else:
             st.markdown(f"""
             <div class="info-row">
                 <span class="info-label">姓名：</span>
-                <span class="info-value">{format_value(student_data.get('姓名'))}</span>
+                <span class="info-value">{display.get('姓名', '无')}</span>
             </div>
             <div class="info-row">
                 <span class="info-label">分流专业：</span>
-                <span class="info-value">{format_value(student_data.get('分流专业'))}</span>
+                <span class="info-value">{display.get('分流专业', '无')}</span>
             </div>
             <div class="info-row">
                 <span class="info-label">新班级：</span>
-                <span class="info-value">{format_value(student_data.get('新班级') or student_data.get('班级_基本信息') or student_data.get('班 级_基本信息') or student_data.get('班级') or student_data.get('班 级'))}</span>
+                <span class="info-value">{first_display(display, CLASS_DISPLAY_COLUMNS)}</span>
             </div>
             <div class="info-row">
                 <span class="info-label">辅导员：</span>
-                <span class="info-value">{format_value(student_data.get('辅导员'))}</span>
+                <span class="info-value">{display.get('辅导员', '无')}</span>
             </div>
             <div class="info-row">
                 <span class="info-label">民族：</span>
-                <span class="info-value">{format_value(student_data.get('民族'))}</span>
+                <span class="info-value">{display.get('民族', '无')}</span>
             </div>
             <div class="info-row">
                 <span class="info-label">是否积极分子：</span>
-                <span class="info-value">{format_value(student_data.get('是否积极分子'))}</span>
+                <span class="info-value">{display.get('是否积极分子', '无')}</span>
             </div>
             """, unsafe_allow_html=True)
         
@@ -347,27 +526,27 @@ else:
             st.markdown(f"""
             <div class="info-row">
                 <span class="info-label">学号：</span>
-                <span class="info-value">{format_value(student_data.get('学号'))}</span>
+                <span class="info-value">{display.get('学号', '无')}</span>
             </div>
             <div class="info-row">
                 <span class="info-label">原专业：</span>
-                <span class="info-value">{format_value(student_data.get('原专业'))}</span>
+                <span class="info-value">{display.get('原专业', '无')}</span>
             </div>
             <div class="info-row">
                 <span class="info-label">原班级：</span>
-                <span class="info-value">{format_value(student_data.get('原班级', student_data.get('班级')))}</span>
+                <span class="info-value">{display.get('原班级', display.get('班级', '无'))}</span>
             </div>
             <div class="info-row">
                 <span class="info-label">政治面貌：</span>
-                <span class="info-value">{format_value(student_data.get('政治面貌'))}</span>
+                <span class="info-value">{display.get('政治面貌', '无')}</span>
             </div>
             <div class="info-row">
                 <span class="info-label">性别：</span>
-                <span class="info-value">{format_value(student_data.get('性别'))}</span>
+                <span class="info-value">{display.get('性别', '无')}</span>
             </div>
             <div class="info-row">
                 <span class="info-label">是否递交入党申请书：</span>
-                <span class="info-value">{format_value(student_data.get('是否递交入党申请书'))}</span>
+                <span class="info-value">{display.get('是否递交入党申请书', '无')}</span>
             </div>
             """, unsafe_allow_html=True)
         
@@ -377,12 +556,8 @@ else:
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.markdown("### 🆘 帮助需求")
         
-        help_needed_value = student_data.get('有无需要学院协助解决的困难')
-        help_needed = (
-            help_needed_value and 
-            not pd.isna(help_needed_value) and
-            str(help_needed_value).lower() not in ['无', 'nan', 'none', '']
-        )
+        # 帮助需求、心理等级、四六级读取上传时整列计算的标准代码
+        help_needed = bool(canonical_codes['help_needed'][student_position])
         
         if help_needed:
             st.markdown(f"""
@@ -392,10 +567,10 @@ else:
                     <span style="font-weight: 600; color: #dc2626;">需要帮助</span>
                 </div>
                 <p style="color: #dc2626; margin: 0; font-size: 0.9rem;">
-                    困难详情: {format_value(student_data.get('有何困难', '未详述'))}
+                    困难详情: {display.get('有何困难', '未详述')}
                 </p>
                 <p style="color: #6b7280; margin-top: 0.5rem; font-size: 0.8rem;">
-                    心理状态: {format_value(student_data.get('最新心理等级', '未评估'))}
+                    心理状态: {display.get('最新心理等级', '未评估')}
                 </p>
             </div>
             """, unsafe_allow_html=True)
@@ -415,22 +590,14 @@ else:
         st.markdown("### 💖 心理评测等级")
         
         # 获取心理评测等级
-        psychological_level = student_data.get('心理评测等级', student_data.get('最新心理等级', student_data.get('心理等级')))
-        psych_value = format_value(psychological_level)
-        
-        # 根据心理等级设置不同的样式和描述
-        if psych_value in ['3级', '3', 'III级', 'III', '三级']:
-            status_class = "psych-level-3"
-            description = "心理健康状况良好，正常"
-        elif psych_value in ['2级', '2', 'II级', 'II', '二级']:
-            status_class = "psych-level-2"
-            description = "存在轻微心理问题，建议关注"
-        elif psych_value in ['1级', '1', 'I级', 'I', '一级']:
-            status_class = "psych-level-1"
-            description = "存在严重心理问题，需要专业帮助"
-        else:
-            status_class = "status-none"
-            description = "暂无心理评测数据"
+        psych_value = display.get('心理评测等级', display.get('最新心理等级', display.get('心理等级', '无')))
+        
+        # 根据心理等级代码设置不同的样式和描述
+        status_class, description = {
+            3: ("psych-level-3", "心理健康状况良好，正常"),
+            2: ("psych-level-2", "存在轻微心理问题，建议关注"),
+            1: ("psych-level-1", "存在严重心理问题，需要专业帮助")
+        }.get(int(canonical_codes['psych_level'][student_position]), ("status-none", "暂无心理评测数据"))
         
         # 显示心理评测等级
         st.markdown(f"""
@@ -458,8 +625,7 @@ else:
         # 直接生成所有内容的HTML，避免streamlit自动添加额外元素
         html_content = ""
         for item in consultation_items:
-            raw_value = student_data.get(item)
-            value = format_value(raw_value)
+            value = display.get(item, '无')
             status_class = "status-help" if value != '无' else "status-none"
             html_content += f"""
             <div style="background: #f8fafc; padding: 0.75rem; border-radius: 8px; margin: 0.5rem 0;">
@@ -478,14 +644,13 @@ else:
         st.markdown("### 🏆 奖学金信息")
         
         scholarship_items = [
-            ("人民奖学金", student_data.get('人民奖学金')),
-            ("助学奖学金", student_data.get('助学奖学金')),
-            ("助学金", student_data.get('助学金', student_data.get('助学金.1'))),
-            ("获得奖项", student_data.get('奖项'))
+            ("人民奖学金", display.get('人民奖学金', '无')),
+            ("助学奖学金", display.get('助学奖学金', '无')),
+            ("助学金", display.get('助学金', display.get('助学金.1', '无'))),
+            ("获得奖项", display.get('奖项', '无'))
         ]
         
-        for label, raw_value in scholarship_items:
-            value = format_value(raw_value)
+        for label, value in scholarship_items:
             status_class = "status-scholarship" if value != '无' else "status-none"
             st.markdown(f"""
             <div style="background: #fffbeb; padding: 0.75rem; border-radius: 8px; margin: 0.5rem 0;">
@@ -502,114 +667,17 @@ else:
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.markdown("### 📊 综合素质雷达图")
         
-        # 准备雷达图数据
-        def normalize_value(value, min_val, max_val):
-            if pd.isna(value) or value is None:
-                return 0
-            try:
-                float_value = float(value)
-                return max(0, min(100, ((float_value - min_val) / (max_val - min_val)) * 100))
-            except (ValueError, TypeError):
-                return 0
-        
-        def get_display_value(value):
-            if pd.isna(value) or value is None:
-                return 0
-            try:
-                return float(value)
-            except (ValueError, TypeError):
-                return 0
-        
-        radar_data = [
-            ("第一学年德育", normalize_value(student_data.get('第一学年德育', student_data.get('德育')), 12, 15), get_display_value(student_data.get('第一学年德育', student_data.get('德育')))),
-            ("第一学年智育", normalize_value(student_data.get('第一学年智育', student_data.get('智育')), 15,80), get_display_value(student_data.get('第一学年智育', student_data.get('智育')))),
-            ("第一学年体测", normalize_value(student_data.get('第一学年体测成绩', student_data.get('体测成绩')), 15, 110), get_display_value(student_data.get('第一学年体测成绩', student_data.get('体测成绩')))),
-            ("第一学年附加分", normalize_value(student_data.get('第一学年附加分', student_data.get('附加分', student_data.get('23-24附加分'))), -1, 6), get_display_value(student_data.get('第一学年附加分', student_data.get('附加分', student_data.get('23-24附加分'))))),
-            ("第一学年总分", normalize_value(student_data.get('第一学年综测总分', student_data.get('第一学年总分', student_data.get('测评总分'))), 20, 100), get_display_value(student_data.get('第一学年综测总分', student_data.get('第一学年总分', student_data.get('测评总分')))))
-        ]
-        
-        categories = [item[0] for item in radar_data]
-        values = [item[1] for item in radar_data]
-        actual_values = [item[2] for item in radar_data]
-        
-        # 创建雷达图
-        fig = go.Figure()
-        
-        fig.add_trace(go.Scatterpolar(
-            r=values,
-            theta=categories,
-            fill='toself',
-            name='综合评分',
-            line_color='#3b82f6',
-            fillcolor='rgba(59, 130, 246, 0.3)'
-        ))
-        
-        fig.update_layout(
-            polar=dict(
-                radialaxis=dict(
-                    visible=True,
-                    range=[0, 100],
-                    gridcolor='#e5e7eb'
-                ),
-                angularaxis=dict(
-                    gridcolor='#e5e7eb'
-                )
-            ),
-            showlegend=False,
-            height=400,
-            margin=dict(t=50, b=50, l=50, r=50)
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
-        
-        # 显示具体数值 - 改为两列布局
-        col1, col2 = st.columns(2)
-        
-        # 第一列：德育、智育、附加分
-        with col1:
-            st.markdown(f"""
-            <div class="metric-card">
-                <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">第一学年德育</div>
-                <div style="color: #3b82f6; font-weight: bold; font-size: 1.2rem;">{format_value(student_data.get('第一学年德育', student_data.get('德育')))}</div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            st.markdown(f"""
-            <div class="metric-card">
-                <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">第一学年智育</div>
-                <div style="color: #3b82f6; font-weight: bold; font-size: 1.2rem;">{format_value(student_data.get('第一学年智育', student_data.get('智育')))}</div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            st.markdown(f"""
-            <div class="metric-card">
-                <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">第一学年附加分</div>
-                <div style="color: #3b82f6; font-weight: bold; font-size: 1.2rem;">{format_value(student_data.get('第一学年附加分', student_data.get('附加分', student_data.get('23-24附加分'))))}</div>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        # 第二列：体测成绩、体测等级、综测总分
-        with col2:
-            st.markdown(f"""
-            <div class="metric-card">
-                <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">第一学年体测成绩</div>
-                <div style="color: #3b82f6; font-weight: bold; font-size: 1.2rem;">{format_value(student_data.get('第一学年体测成绩', student_data.get('体测成绩')))}</div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            st.markdown(f"""
-            <div class="metric-card">
-                <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">第一学年体测等级</div>
-                <div style="color: #3b82f6; font-weight: bold; font-size: 1.2rem;">{format_value(student_data.get('第一学年体测评级', student_data.get('体测等级')))}</div>
-            </div>
-            """, unsafe_allow_html=True)
+        # 雷达图和得分卡片只在展开时计算，并按当前学生缓存
+        if lazy_section("展开雷达图与各项得分", key="show_radar_section"):
+            fig, metric_columns = get_student_section(student_key, 'radar', lambda: build_radar_section(student_data))
+            st.plotly_chart(fig, use_container_width=True)
             
-            st.markdown(f"""
-            <div class="metric-card">
-                <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">第一学年综测总分</div>
-                <div style="color: #3b82f6; font-weight: bold; font-size: 1.2rem;">{format_value(student_data.get('第一学年综测总分', student_data.get('第一学年总分', student_data.get('测评总分'))))}</div>
-            </div>
-            """, unsafe_allow_html=True)
+            # 显示具体数值 - 两列布局
+            col1, col2 = st.columns(2)
+            for column, metric_cards in zip((col1, col2), metric_columns):
+                with column:
+                    for card_html in metric_cards:
+                        st.markdown(card_html, unsafe_allow_html=True)
 
         # 添加归一化细则说明
         with st.expander("ℹ️ 雷达图评分归一化细则", expanded=False):
@@ -629,70 +697,33 @@ else:
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.markdown("### 📈 学业成绩分析")
         
-        # 准备绩点数据
-        gpa_data = []
-        for semester in ['第一学期绩点', '第二学期绩点', '第三学期绩点']:
-            value = student_data.get(semester)
-            if pd.notna(value) and value is not None:
-                try:
-                    float_value = float(value)
-                    gpa_data.append({
-                        'semester': semester.replace('绩点', ''),
-                        'gpa': float_value
-                    })
-                except (ValueError, TypeError):
-                    continue
-        
-        if gpa_data:
-            semesters = [item['semester'] for item in gpa_data]
-            gpas = [item['gpa'] for item in gpa_data]
-            
-            # 创建折线图
-            fig = go.Figure()
+        if lazy_section("展开绩点趋势图", key="show_gpa_section"):
+            fig, gpa_data = get_student_section(student_key, 'gpa', lambda: build_gpa_section(student_data))
             
-            fig.add_trace(go.Scatter(
-                x=semesters,
-                y=gpas,
-                mode='lines+markers',
-                name='绩点',
-                line=dict(color='#8b5cf6', width=3),
-                marker=dict(size=8, color='#8b5cf6')
-            ))
-            
-            fig.update_layout(
-                xaxis_title="学期",
-                yaxis_title="绩点",
-                yaxis=dict(range=[0, 4]),
-                height=300,
-                margin=dict(t=30, b=30, l=30, r=30),
-                showlegend=False
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # 显示平均绩点
-            avg_gpa = sum(gpas) / len(gpas)
-            cols = st.columns(len(gpa_data))
-            for i, data in enumerate(gpa_data):
-                with cols[i]:
-                    st.markdown(f"""
-                    <div class="metric-card">
-                        <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">{data['semester']}</div>
-                        <div style="color: #8b5cf6; font-weight: bold; font-size: 1.5rem;">{data['gpa']:.2f}</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-        else:
-            st.info("📊 暂无绩点数据")
+            if gpa_data:
+                st.plotly_chart(fig, use_container_width=True)
+                
+                # 显示各学期绩点
+                cols = st.columns(len(gpa_data))
+                for i, data in enumerate(gpa_data):
+                    with cols[i]:
+                        st.markdown(f"""
+                        <div class="metric-card">
+                            <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">{data['semester']}</div>
+                            <div style="color: #8b5cf6; font-weight: bold; font-size: 1.5rem;">{data['gpa']:.2f}</div>
+                        </div>
+                        """, unsafe_allow_html=True)
+            else:
+                st.info("📊 暂无绩点数据")
         
         study_items = [
-            ("是否过四级", student_data.get('是否过四级', student_data.get('四级成绩'))),
-            ("是否过六级", student_data.get('是否过六级', student_data.get('六级成绩'))),
-            ("挂科次数", student_data.get('挂科')),
-            ("所获学分", student_data.get('所获学分'))
+            ("是否过四级", display.get('是否过四级', display.get('四级成绩', '无'))),
+            ("是否过六级", display.get('是否过六级', display.get('六级成绩', '无'))),
+            ("挂科次数", display.get('挂科', '无')),
+            ("所获学分", display.get('所获学分', '无'))
         ]
         
-        for label, raw_value in study_items:
-            value = format_value(raw_value)
+        for label, value in study_items:
             
             # 根据不同情况设置样式
             if label.startswith("挂科"):
@@ -700,15 +731,9 @@ else:
             elif label == "所获学分":
                 status_class = "status-scholarship" if value != '无' else "status-none"
             elif label.startswith("是否过"):
-                # 四级六级通过显示绿色，未通过显示红色
-                try:
-                    # 尝试将值转换为数字，如果是分数的话
-                    num_value = float(value) if value != '无' else 0
-                    # 四级成绩大于425分，六级成绩大于425分视为通过
-                    status_class = "status-no-help" if num_value >= 425 else "status-help"
-                except (ValueError, TypeError):
-                    # 如果不是数字，则按字符串判断
-                    status_class = "status-no-help" if value != '无' and value.lower() in ['是', 'yes', 'true', '1', 'pass', '通过'] else "status-help"
+                # 四级六级通过显示绿色，未通过显示红色（分数 425 分以上或"是/通过"等视为通过）
+                passed = canonical_codes['cet4_passed' if label == "是否过四级" else 'cet6_passed'][student_position]
+                status_class = "status-no-help" if passed else "status-help"
             else:
                 status_class = "status-scholarship" if value != '无' and value.lower() not in ['否', 'no', 'false', '0'] else "status-help"
             
@@ -722,8 +747,23 @@ else:
             """, unsafe_allow_html=True)
         
         st.markdown('</div>', unsafe_allow_html=True)
+
+        # 历次上传变化卡片（困难等级、心理评测等级、学期绩点，按学号从本地数据库查询）
+        st.markdown('<div class="card">', unsafe_allow_html=True)
+        st.markdown("### 📜 历次上传变化")
+        if lazy_section("展开历次上传记录", key="show_history_section"):
+            render_student_history(student_data.get('学号'))
+        st.markdown('</div>', unsafe_allow_html=True)
         
         
         
     else:
-        st.warning("🔍 未找到匹配的学生，请调整搜索条件")
\ No newline at end of file
+        st.warning("🔍 未找到匹配的学生，请调整搜索条件")
+
+# 记录本次运行耗时（不含下面等待后台读取的时间），首次运行后在后台预热图表依赖
+finish_run(run_timer)
+
+# 后台仍在读取上传的文件时，在页面渲染完成后等待读取结束并切换到新数据集
+wait_for_ingest(ingest_placeholder)
+# 后台预计算未完成时继续刷新各结果的状态
+wait_for_pipeline(pipeline_placeholder)
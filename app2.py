@@ -1,20 +1,37 @@
 import streamlit as st
+from startup_timing import finish_run, inject_css, mark, start_run_timer
+
+# 启动计时从这里开始（包括下面各模块的导入时间）
+run_timer = start_run_timer('app2.py')
+
 import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
 import numpy as np
 import re
-
-# 初始化用户可配置的雷达图归一化参数 (在脚本顶部或首次使用前)
-if 'user_normalization_params' not in st.session_state:
-    st.session_state.user_normalization_params = {
-        '德育': {'min': 12.0, 'max': 15.0},
-        '智育': {'min': 50.0, 'max': 100.0},
-        '体测成绩': {'min': 60.0, 'max': 120.0},
-        '附加分': {'min': -1.0, 'max': 6.0},
-        '综测总分': {'min': 50.0, 'max': 110.0}
-    }
+from shared_matrix import get_score_blocks
+from session_cache import (
+    get_dataset_artifact, get_student_section, lazy_section, prefetch_student_sections
+)
+from cohort_filters import FilterEngine, render_filter_builder
+from student_navigation import get_filtered_positions, neighbor_positions, render_student_selector
+from data_quality import (
+    get_score_anomalies, profile_dataset, render_data_profile, render_score_anomalies, render_student_anomalies, student_anomalies
+)
+from canonical_codes import build_canonical_codes, canonical_filter_columns
+from cohort_export import render_export_panel
+from data_ingest import (
+    UPLOAD_TYPES, render_ingest_benchmark, render_ingest_status, render_stored_roster_loader, start_ingest, wait_for_ingest
+)
+from dataset_pipeline import render_pipeline_status, wait_for_pipeline
+from roster_store import current_roster_upload, load_roster_student, render_student_history, search_current_roster
+from counselor_scope import build_counselor_partitions, render_counselor_scope, restrict_to_scope
+from student_search import StudentSearchIndex
+from display_values import (
+    CLASS_DISPLAY_COLUMNS, first_display, format_display_value, get_display_frame, get_student_display
+)
+from cohort_analysis import (
+    TRAJECTORY_INSUFFICIENT, build_schema_index, compute_gpa_trajectories, get_year_sort_key
+)
+from radar_settings import radar_section_name, render_normalization_settings, year_ranges
 
 # 页面配置
 st.set_page_config(
@@ -23,9 +40,11 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="collapsed"
 )
+# 记录主页文件名，其他页面（如奖助学金评定）用 st.switch_page 跳回学生详情
+st.session_state.home_page = 'app2.py'
 
-# 自定义CSS样式
-st.markdown("""
+# 自定义CSS样式（压缩后的文本按进程缓存）
+inject_css("""
 <style>
 .main-header {
     background: #28a745;
@@ -144,25 +163,12 @@ div.block-container {
     padding: 0;
 }
 </style>
-""", unsafe_allow_html=True)
+""")
 
 # 工具函数：处理空值显示
 def format_value(value):
-    """将空值、NaN、None等转换为'无'，并处理纯空格字符串"""
-    if pd.isna(value) or value is None:
-        return '无'
-    # 检查字符串表示形式
-    # strip()移除前后空格，lower()转小写，再检查是否为空或特定代表"无"的词
-    s_value_stripped = str(value).strip()
-    if not s_value_stripped or s_value_stripped.lower() in ['nan', 'none']: # '' also handled by not s_value_stripped
-        return '无'
-    return str(value) # 如果数据有效，则返回原始字符串形式
-
-chinese_to_num_map = {'一': 1, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9, '十': 10}
-def get_year_sort_key(year_str_input):
-    # Extracts the Chinese numeral part if present e.g. "一" from "第一学年"
-    year_str = str(year_str_input).replace("第","").replace("学年","")
-    return chinese_to_num_map.get(year_str, int(year_str) if year_str.isdigit() else 999)
+    """将空值、NaN、None等转换为'无'，并处理纯空格字符串（整列的显示文字见 display_values.build_display_frame）"""
+    return format_display_value(value, strip_blank=True)
 
 def extract_semester_gpa_data(student_data):
     """动态提取学期绩点数据"""
@@ -249,27 +255,24 @@ def extract_yearly_poverty_level_data(student_data):
             poverty_data[year_num_str] = value
     return poverty_data
 
-def create_radar_chart(year_data, year_name):
-    """创建单个学年的雷达图"""
-    # Check for '综测总分' validity first
+def has_valid_comprehensive_score(year_data):
+    """判断该学年的'综测总分'是否为有效数字（无效时不显示该学年雷达图）"""
     comprehensive_score_value = year_data.get('综测总分')
-    
-    is_invalid_score = False
     if pd.isna(comprehensive_score_value) or comprehensive_score_value is None:
-        is_invalid_score = True
-    else:
-        try:
-            float(comprehensive_score_value) # Check if it's a number
-        except (ValueError, TypeError):
-            is_invalid_score = True # Not a number (e.g. empty string, "无")
-            
-    if is_invalid_score:
+        return False
+    try:
+        float(comprehensive_score_value) # Check if it's a number
+    except (ValueError, TypeError):
+        return False # Not a number (e.g. empty string, "无")
+    return True
+
+def create_radar_chart(year_data, year_name, normalization_params):
+    """创建单个学年的雷达图，normalization_params 为该学年各维度的 (最小值, 最大值)（见 radar_settings.year_ranges）"""
+    if not has_valid_comprehensive_score(year_data):
         return None, None # Do not display radar chart if '综测总分' is invalid
+    # plotly 在第一次画图时才导入
+    import plotly.graph_objects as go
 
-    normalization_params = {
-        '德育': (12, 15), '智育': (15, 80), '体测成绩': (15, 110),
-        '附加分': (-1, 6), '综测总分': (20, 100)
-    }
     def normalize_value(value, min_val, max_val):
         if pd.isna(value) or value is None: return 0
         try:
@@ -301,11 +304,105 @@ def create_radar_chart(year_data, year_name):
     )
     return fig, radar_items
 
+def build_gpa_section(student_data, gpa_data):
+    """计算学期绩点趋势图和统计信息（仅在板块展开时调用）"""
+    semesters = [item['semester'] for item in gpa_data]
+    gpas = [item['gpa'] for item in gpa_data]
+    
+    # 创建折线图（plotly 在第一次画图时才导入）
+    import plotly.graph_objects as go
+    fig = go.Figure()
+    
+    fig.add_trace(go.Scatter(
+        x=semesters,
+        y=gpas,
+        mode='lines+markers',
+        name='绩点',
+        line=dict(color='#8b5cf6', width=3),
+        marker=dict(size=8, color='#8b5cf6')
+    ))
+    
+    fig.update_layout(
+        title=f"学期绩点趋势图 (共{len(gpa_data)}个学期)",
+        xaxis_title="学期",
+        yaxis_title="绩点",
+        yaxis=dict(range=[0, 4]),
+        height=400,
+        margin=dict(t=50, b=30, l=30, r=30),
+        showlegend=False
+    )
+    
+    # 尝试获取总绩点，如果不存在则使用计算的平均值
+    overall_gpa_value = student_data.get('总绩点', student_data.get('平均学分绩点'))
+    gpa_label = "总绩点"
+    if pd.isna(overall_gpa_value) or overall_gpa_value is None:
+        overall_gpa_value = np.mean(gpas) if gpas else 0
+        gpa_label = "总绩点 (计算均值)"
+    else:
+        try:
+            overall_gpa_value = float(overall_gpa_value)
+        except ValueError:
+            overall_gpa_value = np.mean(gpas) if gpas else 0 # Fallback if conversion fails
+            gpa_label = "总绩点 (转换失败，计算均值)"
+    
+    gpa_summary = {
+        'overall_gpa': overall_gpa_value,
+        'gpa_label': gpa_label,
+        'max_gpa': max(gpas) if gpas else 0,
+        'min_gpa': min(gpas) if gpas else 0,
+        'num_semesters': len(gpa_data)
+    }
+    return fig, gpa_summary
+
+def build_student_labels(df, display_frame):
+    """一次性生成全部学生的下拉框选项文本：姓名 - 学号 - 班级"""
+    # 获取班级值，按优先级取第一个非空的班级列
+    class_values = pd.Series('未知', index=df.index, dtype=object)
+    for col in reversed(['新班级', '班级', '原班级', '班级_基本信息', '班 级', '班 级_基本信息']):
+        if col in df.columns:
+            class_values = df[col].where(df[col].notna(), class_values)
+    names = display_frame['姓名'] if '姓名' in df.columns else pd.Series('未知', index=df.index)
+    student_ids = display_frame['学号'] if '学号' in df.columns else pd.Series('未知', index=df.index)
+    return (names + ' - ' + student_ids + ' - ' + class_values.astype(str)).to_numpy()
+
+def student_view_model_sections():
+    """预取相邻学生时需要准备的板块：各板块的提取数据，以及当前已展开的图表
+
+    返回 (板块名列表, {雷达图板块名: (学年, 归一化范围)})；归一化范围在这里读取，后台线程中不访问 session_state。
+    """
+    sections = ['gpa_data', 'academic_years', 'poverty_data', 'scholarship_data']
+    if st.session_state.get('show_gpa_section'):
+        sections.append('gpa')
+    radar_sections = {}
+    for key in st.session_state:
+        if key.startswith('show_radar_') and not key.startswith('show_radar_detail_') and st.session_state[key]:
+            year_num = key[len('show_radar_'):]
+            ranges = year_ranges(year_num)
+            radar_sections[radar_section_name(year_num, ranges)] = (year_num, ranges)
+    return sections + list(radar_sections), radar_sections
+
+def build_student_view_model(student_data, sections, radar_sections):
+    """计算一名学生各板块的数据（在后台预取线程中执行，不调用 st.* 接口）"""
+    view_model = {
+        'gpa_data': extract_semester_gpa_data(student_data),
+        'academic_years': extract_academic_year_data(student_data),
+        'poverty_data': extract_yearly_poverty_level_data(student_data),
+        'scholarship_data': extract_yearly_scholarship_data(student_data)
+    }
+    if 'gpa' in sections and view_model['gpa_data']:
+        view_model['gpa'] = build_gpa_section(student_data, view_model['gpa_data'])
+    for section_name, (year_num, ranges) in radar_sections.items():
+        if year_num in view_model['academic_years']:
+            view_model[section_name] = create_radar_chart(view_model['academic_years'][year_num], f"第{year_num}学年", ranges)
+    return view_model
+
 # 初始化session state
 if 'students_data' not in st.session_state:
     st.session_state.students_data = None
 if 'selected_student_index' not in st.session_state:
     st.session_state.selected_student_index = 0
+if 'upload_error' not in st.session_state:
+    st.session_state.upload_error = None
 
 # 主标题
 st.markdown("""
@@ -327,24 +424,40 @@ st.info("""
 - 支持包含多个学年奖学金数据的Excel文件（如：第一学年人民奖学金、第二学年人民奖学金等）
 """)
 
+# 上传时的预计算（在后台读取线程中执行，不能调用 st.* 接口）
+def prepare_uploaded_dataset(df):
+    # 数据结构索引和按辅导员分组的行号；数据质量检查、标准代码、搜索索引等在切换数据集后由预计算流水线在后台计算
+    return None, {
+        'schema_index': build_schema_index(df.columns),
+        'counselor_partitions': build_counselor_partitions(df)
+    }
+
+
 uploaded_file = st.file_uploader(
-    "选择Excel文件上传学生数据",
-    type=['xlsx', 'xls'],
-    help="支持Excel格式文件，系统会自动适应不同的数据结构"
+    "选择Excel/CSV/Parquet文件上传学生数据",
+    type=UPLOAD_TYPES,
+    help="支持Excel、CSV（UTF-8或GBK编码）和Parquet格式文件，系统会自动适应不同的数据结构"
 )
 
+ingest_placeholder = None
+pipeline_placeholder = None
 if uploaded_file is not None:
-    try:
-        # 读取Excel文件
-        df = pd.read_excel(uploaded_file)
-        st.session_state.students_data = df
+    # 同一个文件只在首次上传时读取；读取和质量检查在后台线程中进行，页面保持可操作，完成后一次性切换到新数据集
+    if st.session_state.get('uploaded_file_id') != uploaded_file.file_id:
+        st.session_state.uploaded_file_id = uploaded_file.file_id
+        start_ingest(uploaded_file, prepare_uploaded_dataset)
+    ingest_placeholder = render_ingest_status("❌ 文件读取失败: ")
+
+    if st.session_state.upload_error:
+        st.error(st.session_state.upload_error)
+    elif st.session_state.students_data is not None:
+        df = st.session_state.students_data
         st.success(f"✅ 成功加载 {len(df)} 名学生的数据")
+        render_ingest_benchmark(uploaded_file)
+        pipeline_placeholder = render_pipeline_status()
         
         # 显示数据结构信息
-        with st.expander("📋 数据结构预览", expanded=False):
-            st.write(f"**总行数:** {len(df)}")
-            st.write(f"**总列数:** {len(df.columns)}")
-            
+        with st.expander("📋 数据结构与质量报告", expanded=False):
             # 显示绩点相关列
             gpa_cols = [col for col in df.columns if '绩点' in str(col)]
             if gpa_cols:
@@ -354,12 +467,17 @@ if uploaded_file is not None:
             comp_cols = [col for col in df.columns if any(keyword in str(col) for keyword in ['德育', '智育', '体测', '附加', '综测'])]
             if comp_cols:
                 st.write(f"**综测相关列 ({len(comp_cols)}个):** {', '.join(comp_cols[:10])}{'...' if len(comp_cols) > 10 else ''}")
-
-    except Exception as e:
-        st.error(f"❌ 文件读取失败: {str(e)}")
-        st.session_state.students_data = None
+            
+            # 数据质量报告（上传时已计算，这里只读取缓存）
+            render_data_profile(get_dataset_artifact('data_profile', lambda: profile_dataset(df)))
+            render_score_anomalies(get_score_anomalies(df))
+elif st.session_state.students_data is None:
+    # 没有上传文件时可以直接读取本地数据库中上次保存的数据
+    render_stored_roster_loader(prepare_uploaded_dataset)
 
 st.markdown('</div>', unsafe_allow_html=True)
+# 服务端脚本执行到上传区域结束的时间，不含网络传输和浏览器渲染
+mark(run_timer, '首屏脚本')
 
 # 如果没有数据，显示欢迎界面
 if st.session_state.students_data is None:
@@ -380,67 +498,72 @@ else:
     col1, col2, col3 = st.columns([3, 1, 1])
     
     with col1:
+        # 辅导员范围：搜索、筛选和统计只在所选辅导员的学生中进行
+        scope_positions = render_counselor_scope(df)
+        roster_upload = current_roster_upload()
+        
         # 搜索功能
-        search_term = st.text_input("🔍 搜索学生", placeholder="输入姓名、学号或班级进行搜索...")
-        
-        # 过滤学生数据
-        if search_term:
-            # 创建搜索条件，支持多种可能的列名
-            search_columns = ['姓名', '学号']
-            # 添加可能的班级列名
-            possible_class_cols = ['班级', '新班级', '原班级', '班级_基本信息', '班 级', '班 级_基本信息']
-            for col in possible_class_cols:
-                if col in df.columns:
-                    search_columns.append(col)
-            
-            mask = pd.Series([False] * len(df))
-            for col in search_columns:
-                if col in df.columns:
-                    mask |= df[col].astype(str).str.contains(search_term, case=False, na=False)
-            
-            filtered_df = df[mask]
-        else:
-            filtered_df = df
+        search_term = st.text_input("🔍 搜索学生", placeholder="输入姓名、学号、班级或拼音（如 zs）进行搜索...")
+        
+        # 组合筛选条件（编译为一个布尔掩码，与搜索条件同时生效）
+        canonical_codes = get_dataset_artifact('canonical_codes', lambda: build_canonical_codes(df))
+        filter_engine = get_dataset_artifact(
+            'filter_engine', lambda: FilterEngine(df, canonical_filter_columns(canonical_codes))
+        )
+        filter_mask = render_filter_builder(filter_engine)
+        
+        # 过滤学生数据：只在搜索词或筛选条件变化时重新计算，结果为整表中的行号数组
+        def compute_filtered_positions():
+            if not search_term:
+                return scope_positions[filter_mask[scope_positions]]
+            # 数据已保存到本地数据库时，先按索引查找学号、姓名、班级、分流专业或辅导员以搜索词开头的学生；
+            # 没有前缀匹配时在数据集的搜索索引中查找（子串、拼音、错别字），结果按匹配程度排序，
+            # 搜索结果按搜索词缓存，逐字输入时只在上一个搜索词的结果中继续筛选；最后限定在辅导员范围内
+            positions = search_current_roster(roster_upload, search_term)
+            if positions is None or not len(positions):
+                search_index = get_dataset_artifact('search_index', lambda: StudentSearchIndex(df))
+                positions = search_index.search(search_term)
+            positions = restrict_to_scope(positions, scope_positions)
+            return positions[filter_mask[positions]]
+        
+        filter_signature = (st.session_state.counselor_scope, search_term, tuple(st.session_state.filter_conditions))
+        filtered_positions = get_filtered_positions(filter_signature, compute_filtered_positions)
     
     with col2:
-        st.metric("总学生数", len(df))
+        st.metric("总学生数", len(scope_positions))
     
     with col3:
-        st.metric("筛选结果", len(filtered_df))
+        st.metric("筛选结果", len(filtered_positions))
     
-    if len(filtered_df) > 0:
-        # 学生选择下拉框
-        student_options = []
-        for idx, row in filtered_df.iterrows():
-            # 获取班级值，尝试多种可能的列名
-            班级值 = '未知'
-            for col in ['新班级', '班级', '原班级', '班级_基本信息', '班 级', '班 级_基本信息']:
-                if col in filtered_df.columns and pd.notna(row.get(col)):
-                    班级值 = row.get(col)
-                    break
-                    
-            student_options.append(f"{format_value(row.get('姓名', '未知'))} - {format_value(row.get('学号', '未知'))} - {班级值}")
+    if len(filtered_positions) > 0:
+        # 导出当前筛选结果（含派生指标），文件在后台线程中生成
+        render_export_panel(df, filtered_positions)
         
-        selected_student = st.selectbox(
-            "选择学生",
-            options=range(len(student_options)),
-            format_func=lambda x: student_options[x],
-            key="student_selector"
-        )
-        
-        # 导航按钮
-        col1, col2, col3 = st.columns([1, 1, 1])
-        with col1:
-            if st.button("⬅️ 上一个", disabled=selected_student == 0):
-                selected_student = max(0, selected_student - 1)
-        with col3:
-            if st.button("下一个 ➡️", disabled=selected_student >= len(student_options) - 1):
-                selected_student = min(len(student_options) - 1, selected_student + 1)
+        # 学生选择下拉框（选项文本按数据集一次性生成）
+        student_labels = get_dataset_artifact('student_labels', lambda: build_student_labels(df, get_display_frame(df, strip_blank=True)))
+        selected_student = render_student_selector(student_labels, filtered_positions)
+        mark(run_timer, '学生选择')
         
         st.markdown('</div>', unsafe_allow_html=True)
         
         # 获取选中的学生数据
-        student_data = filtered_df.iloc[selected_student]
+        student_position = int(filtered_positions[selected_student])
+        # 数据已保存到本地数据库时按学号做索引点查询
+        student_data = load_roster_student(roster_upload, df, student_position)
+        # 各字段的显示文字按列预先生成，这里只按行号取出
+        display = get_student_display(df, student_position, strip_blank=True)
+        # 当前学生的缓存键（数据集内的行标签 + 学号）
+        student_key = (student_data.name, display.get('学号', '无'))
+        
+        # 后台预取相邻学生的数据，翻页时直接读取缓存
+        prefetch_sections, prefetch_radar_sections = student_view_model_sections()
+        prefetch_jobs = []
+        for position in neighbor_positions(filtered_positions, selected_student):
+            neighbor_key = (df.index[position], get_student_display(df, position, strip_blank=True).get('学号', '无'))
+            prefetch_jobs.append((neighbor_key, prefetch_sections, lambda position=position: build_student_view_model(
+                load_roster_student(roster_upload, df, position), prefetch_sections, prefetch_radar_sections
+            )))
+        prefetch_student_sections(prefetch_jobs)
         
         # 个人信息卡片
         st.markdown('<div class="card">', unsafe_allow_html=True)
@@ -452,27 +575,27 @@ else:
             st.markdown(f"""
             <div class="info-row">
                 <span class="info-label">姓名：</span>
-                <span class="info-value">{format_value(student_data.get('姓名'))}</span>
+                <span class="info-value">{display.get('姓名', '无')}</span>
             </div>
             <div class="info-row">
                 <span class="info-label">分流专业：</span>
-                <span class="info-value">{format_value(student_data.get('分流专业'))}</span>
+                <span class="info-value">{display.get('分流专业', '无')}</span>
             </div>
             <div class="info-row">
                 <span class="info-label">新班级：</span>
-                <span class="info-value">{format_value(student_data.get('新班级') or student_data.get('班级_基本信息') or student_data.get('班 级_基本信息') or student_data.get('班级') or student_data.get('班 级'))}</span>
+                <span class="info-value">{first_display(display, CLASS_DISPLAY_COLUMNS)}</span>
             </div>
             <div class="info-row">
                 <span class="info-label">辅导员：</span>
-                <span class="info-value">{format_value(student_data.get('辅导员'))}</span>
+                <span class="info-value">{display.get('辅导员', '无')}</span>
             </div>
             <div class="info-row">
                 <span class="info-label">民族：</span>
-                <span class="info-value">{format_value(student_data.get('民族'))}</span>
+                <span class="info-value">{display.get('民族', '无')}</span>
             </div>
             <div class="info-row">
                 <span class="info-label">是否积极分子：</span>
-                <span class="info-value">{format_value(student_data.get('是否积极分子'))}</span>
+                <span class="info-value">{display.get('是否积极分子', '无')}</span>
             </div>
             """, unsafe_allow_html=True)
         
@@ -480,27 +603,27 @@ else:
             st.markdown(f"""
             <div class="info-row">
                 <span class="info-label">学号：</span>
-                <span class="info-value">{format_value(student_data.get('学号'))}</span>
+                <span class="info-value">{display.get('学号', '无')}</span>
             </div>
             <div class="info-row">
                 <span class="info-label">原专业：</span>
-                <span class="info-value">{format_value(student_data.get('原专业'))}</span>
+                <span class="info-value">{display.get('原专业', '无')}</span>
             </div>
             <div class="info-row">
                 <span class="info-label">原班级：</span>
-                <span class="info-value">{format_value(student_data.get('原班级', student_data.get('班级')))}</span>
+                <span class="info-value">{display.get('原班级', display.get('班级', '无'))}</span>
             </div>
             <div class="info-row">
                 <span class="info-label">政治面貌：</span>
-                <span class="info-value">{format_value(student_data.get('政治面貌'))}</span>
+                <span class="info-value">{display.get('政治面貌', '无')}</span>
             </div>
             <div class="info-row">
                 <span class="info-label">性别：</span>
-                <span class="info-value">{format_value(student_data.get('性别'))}</span>
+                <span class="info-value">{display.get('性别', '无')}</span>
             </div>
             <div class="info-row">
                 <span class="info-label">是否递交入党申请书：</span>
-                <span class="info-value">{format_value(student_data.get('是否递交入党申请书'))}</span>
+                <span class="info-value">{display.get('是否递交入党申请书', '无')}</span>
             </div>
             """, unsafe_allow_html=True)
         
@@ -509,12 +632,8 @@ else:
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.markdown("### 🆘 帮助需求")
         
-        help_needed_value = student_data.get('有无需要学院协助解决的困难')
-        help_needed = (
-            help_needed_value and 
-            not pd.isna(help_needed_value) and
-            str(help_needed_value).lower() not in ['无', 'nan', 'none', '']
-        )
+        # 帮助需求、心理等级、四六级读取上传时整列计算的标准代码
+        help_needed = bool(canonical_codes['help_needed'][student_position])
         
         if help_needed:
             st.markdown(f"""
@@ -524,7 +643,7 @@ else:
                     <span style="font-weight: 600; color: #dc2626;">需要帮助</span>
                 </div>
                 <p style="color: #dc2626; margin: 0; font-size: 0.9rem;">
-                    困难详情: {format_value(student_data.get('有何困难', '未详述'))}
+                    困难详情: {display.get('有何困难', '未详述')}
                 </p>
             </div>
             """, unsafe_allow_html=True)
@@ -544,22 +663,17 @@ else:
         st.markdown("### 💖 心理评测等级")
         
         # 获取心理评测等级
-        psychological_level = student_data.get('心理评测等级', student_data.get('最新心理等级', student_data.get('心理等级')))
-        psych_value = format_value(psychological_level)
-        
-        # 根据心理等级设置不同的样式和描述
-        if psych_value in ['3级', '3', 'III级', 'III', '三级', '良好']:
-            status_class = "psych-level-3"
-            description = "心理健康状况良好"
-        elif psych_value in ['2级', '2', 'II级', 'II', '二级', '一般']:
-            status_class = "psych-level-2"
-            description = "存在轻微心理问题"
-        elif psych_value in ['1级', '1', 'I级', 'I', '一级', '较差', '差']:
-            status_class = "psych-level-1"
-            description = "存在严重心理问题"
-        else:
-            status_class = "status-none"
-            description = "暂无心理评测数据" if psych_value == '无' else f"数据: {psych_value}"
+        psych_value = display.get('心理评测等级', display.get('最新心理等级', display.get('心理等级', '无')))
+        
+        # 根据心理等级代码设置不同的样式和描述
+        status_class, description = {
+            3: ("psych-level-3", "心理健康状况良好"),
+            2: ("psych-level-2", "存在轻微心理问题"),
+            1: ("psych-level-1", "存在严重心理问题")
+        }.get(
+            int(canonical_codes['psych_level'][student_position]),
+            ("status-none", "暂无心理评测数据" if psych_value == '无' else f"数据: {psych_value}")
+        )
         
         # 显示心理评测等级
         st.markdown(f"""
@@ -577,7 +691,7 @@ else:
         st.markdown('</div>', unsafe_allow_html=True)
         
         # 新增：贫困等级模块
-        yearly_poverty_data = extract_yearly_poverty_level_data(student_data)
+        yearly_poverty_data = get_student_section(student_key, 'poverty_data', lambda: extract_yearly_poverty_level_data(student_data))
         html_lines_for_poverty = [] # Store HTML for lines that should be displayed
 
         if yearly_poverty_data: 
@@ -624,115 +738,86 @@ else:
         st.markdown("### 📈 学业成绩分析")
         
         # 动态提取绩点数据
-        gpa_data = extract_semester_gpa_data(student_data)
+        gpa_data = get_student_section(student_key, 'gpa_data', lambda: extract_semester_gpa_data(student_data))
         
         if gpa_data:
-            semesters = [item['semester'] for item in gpa_data]
-            gpas = [item['gpa'] for item in gpa_data]
-            
-            # 创建折线图
-            fig = go.Figure()
-            
-            fig.add_trace(go.Scatter(
-                x=semesters,
-                y=gpas,
-                mode='lines+markers',
-                name='绩点',
-                line=dict(color='#8b5cf6', width=3),
-                marker=dict(size=8, color='#8b5cf6')
-            ))
-            
-            fig.update_layout(
-                title=f"学期绩点趋势图 (共{len(gpa_data)}个学期)",
-                xaxis_title="学期",
-                yaxis_title="绩点",
-                yaxis=dict(range=[0, 4]),
-                height=400,
-                margin=dict(t=50, b=30, l=30, r=30),
-                showlegend=False
+            # 绩点轨迹指标对全体学生一次性计算并按数据集缓存，这里只按行号查表
+            schema_index = get_dataset_artifact('schema_index', lambda: build_schema_index(df.columns))
+            gpa_trajectories = get_dataset_artifact(
+                'gpa_trajectories', lambda: compute_gpa_trajectories(get_score_blocks(df, schema_index)['gpa'])
             )
-            
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # 显示各学期绩点和统计信息
-            st.markdown("#### 📊 学期绩点详情")
-            
-            # 计算统计信息
-            max_gpa = max(gpas) if gpas else 0
-            min_gpa = min(gpas) if gpas else 0
-            num_semesters = len(gpa_data)
-
-            # 尝试获取总绩点，如果不存在则使用计算的平均值
-            overall_gpa_value = student_data.get('总绩点', student_data.get('平均学分绩点'))
-            gpa_label = "总绩点"
-            if pd.isna(overall_gpa_value) or overall_gpa_value is None:
-                overall_gpa_value = np.mean(gpas) if gpas else 0
-                gpa_label = "总绩点 (计算均值)"
-            else:
-                try:
-                    overall_gpa_value = float(overall_gpa_value)
-                except ValueError:
-                    overall_gpa_value = np.mean(gpas) if gpas else 0 # Fallback if conversion fails
-                    gpa_label = "总绩点 (转换失败，计算均值)"
-
-            # 第一行：统计卡片
-            stat_cols = st.columns(4)
-            with stat_cols[0]:
-                st.markdown(f"""
-                <div class="metric-card">
-                    <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">{gpa_label}</div>
-                    <div style="color: #8b5cf6; font-weight: bold; font-size: 1.5rem;">{overall_gpa_value:.2f}</div>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with stat_cols[1]:
-                st.markdown(f"""
-                <div class="metric-card">
-                    <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">最高绩点</div>
-                    <div style="color: #16a34a; font-weight: bold; font-size: 1.5rem;">{max_gpa:.2f}</div>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with stat_cols[2]:
-                st.markdown(f"""
-                <div class="metric-card">
-                    <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">最低绩点</div>
-                    <div style="color: #dc2626; font-weight: bold; font-size: 1.5rem;">{min_gpa:.2f}</div>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with stat_cols[3]:
-                st.markdown(f"""
-                <div class="metric-card">
-                    <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">学期总数</div>
-                    <div style="color: #3b82f6; font-weight: bold; font-size: 1.5rem;">{num_semesters}</div>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            # 第二行：学期绩点 1-4
-            sem_row2_cols = st.columns(4)
-            for i in range(4):
-                if i < len(gpa_data):
-                    data = gpa_data[i]
-                    with sem_row2_cols[i]:
+            trajectory_label = gpa_trajectories['label'][student_position]
+            if trajectory_label != TRAJECTORY_INSUFFICIENT:
+                trend_color = {'上升': '#16a34a', '下降': '#dc2626'}.get(trajectory_label, '#3b82f6')
+                trend_items = [
+                    ("绩点趋势", trajectory_label, trend_color),
+                    ("每学期变化", f"{gpa_trajectories['slope'][student_position]:+.2f}", trend_color),
+                    ("波动", f"{gpa_trajectories['volatility'][student_position]:.2f}", '#f59e0b'),
+                    ("最大降幅", f"{gpa_trajectories['largest_drop'][student_position]:.2f}", '#dc2626')
+                ]
+                trend_cols = st.columns(4)
+                for trend_col, (label, value, color) in zip(trend_cols, trend_items):
+                    with trend_col:
                         st.markdown(f"""
                         <div class="metric-card">
-                            <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">{data['semester']}</div>
-                            <div style="color: #8b5cf6; font-weight: bold; font-size: 1.2rem;">{data['gpa']:.2f}</div>
+                            <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">{label}</div>
+                            <div style="color: {color}; font-weight: bold; font-size: 1.2rem;">{value}</div>
                         </div>
                         """, unsafe_allow_html=True)
-                else:
-                    with sem_row2_cols[i]: # Placeholder for empty slots if less than 4 semesters
-                        st.markdown("<div class=\"metric-card\" style=\"opacity:0; pointer-events:none;\">&nbsp;</div>", unsafe_allow_html=True)
+            
+            # 趋势图和学期详情卡片只在展开时计算，并按当前学生缓存
+            if lazy_section(f"展开绩点趋势图与学期详情 (共{len(gpa_data)}个学期)", key="show_gpa_section"):
+                fig, gpa_summary = get_student_section(student_key, 'gpa', lambda: build_gpa_section(student_data, gpa_data))
+                st.plotly_chart(fig, use_container_width=True)
+                
+                # 显示各学期绩点和统计信息
+                st.markdown("#### 📊 学期绩点详情")
+                overall_gpa_value = gpa_summary['overall_gpa']
+                gpa_label = gpa_summary['gpa_label']
+                max_gpa = gpa_summary['max_gpa']
+                min_gpa = gpa_summary['min_gpa']
+                num_semesters = gpa_summary['num_semesters']
 
-            # 第三行：学期绩点 5-8
-            if len(gpa_data) > 4:
-                sem_row3_cols = st.columns(4)
+                # 第一行：统计卡片
+                stat_cols = st.columns(4)
+                with stat_cols[0]:
+                    st.markdown(f"""
+                    <div class="metric-card">
+                        <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">{gpa_label}</div>
+                        <div style="color: #8b5cf6; font-weight: bold; font-size: 1.5rem;">{overall_gpa_value:.2f}</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+            
+                with stat_cols[1]:
+                    st.markdown(f"""
+                    <div class="metric-card">
+                        <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">最高绩点</div>
+                        <div style="color: #16a34a; font-weight: bold; font-size: 1.5rem;">{max_gpa:.2f}</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+            
+                with stat_cols[2]:
+                    st.markdown(f"""
+                    <div class="metric-card">
+                        <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">最低绩点</div>
+                        <div style="color: #dc2626; font-weight: bold; font-size: 1.5rem;">{min_gpa:.2f}</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+            
+                with stat_cols[3]:
+                    st.markdown(f"""
+                    <div class="metric-card">
+                        <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">学期总数</div>
+                        <div style="color: #3b82f6; font-weight: bold; font-size: 1.5rem;">{num_semesters}</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+            
+                # 第二行：学期绩点 1-4
+                sem_row2_cols = st.columns(4)
                 for i in range(4):
-                    data_index = i + 4
-                    if data_index < len(gpa_data):
-                        data = gpa_data[data_index]
-                        with sem_row3_cols[i]:
+                    if i < len(gpa_data):
+                        data = gpa_data[i]
+                        with sem_row2_cols[i]:
                             st.markdown(f"""
                             <div class="metric-card">
                                 <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">{data['semester']}</div>
@@ -740,8 +825,26 @@ else:
                             </div>
                             """, unsafe_allow_html=True)
                     else:
-                        with sem_row3_cols[i]: # Placeholder for empty slots
+                        with sem_row2_cols[i]: # Placeholder for empty slots if less than 4 semesters
                             st.markdown("<div class=\"metric-card\" style=\"opacity:0; pointer-events:none;\">&nbsp;</div>", unsafe_allow_html=True)
+
+                # 第三行：学期绩点 5-8
+                if len(gpa_data) > 4:
+                    sem_row3_cols = st.columns(4)
+                    for i in range(4):
+                        data_index = i + 4
+                        if data_index < len(gpa_data):
+                            data = gpa_data[data_index]
+                            with sem_row3_cols[i]:
+                                st.markdown(f"""
+                                <div class="metric-card">
+                                    <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">{data['semester']}</div>
+                                    <div style="color: #8b5cf6; font-weight: bold; font-size: 1.2rem;">{data['gpa']:.2f}</div>
+                                </div>
+                                """, unsafe_allow_html=True)
+                        else:
+                            with sem_row3_cols[i]: # Placeholder for empty slots
+                                st.markdown("<div class=\"metric-card\" style=\"opacity:0; pointer-events:none;\">&nbsp;</div>", unsafe_allow_html=True)
         else:
             st.info("📊 暂无绩点数据")
         
@@ -751,30 +854,48 @@ else:
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.markdown("### 📊 综合素质评价")
         
+        # 成绩异常检查对全体学生一次性计算并按数据集缓存，这里只取出该学生的记录并标出有问题的分项
+        anomaly_issues = student_anomalies(get_score_anomalies(df), student_position)
+        render_student_anomalies(anomaly_issues)
+        anomaly_columns = set(anomaly_issues['列名'])
+        schema_index = get_dataset_artifact('schema_index', lambda: build_schema_index(df.columns))
+        
         # 动态提取学年数据
-        academic_years = extract_academic_year_data(student_data)
+        academic_years = get_student_section(student_key, 'academic_years', lambda: extract_academic_year_data(student_data))
         
         if academic_years:
             # 按学年顺序排序
             sorted_years = sorted(academic_years.keys(), key=get_year_sort_key)
             
-            # 为每个学年创建雷达图
+            # 为每个学年创建雷达图：只有展开的学年才会构建图表和详细数据卡片
             for year_num in sorted_years:
                 year_data = academic_years[year_num]
                 year_name = f"第{year_num}学年"
                 
-                fig, radar_data = create_radar_chart(year_data, year_name)
+                if not has_valid_comprehensive_score(year_data):
+                    continue
+                if not lazy_section(f"{year_name}综合素质雷达图", key=f"show_radar_{year_num}"):
+                    continue
+                
+                ranges = year_ranges(year_num)
+                fig, radar_data = get_student_section(
+                    student_key, radar_section_name(year_num, ranges), lambda: create_radar_chart(year_data, year_name, ranges)
+                )
                 
                 if fig is not None:
                     st.plotly_chart(fig, use_container_width=True)
                     
                     # 显示该学年的详细数据
-                    with st.expander(f"📋 {year_name}详细数据", expanded=False):
+                    if lazy_section(f"📋 {year_name}详细数据", key=f"show_radar_detail_{year_num}"):
                         detail_cols = st.columns(3)
                         
                         # Display radar_data items (德育, 智育, 体测成绩, 附加分, 综测总分)
+                        year_columns = schema_index['year_fields'].get(year_num, {})
                         for i, (field, normalized_val, actual_val) in enumerate(radar_data):
                             col_idx = i % 3
+                            flagged = year_columns.get(field) in anomaly_columns
+                            card_style = ' style="border: 2px solid #f59e0b;"' if flagged else ''
+                            field_label = f"⚠️ {field}" if flagged else field
                             # Determine color for this field's value display
                             if field == '德育': color = '#16a34a'
                             elif field == '智育': color = '#3b82f6'
@@ -785,15 +906,15 @@ else:
                             with detail_cols[col_idx]:
                                 if field == '综测总分' or field == '附加分': # Modified condition
                                     st.markdown(f"""
-                                    <div class="metric-card">
-                                        <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">{field}</div>
+                                    <div class="metric-card"{card_style}>
+                                        <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">{field_label}</div>
                                         <div style="color: {color}; font-weight: bold; font-size: 1.2rem;">{actual_val:.1f}</div>
                                     </div>
                                     """, unsafe_allow_html=True)
                                 else: # For '德育', '智育', '体测成绩'
                                     st.markdown(f"""
-                                    <div class="metric-card">
-                                        <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">{field}</div>
+                                    <div class="metric-card"{card_style}>
+                                        <div style="font-weight: 600; color: #374151; margin-bottom: 0.25rem;">{field_label}</div>
                                         <div style="color: {color}; font-weight: bold; font-size: 1.2rem;">{actual_val:.1f}</div>
                                     </div>
                                     """, unsafe_allow_html=True)
@@ -811,17 +932,8 @@ else:
                                     <div style="color: {rating_text_color}; font-weight: bold; font-size: 1.2rem;">{rating_value}</div>
                                 </div>
                                 """, unsafe_allow_html=True)
-            # 添加归一化细则说明
-            with st.expander("ℹ️ 雷达图评分归一化细则", expanded=False):
-                st.markdown("""
-                雷达图中的各项评分均已通过以下方式进行归一化处理，以便在统一的0-100范围内进行比较：
-                **各维度具体归一化参数 (预设最小值 / 预设最大值)：**
-                *   `第一学年德育`: 12 / 15
-                *   `第一学年智育`: 50 / 100
-                *   `第一学年体测`: 60 / 120
-                *   `第一学年附加分`: -1 / 6
-                *   `第一学年总分`: 50 / 110
-                """)
+            # 归一化设置（显示当前使用的范围；修改后只重新计算范围有变化的学年的图表）
+            render_normalization_settings(sorted_years)
             
         else:
             st.info("📊 暂无综合素质评价数据")
@@ -831,7 +943,7 @@ else:
         # 奖学金信息 (Replaces "奖助学金与特殊情况")
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.markdown("### 🏆 奖学金信息")
-        yearly_scholarship_data = extract_yearly_scholarship_data(student_data)
+        yearly_scholarship_data = get_student_section(student_key, 'scholarship_data', lambda: extract_yearly_scholarship_data(student_data))
 
         has_any_yearly_data_to_show_header_for = False
         if yearly_scholarship_data:
@@ -882,20 +994,19 @@ else:
             st.markdown(f"#### 通用奖学金记录") # Header for general records
             
             fallback_scholarship_items = [
-                ("人民奖学金", student_data.get('人民奖学金')),
-                ("助学奖学金", student_data.get('助学奖学金')),
-                ("助学金", student_data.get('助学金', student_data.get('助学金.1'))), # Specific app.py fallback
-                ("获得奖项", student_data.get('奖项')) # Label "获得奖项", data key "奖项"
+                ("人民奖学金", display.get('人民奖学金', '无')),
+                ("助学奖学金", display.get('助学奖学金', '无')),
+                ("助学金", display.get('助学金', display.get('助学金.1', '无'))), # Specific app.py fallback
+                ("获得奖项", display.get('奖项', '无')) # Label "获得奖项", data key "奖项"
             ]
             
             # Check if there's any actual data in fallback items to avoid printing "暂无奖学金数据" if there is data.
-            has_any_fallback_data_content = any(format_value(item[1]) != '无' for item in fallback_scholarship_items)
+            has_any_fallback_data_content = any(item[1] != '无' for item in fallback_scholarship_items)
 
             if not has_any_fallback_data_content and not has_any_yearly_data_to_show_header_for:
                  st.info("📊 暂无奖学金数据")
             else: # Display all fallback items, showing '无' where applicable
-                for label, raw_value in fallback_scholarship_items:
-                    value = format_value(raw_value) # format_value handles None -> '无'
+                for label, value in fallback_scholarship_items:
                     status_class_schol = "status-scholarship" if value != '无' else "status-none"
                     st.markdown(f'''
                     <div style="background:#fffbeb; padding:0.75rem; border-radius:8px; margin:0.5rem 0;">
@@ -906,6 +1017,13 @@ else:
                     </div>''', unsafe_allow_html=True)
 
         st.markdown('</div>', unsafe_allow_html=True)
+
+        # 历次上传变化卡片（困难等级、心理评测等级、学期绩点，按学号从本地数据库查询）
+        st.markdown('<div class="card">', unsafe_allow_html=True)
+        st.markdown("### 📜 历次上传变化")
+        if lazy_section("展开历次上传记录", key="show_history_section"):
+            render_student_history(student_data.get('学号'))
+        st.markdown('</div>', unsafe_allow_html=True)
         
         
     else:
@@ -917,4 +1035,12 @@ st.markdown("""
 <div style="text-align: center; color: #6b7280; padding: 1rem;">
     <p>✈️ 航空工程学院学生数据分析系统</p>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# 记录本次运行耗时（不含下面等待后台读取的时间），首次运行后在后台预热图表依赖
+finish_run(run_timer)
+
+# 后台仍在读取上传的文件时，在页面渲染完成后等待读取结束并切换到新数据集
+wait_for_ingest(ingest_placeholder)
+# 后台预计算未完成时继续刷新各结果的状态
+wait_for_pipeline(pipeline_placeholder)
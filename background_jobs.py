@@ -0,0 +1,207 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+
+# 后台任务：耗时的操作（导出文件等）放到工作线程中执行，页面只轮询进度
+
+# 轮询进度的间隔（秒）
+POLL_INTERVAL = 0.2
+# 流水线各步骤使用的工作线程数（numpy / pandas 的计算大多释放 GIL，多个步骤可以同时进行）
+PIPELINE_WORKERS = 4
+# 流水线步骤的状态
+STAGE_PENDING, STAGE_RUNNING, STAGE_READY, STAGE_FAILED, STAGE_SKIPPED = 'pending', 'running', 'ready', 'failed', 'skipped'
+
+
+class JobCancelled(Exception):
+    """任务已被用户取消"""
+
+
+class BackgroundJob:
+    """在工作线程中执行的任务，记录进度和结果，支持取消
+
+    target 接收任务本身作为参数，通过 job.report(进度, 说明) 汇报进度；
+    任务被取消后下一次 report 会抛出 JobCancelled。target 在工作线程中执行，不能调用 st.* 接口。
+    """
+
+    def __init__(self, target, name, signature=None):
+        self.name = name
+        self.signature = signature
+        self.progress = 0.0
+        self.message = ''
+        self.result = None
+        self.error = None
+        self.cancelled = False
+        self._cancel_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(target,), name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self, target):
+        try:
+            self.result = target(self)
+            self.progress = 1.0
+        except JobCancelled:
+            self.cancelled = True
+        except Exception as e:
+            self.error = e
+
+    def report(self, progress, message=None):
+        """汇报进度（0-1）；任务已被取消时抛出 JobCancelled"""
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+        self.progress = min(max(float(progress), 0.0), 1.0)
+        if message is not None:
+            self.message = message
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+
+
+class StagePipeline:
+    """按依赖关系在线程池中并行执行的一组计算步骤，每一步完成后立即发布结果
+
+    stages 为 (步骤名, 依赖的步骤名列表, 函数) 的列表，函数以 {依赖名: 结果} 为参数（inputs 中的值可以直接作为依赖）；
+    某一步完成后调用 publish(步骤名, 结果)。失败的步骤及依赖它的步骤不再发布结果，由使用方按需重新计算。
+    函数在工作线程中执行，不能调用 st.* 接口。
+    """
+
+    def __init__(self, stages, publish, inputs=None, signature=None, max_workers=PIPELINE_WORKERS):
+        self.signature = signature
+        self.status = {name: STAGE_PENDING for name, _, _ in stages}
+        self.seconds = {}
+        self.errors = {}
+        self._stages = {name: (dependencies, func) for name, dependencies, func in stages}
+        self._results = dict(inputs or {})
+        self._publish = publish
+        self._forgotten = set()
+        self._done = {name: threading.Event() for name in self._stages}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pipeline')
+        self._started = time.perf_counter()
+        self._finished = None
+        self._submit_ready()
+
+    def _submit_ready(self):
+        with self._lock:
+            changed = True
+            while changed:
+                changed = False
+                for name, (dependencies, func) in self._stages.items():
+                    if self.status[name] != STAGE_PENDING:
+                        continue
+                    states = [self.status.get(dep, STAGE_READY if dep in self._results else STAGE_SKIPPED) for dep in dependencies]
+                    if any(state in (STAGE_FAILED, STAGE_SKIPPED) for state in states):
+                        self.status[name] = STAGE_SKIPPED
+                        self._done[name].set()
+                        changed = True
+                    elif all(state == STAGE_READY for state in states):
+                        self.status[name] = STAGE_RUNNING
+                        self._executor.submit(self._run, name)
+            if not self.running and self._finished is None:
+                self._finished = time.perf_counter()
+                self._executor.shutdown(wait=False)
+
+    def _run(self, name):
+        dependencies, func = self._stages[name]
+        start = time.perf_counter()
+        try:
+            value = func({dep: self._results[dep] for dep in dependencies})
+        except Exception as e:
+            with self._lock:
+                self.status[name] = STAGE_FAILED
+                self.errors[name] = e
+        else:
+            with self._lock:
+                self._results[name] = value
+                self.status[name] = STAGE_READY
+                if name not in self._forgotten:
+                    self._publish(name, value)
+        self.seconds[name] = time.perf_counter() - start
+        self._done[name].set()
+        self._submit_ready()
+
+    def pending(self, name):
+        """该步骤是否还在等待或计算中（结果之后会被发布）"""
+        return name in self._done and not self._done[name].is_set() and name not in self._forgotten
+
+    def wait(self, name, timeout=None):
+        """等待某一步骤结束（不论成败）"""
+        if name in self._done:
+            self._done[name].wait(timeout)
+
+    def forget(self, names):
+        """这些步骤的结果已经过时（依赖的设置变化），之后完成时不再发布"""
+        with self._lock:
+            self._forgotten.update(name for name in names if name in self._stages)
+
+    def cancel(self):
+        """不再开始尚未执行的步骤（正在计算的步骤会算完，但结果不再发布）"""
+        with self._lock:
+            self._forgotten.update(self._stages)
+            for name, state in self.status.items():
+                if state == STAGE_PENDING:
+                    self.status[name] = STAGE_SKIPPED
+                    self._done[name].set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._submit_ready()
+
+    @property
+    def running(self):
+        return any(state in (STAGE_PENDING, STAGE_RUNNING) for state in self.status.values())
+
+    @property
+    def elapsed(self):
+        """从开始到所有步骤结束（或到现在）的秒数"""
+        return (self._finished or time.perf_counter()) - self._started
+
+
+def _get_jobs():
+    if 'background_jobs' not in st.session_state:
+        st.session_state.background_jobs = {}
+    return st.session_state.background_jobs
+
+
+def start_job(key, target, signature=None):
+    """启动后台任务并按 key 保存在 session_state 中，同一 key 上仍在运行的旧任务会被取消"""
+    jobs = _get_jobs()
+    previous = jobs.get(key)
+    if previous is not None and previous.running:
+        previous.cancel()
+    jobs[key] = BackgroundJob(target, name=f'job-{key}', signature=signature)
+    return jobs[key]
+
+
+def get_job(key):
+    return _get_jobs().get(key)
+
+
+def cancel_job(key):
+    job = get_job(key)
+    if job is not None:
+        job.cancel()
+
+
+def clear_job(key):
+    """结果已被取走后移除任务"""
+    _get_jobs().pop(key, None)
+
+
+def wait_for_job(job, label, placeholder=None):
+    """在占位区域显示进度条，直到任务结束
+
+    等待期间用户的任何操作都会中断本次脚本运行并触发重新运行，页面不会被卡住；
+    任务本身在工作线程中继续执行，下一次运行时重新接上进度。
+    """
+    placeholder = placeholder or st.empty()
+    while job.running:
+        text = f"{label}：{job.message}" if job.message else label
+        placeholder.progress(job.progress, text=text)
+        time.sleep(POLL_INTERVAL)
+    placeholder.empty()
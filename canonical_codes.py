@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+# 取值标准化：上传时把心理评测等级、四六级、帮助需求等列整列转换为标准代码，
+# 单个学生页面和群体筛选直接读取代码，不再逐个学生做字符串判断
+
+# 心理评测等级 -> 等级代码 (3 良好, 2 一般, 1 较差；0 表示无数据或无法识别)
+PSYCH_LEVEL_LOOKUP = {
+    **{value: 3 for value in ['3级', '3', 'III级', 'III', '三级', '良好']},
+    **{value: 2 for value in ['2级', '2', 'II级', 'II', '二级', '一般']},
+    **{value: 1 for value in ['1级', '1', 'I级', 'I', '一级', '较差', '差']}
+}
+# 四六级以分数记录时的通过线，以文字记录时视为通过的取值
+CET_PASS_SCORE = 425
+CET_PASS_VALUES = {'是', 'yes', 'true', '1', 'pass', '通过'}
+# "有无需要学院协助解决的困难"中表示没有困难的取值
+NO_HELP_VALUES = ['无', 'nan', 'none', '']
+
+PSYCH_COLUMN_CANDIDATES = ['心理评测等级', '最新心理等级', '心理等级']
+CET4_COLUMN_CANDIDATES = ['是否过四级', '四级成绩']
+CET6_COLUMN_CANDIDATES = ['是否过六级', '六级成绩']
+HELP_COLUMN = '有无需要学院协助解决的困难'
+
+
+def first_existing_column(df, candidates):
+    """按优先级返回第一个存在的列名（与 student_data.get(a, student_data.get(b)) 的取值顺序一致）"""
+    return next((col for col in candidates if col in df.columns), None)
+
+
+def _normalized_strings(series):
+    """去掉前后空格，并把 3.0 这类整数浮点数写成 3"""
+    return series.astype(str).str.strip().str.replace(r'^(\d+)\.0$', r'\1', regex=True)
+
+
+def _lookup(series, table, default):
+    """按唯一值建查找表后整列映射：只对不同取值做一次字典查找"""
+    codes, uniques = pd.factorize(series)
+    values = np.array([table.get(value, default) for value in uniques] + [default])
+    return values[codes]  # factorize 把缺失值编码为 -1，正好取到末尾的 default
+
+
+def psych_level_codes(series):
+    """心理评测等级代码数组 (int8)"""
+    return _lookup(_normalized_strings(series).mask(series.isna()), PSYCH_LEVEL_LOOKUP, 0).astype(np.int8)
+
+
+def cet_status(series):
+    """四六级：返回 (是否通过, 分数)；数值按 425 分判断，文字按通过取值判断，空值视为未通过"""
+    scores = pd.to_numeric(series, errors='coerce').to_numpy(dtype=float)
+    text_passed = _lookup(series.astype(str).str.lower().mask(series.isna()),
+                          {value: True for value in CET_PASS_VALUES}, False).astype(bool)
+    with np.errstate(invalid='ignore'):
+        passed = np.where(np.isnan(scores), text_passed, scores >= CET_PASS_SCORE)
+    return passed.astype(bool), scores
+
+
+def help_needed_flags(series):
+    """是否需要学院协助：非空、非 0/False，且不是'无'、'nan'、'none'、空串"""
+    lowered = series.astype(str).str.lower()
+    flags = series.notna() & ~lowered.isin(NO_HELP_VALUES) & ~series.isin([0, False])
+    return flags.to_numpy(dtype=bool)
+
+
+def build_canonical_codes(df):
+    """对整张表一次性计算标准代码，返回与行号对齐的数组 dict"""
+    num_rows = len(df)
+    psych_column = first_existing_column(df, PSYCH_COLUMN_CANDIDATES)
+    codes = {
+        'psych_level': psych_level_codes(df[psych_column]) if psych_column else np.zeros(num_rows, dtype=np.int8),
+        'help_needed': help_needed_flags(df[HELP_COLUMN]) if HELP_COLUMN in df.columns else np.zeros(num_rows, dtype=bool)
+    }
+    for prefix, candidates in [('cet4', CET4_COLUMN_CANDIDATES), ('cet6', CET6_COLUMN_CANDIDATES)]:
+        column = first_existing_column(df, candidates)
+        if column:
+            codes[f'{prefix}_passed'], codes[f'{prefix}_score'] = cet_status(df[column])
+        else:
+            codes[f'{prefix}_passed'], codes[f'{prefix}_score'] = np.zeros(num_rows, dtype=bool), np.full(num_rows, np.nan)
+    return codes
+
+
+def canonical_filter_columns(codes):
+    """供组合筛选使用的标准化字段（中文列名，布尔值显示为 是/否）"""
+    yes_no = np.array(['否', '是'])
+    return pd.DataFrame({
+        '心理评测等级(标准)': np.where(codes['psych_level'] > 0, codes['psych_level'].astype(str), '无'),
+        '需要学院协助': yes_no[codes['help_needed'].astype(int)],
+        '四级已通过': yes_no[codes['cet4_passed'].astype(int)],
+        '四级分数': codes['cet4_score'],
+        '六级已通过': yes_no[codes['cet6_passed'].astype(int)],
+        '六级分数': codes['cet6_score']
+    })
@@ -0,0 +1,258 @@
+import re
+import numpy as np
+import pandas as pd
+
+# 群体分析工具：一次性把整张表的成绩列转成 NumPy 矩阵，供群体视图复用
+
+chinese_to_num_map = {'一': 1, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9, '十': 10}
+def get_year_sort_key(year_str_input):
+    # Extracts the Chinese numeral part if present e.g. "一" from "第一学年"
+    year_str = str(year_str_input).replace("第","").replace("学年","")
+    return chinese_to_num_map.get(year_str, int(year_str) if year_str.isdigit() else 999)
+
+# 雷达图的五个维度及默认归一化参数 (预设最小值, 预设最大值)，与 app2.py 单个学生雷达图一致
+RADAR_FIELDS = ['德育', '智育', '体测成绩', '附加分', '综测总分']
+DEFAULT_NORMALIZATION_PARAMS = {
+    '德育': (12, 15), '智育': (15, 80), '体测成绩': (15, 110),
+    '附加分': (-1, 6), '综测总分': (20, 100)
+}
+
+# 可能的班级列名（按优先级）
+CLASS_COLUMN_CANDIDATES = ['新班级', '班级', '原班级', '班级_基本信息', '班 级', '班 级_基本信息']
+
+SEMESTER_GPA_PATTERN = re.compile(r'第([一二三四五六七八九十\d]+)学期绩点$')
+YEAR_FIELD_PATTERN = re.compile(r'第([一二三四五六七八\d]+)学年(德育|智育|体测成绩|体测评级|附加分|综测总分)$')
+YEAR_POVERTY_PATTERN = re.compile(r'第([一二三四五六七八\d]+)学年困难等级$')
+
+
+def build_schema_index(columns):
+    """扫描一次列名，得到学期绩点列、各学年综测列和困难等级列的位置"""
+    semester_columns = []
+    year_fields = {}
+    poverty_columns = {}
+    for column in columns:
+        name = str(column)
+        match = SEMESTER_GPA_PATTERN.match(name)
+        if match:
+            semester_columns.append((get_year_sort_key(match.group(1)), f'第{match.group(1)}学期', column))
+            continue
+        match = YEAR_FIELD_PATTERN.match(name)
+        if match:
+            year_fields.setdefault(match.group(1), {})[match.group(2)] = column
+            continue
+        match = YEAR_POVERTY_PATTERN.match(name)
+        if match:
+            poverty_columns[match.group(1)] = column
+    semester_columns.sort(key=lambda item: item[0])
+    class_column = next((col for col in CLASS_COLUMN_CANDIDATES if col in columns), None)
+    return {
+        'semesters': [label for _, label, _ in semester_columns],
+        'semester_columns': [column for _, _, column in semester_columns],
+        'years': sorted(year_fields.keys(), key=get_year_sort_key),
+        'year_fields': year_fields,
+        'poverty_columns': poverty_columns,
+        'class_column': class_column
+    }
+
+
+def numeric_column(df, column):
+    """把一列转换为 float 数组，'无'、'缺考'等非数字内容记为 NaN"""
+    if column is None or column not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float)
+
+
+def build_radar_raw(df, schema_index):
+    """全体学生各学年五个维度的原始得分，形状 (学生数, 学年数, 维度数)，缺失为 NaN"""
+    years = schema_index['years']
+    raw = np.full((len(df), len(years), len(RADAR_FIELDS)), np.nan)
+    for year_idx, year in enumerate(years):
+        fields = schema_index['year_fields'][year]
+        for field_idx, field in enumerate(RADAR_FIELDS):
+            if field in fields:
+                raw[:, year_idx, field_idx] = numeric_column(df, fields[field])
+    return raw
+
+
+def normalization_bounds(years, normalization_params=None, year_overrides=None):
+    """各学年各维度的归一化范围 (mins, maxs)，形状均为 (学年数, 维度数)
+
+    normalization_params 为 {维度: (最小值, 最大值)}，year_overrides 为 {学年: {维度: (最小值, 最大值)}}，
+    后者覆盖前者中对应学年的维度。
+    """
+    params = normalization_params or DEFAULT_NORMALIZATION_PARAMS
+    field_bounds = np.array([params.get(field, (0, 100)) for field in RADAR_FIELDS], dtype=float)
+    bounds = np.repeat(field_bounds[np.newaxis], len(years), axis=0)
+    for year_idx, year in enumerate(years):
+        for field, field_range in (year_overrides or {}).get(year, {}).items():
+            bounds[year_idx, RADAR_FIELDS.index(field)] = field_range
+    return bounds[:, :, 0], bounds[:, :, 1]
+
+
+def normalize_scores(raw, mins, maxs):
+    """按范围把原始得分换算为 0-100，超出范围的截断，缺失或非数字记为 0"""
+    return np.nan_to_num(np.clip((raw - mins) / (maxs - mins) * 100, 0, 100), nan=0.0)
+
+
+def build_radar_matrix(df, schema_index, normalization_params=None, raw=None, year_overrides=None):
+    """构建全体学生的雷达图矩阵
+
+    返回的 raw / normalized 形状均为 (学生数, 学年数, 维度数)，维度顺序同 RADAR_FIELDS；
+    缺失或非数字的得分归一化后记为 0（与单个学生雷达图的处理相同），
+    valid 标记该学年'综测总分'是否有效（无效时单个学生页面不显示该学年雷达图），
+    mins / maxs 为归一化时使用的各学年各维度范围（见 normalization_bounds）。
+    raw 可以传入已有的原始得分（如多进程共享的内存映射矩阵），此时不再从 df 中读取。
+    """
+    years = schema_index['years']
+    if raw is None:
+        raw = build_radar_raw(df, schema_index)
+
+    mins, maxs = normalization_bounds(years, normalization_params, year_overrides)
+    valid = ~np.isnan(raw[:, :, RADAR_FIELDS.index('综测总分')])
+    return {
+        'years': years,
+        'fields': list(RADAR_FIELDS),
+        'raw': raw,
+        'normalized': normalize_scores(raw, mins[np.newaxis], maxs[np.newaxis]),
+        'valid': valid,
+        'mins': mins,
+        'maxs': maxs
+    }
+
+
+def renormalize_radar_matrix(matrix, mins, maxs):
+    """把雷达图矩阵改为按新的范围归一化，只重算范围有变化的 (学年, 维度)，返回这些 (学年序号, 维度序号)"""
+    changed = [tuple(pair) for pair in np.argwhere((matrix['mins'] != mins) | (matrix['maxs'] != maxs))]
+    for year_idx, field_idx in changed:
+        matrix['normalized'][:, year_idx, field_idx] = normalize_scores(
+            matrix['raw'][:, year_idx, field_idx], mins[year_idx, field_idx], maxs[year_idx, field_idx]
+        )
+    matrix['mins'], matrix['maxs'] = mins.copy(), maxs.copy()
+    return changed
+
+
+# 绩点轨迹分类：按学生自己的拟合斜率（每学期变化量）划分，|斜率| 不超过 TRAJECTORY_STABLE_SLOPE 为平稳
+TRAJECTORY_LABELS = ['下降', '平稳', '上升']
+TRAJECTORY_INSUFFICIENT = '数据不足'
+TRAJECTORY_STABLE_SLOPE = 0.1
+
+
+def build_gpa_matrix(df, schema_index):
+    """全体学生的学期绩点矩阵，形状 (学生数, 学期数)，缺失为 NaN"""
+    columns = schema_index['semester_columns']
+    matrix = np.full((len(df), len(columns)), np.nan)
+    for semester_idx, column in enumerate(columns):
+        matrix[:, semester_idx] = numeric_column(df, column)
+    return matrix
+
+
+def trajectory_categories(slope):
+    """按斜率的固定阈值返回类别编号 (0 下降, 1 平稳, 2 上升)"""
+    return np.select([slope < -TRAJECTORY_STABLE_SLOPE, slope > TRAJECTORY_STABLE_SLOPE], [0, 2], default=1)
+
+
+def compute_gpa_trajectories(gpa_matrix):
+    """一次性计算所有学生的绩点斜率、波动、最大降幅及轨迹类别
+
+    斜率为对各有效学期做最小二乘拟合的每学期变化量；波动为相邻有效学期变化量的标准差；
+    最大降幅为相邻有效学期间的最大下降值（无下降为 0）。轨迹类别按斜率的固定阈值划分，
+    有效学期不足 2 个的学生记为'数据不足'。
+    """
+    num_students, num_semesters = gpa_matrix.shape
+    valid = ~np.isnan(gpa_matrix)
+    counts = valid.sum(axis=1)
+    positions = np.arange(1, num_semesters + 1, dtype=float)
+
+    # 带缺失值的逐行最小二乘斜率
+    x = np.where(valid, positions, 0.0)
+    y = np.where(valid, gpa_matrix, 0.0)
+    sum_x, sum_y = x.sum(axis=1), y.sum(axis=1)
+    sum_xx, sum_xy = (x * x).sum(axis=1), (x * y).sum(axis=1)
+    denominator = counts * sum_xx - sum_x ** 2
+    enough = counts >= 2
+    slope = np.full(num_students, np.nan)
+    slope[enough] = (counts[enough] * sum_xy[enough] - sum_x[enough] * sum_y[enough]) / denominator[enough]
+
+    # 相邻有效学期之间的变化量（跳过中间缺失的学期）
+    last_valid = np.maximum.accumulate(np.where(valid, np.arange(num_semesters), -1), axis=1)
+    previous_valid = np.concatenate([np.full((num_students, 1), -1), last_valid[:, :-1]], axis=1)
+    has_previous = valid & (previous_valid >= 0)
+    previous_values = np.take_along_axis(gpa_matrix, np.clip(previous_valid, 0, None), axis=1)
+    changes = np.where(has_previous, gpa_matrix - previous_values, np.nan)
+    has_change = has_previous.any(axis=1)
+
+    volatility = np.full(num_students, np.nan)
+    largest_drop = np.full(num_students, np.nan)
+    if has_change.any():
+        change_rows = changes[has_change]
+        volatility[has_change] = np.nanstd(change_rows, axis=1)
+        largest_drop[has_change] = np.clip(np.nanmax(-change_rows, axis=1), 0, None)
+
+    first_values = np.take_along_axis(gpa_matrix, valid.argmax(axis=1)[:, None], axis=1)[:, 0]
+    last_values = np.take_along_axis(gpa_matrix, np.clip(last_valid[:, -1], 0, None)[:, None], axis=1)[:, 0]
+    net_change = np.where(enough, last_values - first_values, np.nan)
+
+    category = np.full(num_students, -1)
+    category[enough] = trajectory_categories(slope[enough])
+    labels = np.array(TRAJECTORY_LABELS + [TRAJECTORY_INSUFFICIENT], dtype=object)[category]
+
+    with np.errstate(invalid='ignore'):
+        mean_gpa = np.where(counts > 0, y.sum(axis=1) / np.maximum(counts, 1), np.nan)
+    return {
+        'semester_count': counts,
+        'mean_gpa': mean_gpa,
+        'slope': slope,
+        'volatility': volatility,
+        'largest_drop': largest_drop,
+        'net_change': net_change,
+        'trajectory': category,
+        'label': labels
+    }
+
+
+# 分组分布对比：直方图分箱数
+DISTRIBUTION_BINS = 20
+BOX_STAT_NAMES = ['人数', '平均', '最低', '下四分位', '中位数', '上四分位', '最高', '下须', '上须']
+
+
+def _box_stats(sorted_values):
+    """已排序数组的箱线图统计（须线取 1.5 倍四分位距以内的最远数据点）"""
+    if len(sorted_values) == 0:
+        return [0] + [np.nan] * (len(BOX_STAT_NAMES) - 1)
+    q1, median, q3 = np.quantile(sorted_values, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    inside = sorted_values[(sorted_values >= q1 - 1.5 * iqr) & (sorted_values <= q3 + 1.5 * iqr)]
+    return [len(sorted_values), sorted_values.mean(), sorted_values[0], q1, median, q3, sorted_values[-1],
+            inside[0], inside[-1]]
+
+
+def binned_group_distribution(values, group_codes, num_groups, bins=DISTRIBUTION_BINS):
+    """按组预先分箱，得到各组直方图计数和箱线图统计，画图时不必把每个原始值传给 Plotly
+
+    values 为与行号对齐的 float 数组（NaN 为缺失），group_codes 为组编号（-1 表示不参与统计）；
+    各组共用同一组分箱边界，便于并排比较。返回 edges (bins+1,)、counts (组数, bins)、stats (组数, 统计项)。
+    """
+    valid = ~np.isnan(values) & (group_codes >= 0)
+    group_values, codes = values[valid], group_codes[valid]
+    low, high = (group_values.min(), group_values.max()) if len(group_values) else (0.0, 1.0)
+    if high <= low:
+        high = low + 1.0
+    edges = np.linspace(low, high, bins + 1)
+    bin_idx = np.clip(np.searchsorted(edges, group_values, side='right') - 1, 0, bins - 1)
+    counts = np.bincount(codes * bins + bin_idx, minlength=num_groups * bins).reshape(num_groups, bins)
+
+    # 按 (组, 值) 排序一次，各组的分位数在有序切片上计算
+    order = np.lexsort((group_values, codes))
+    sorted_values = group_values[order]
+    bounds = np.searchsorted(codes[order], np.arange(num_groups + 1))
+    stats = np.array([_box_stats(sorted_values[bounds[i]:bounds[i + 1]]) for i in range(num_groups)], dtype=float)
+    return {'edges': edges, 'counts': counts, 'stats': stats.reshape(num_groups, len(BOX_STAT_NAMES))}
+
+
+def group_rates(flags, group_codes, num_groups):
+    """各组中 flags 为 True 的比例（0-100），空组为 NaN"""
+    in_group = group_codes >= 0
+    totals = np.bincount(group_codes[in_group], minlength=num_groups)
+    hits = np.bincount(group_codes[in_group], weights=flags[in_group].astype(float), minlength=num_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(totals > 0, hits / totals * 100, np.nan)
@@ -0,0 +1,179 @@
+import csv
+import io
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+import streamlit as st
+from background_jobs import cancel_job, get_job, start_job, wait_for_job
+from canonical_codes import build_canonical_codes
+from cohort_analysis import (
+    build_schema_index, compute_gpa_trajectories
+)
+from radar_settings import get_radar_matrix
+from shared_matrix import get_score_blocks
+from session_cache import get_dataset_artifact, get_dataset_token
+
+# 导出：把当前筛选结果连同派生指标分块写成 Excel / CSV，文件在后台线程中写到临时文件，
+# 内存中只保留当前这一块数据；下载按钮显示时再一次读出文件内容
+
+# 每次写入的行数（逐块取出原始数据和派生指标，不在内存中拼出整张导出表）
+EXPORT_CHUNK_ROWS = 2000
+EXPORT_FORMATS = {
+    'Excel (.xlsx)': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'CSV (.csv)': ('csv', 'text/csv')
+}
+# 导出时标记的风险项
+RISK_FLAGS = ['有挂科', '绩点下降', '心理关注', '需要协助']
+# 相邻学期绩点下降超过该值记为"绩点下降"风险
+GPA_DROP_RISK = 0.5
+
+
+def percentile_rank(values):
+    """百分位排名（0-100，越大越靠前），缺失值保持为 NaN"""
+    return (pd.Series(values).rank(pct=True) * 100).round(1).to_numpy()
+
+
+def build_export_metrics(df, radar_matrix, trajectories, canonical_codes):
+    """整个数据集的派生指标列（与行号对齐），每个数据集只计算一次"""
+    metrics = {}
+    # 各学年归一化后的雷达得分（综测总分无效的学年留空）
+    for year_idx, year in enumerate(radar_matrix['years']):
+        valid = radar_matrix['valid'][:, year_idx]
+        for field_idx, field in enumerate(radar_matrix['fields']):
+            normalized = radar_matrix['normalized'][:, year_idx, field_idx]
+            metrics[f'第{year}学年{field}(归一化)'] = np.where(valid, normalized, np.nan).round(1)
+
+    metrics['平均绩点'] = trajectories['mean_gpa'].round(2)
+    metrics['平均绩点百分位'] = percentile_rank(trajectories['mean_gpa'])
+    if radar_matrix['years']:
+        # 最近一个有成绩的学年的综测总分
+        total_scores = radar_matrix['raw'][:, :, radar_matrix['fields'].index('综测总分')]
+        latest_total = pd.DataFrame(total_scores).ffill(axis=1).iloc[:, -1].to_numpy()
+        metrics['最近学年综测总分'] = latest_total
+        metrics['综测总分百分位'] = percentile_rank(latest_total)
+    metrics['绩点轨迹'] = trajectories['label']
+
+    # 风险标记：各项布尔值按位编码后查表得到文字，避免逐行拼接字符串
+    failed = pd.to_numeric(df['挂科'], errors='coerce').to_numpy() > 0 if '挂科' in df.columns else np.zeros(len(df), dtype=bool)
+    with np.errstate(invalid='ignore'):
+        gpa_drop = (trajectories['label'] == '下降') | (trajectories['largest_drop'] >= GPA_DROP_RISK)
+    flags = np.column_stack([failed, gpa_drop, canonical_codes['psych_level'] == 1, canonical_codes['help_needed']])
+    bitmask = flags.astype(np.int64) @ (1 << np.arange(len(RISK_FLAGS)))
+    lookup = np.array([
+        '、'.join(flag for bit, flag in enumerate(RISK_FLAGS) if code >> bit & 1)
+        for code in range(1 << len(RISK_FLAGS))
+    ], dtype=object)
+    metrics['风险标记'] = lookup[bitmask]
+    return pd.DataFrame(metrics)
+
+
+def get_export_metrics(df):
+    """读取（必要时计算）当前数据集的派生指标，复用雷达图、绩点轨迹等已缓存的结果"""
+    schema_index = get_dataset_artifact('schema_index', lambda: build_schema_index(df.columns))
+    radar_matrix = get_radar_matrix(df, schema_index)
+    trajectories = get_dataset_artifact(
+        'gpa_trajectories', lambda: compute_gpa_trajectories(get_score_blocks(df, schema_index)['gpa'])
+    )
+    canonical_codes = get_dataset_artifact('canonical_codes', lambda: build_canonical_codes(df))
+    return get_dataset_artifact(
+        'export_metrics', lambda: build_export_metrics(df, radar_matrix, trajectories, canonical_codes)
+    )
+
+
+def iter_export_chunks(df, metrics, positions, job=None):
+    """按块产出导出数据（原始列 + 派生指标列），并汇报进度"""
+    total = len(positions)
+    for start in range(0, max(total, 1), EXPORT_CHUNK_ROWS):
+        rows = positions[start:start + EXPORT_CHUNK_ROWS]
+        chunk = pd.concat([
+            df.iloc[rows].reset_index(drop=True),
+            metrics.iloc[rows].reset_index(drop=True)
+        ], axis=1)
+        if job is not None:
+            job.report(start / max(total, 1), f"已写入 {start} / {total} 行")
+        yield chunk
+
+
+def write_csv(df, metrics, positions, output, job=None):
+    """分块写出 CSV 到二进制文件 output（UTF-8 BOM，Excel 可直接打开中文）"""
+    text = io.TextIOWrapper(output, encoding='utf-8-sig', newline='')
+    for i, chunk in enumerate(iter_export_chunks(df, metrics, positions, job)):
+        chunk.to_csv(text, header=i == 0, index=False, quoting=csv.QUOTE_MINIMAL)
+    text.flush()
+    text.detach()
+
+
+def write_xlsx(df, metrics, positions, output, job=None):
+    """用 openpyxl 的只写模式逐行写出 xlsx 到二进制文件 output，工作表不会整表驻留内存"""
+    from openpyxl import Workbook  # 只在导出 xlsx 时导入
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('筛选结果')
+    for i, chunk in enumerate(iter_export_chunks(df, metrics, positions, job)):
+        if i == 0:
+            sheet.append([str(col) for col in chunk.columns])
+        # NaN 写入 Excel 会变成错误值，统一写为空单元格
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            sheet.append(row)
+    workbook.save(output)
+
+
+def write_export_file(writer, extension, df, metrics, positions, job):
+    """在工作线程中把导出内容写到临时文件，返回文件路径；写入失败或被取消时删除临时文件"""
+    output = tempfile.NamedTemporaryFile(prefix='student_export_', suffix=f'.{extension}', delete=False)
+    try:
+        with output:
+            writer(df, metrics, positions, output, job)
+        job.report(1.0, "写入完成")
+    except BaseException:
+        os.unlink(output.name)
+        raise
+    return output.name
+
+
+def _remove_export_file(job):
+    if job is not None and not job.running and job.result is not None and os.path.exists(job.result):
+        os.unlink(job.result)
+
+
+def _start_export(df, positions, file_format, signature):
+    metrics = get_export_metrics(df)
+    extension = EXPORT_FORMATS[file_format][0]
+    writer = write_xlsx if extension == 'xlsx' else write_csv
+    # 上一次已完成的导出文件不再使用（仍在运行的旧任务被取消后自行删除临时文件）
+    _remove_export_file(get_job('export'))
+    start_job('export', lambda job: write_export_file(writer, extension, df, metrics, positions, job), signature=signature)
+
+
+def render_export_panel(df, positions, file_stem='学生数据'):
+    """导出当前筛选结果：后台生成文件，完成后显示下载按钮"""
+    with st.expander(f"📤 导出筛选结果（{len(positions)} 人）"):
+        file_format = st.radio("导出格式", options=list(EXPORT_FORMATS), horizontal=True, key='export_format')
+        extension, mime = EXPORT_FORMATS[file_format]
+        signature = (get_dataset_token(), file_format, len(positions), hash(positions.tobytes()))
+        st.caption("包含原始数据以及归一化综测得分、平均绩点、百分位排名和风险标记等派生列")
+
+        job = get_job('export')
+        if job is not None and job.signature != signature:
+            job = None  # 筛选条件或格式已变化，旧文件不再适用
+        st.button(
+            "生成导出文件", key='export_start', disabled=job is not None and job.running,
+            on_click=_start_export, args=(df, positions, file_format, signature)
+        )
+        if job is None:
+            return
+        if job.running:
+            st.button("取消导出", key='export_cancel', on_click=cancel_job, args=('export',))
+            wait_for_job(job, "正在生成导出文件")
+        if job.error is not None:
+            st.error(f"❌ 导出失败: {job.error}")
+        elif job.cancelled:
+            st.info("导出已取消")
+        elif job.result is not None:
+            # 下载按钮从临时文件一次读出内容
+            with open(job.result, 'rb') as f:
+                st.download_button(
+                    f"⬇️ 下载 {extension.upper()} 文件", data=f,
+                    file_name=f"{file_stem}_筛选结果_{len(positions)}人.{extension}", mime=mime, key='export_download'
+                )
@@ -0,0 +1,186 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# 组合筛选：把"字段 条件 取值"形式的多个条件编译为一个布尔掩码
+
+NUMERIC_OPERATORS = ['=', '≠', '>', '≥', '<', '≤']
+CATEGORY_OPERATORS = ['=', '≠', '属于', '不属于']
+SET_OPERATORS = ('属于', '不属于')
+
+# 数值型字段的判定：非空值中至少这一比例能解析为数字
+NUMERIC_COLUMN_RATIO = 0.8
+# 组合结果缓存的条数上限
+MAX_COMPILED_CACHE = 64
+
+
+def normalize_category_values(series):
+    """把一列转换为去空格的字符串，空值、'nan'、'none'和空串统一记为'无'"""
+    values = series.astype(str).str.strip()
+    empty = series.isna() | values.str.lower().isin(['nan', 'none', ''])
+    return values.mask(empty, '无')
+
+
+class FilterEngine:
+    """对一个数据集编译组合筛选条件
+
+    每个条件的结果以位图 (np.packbits) 缓存；多个条件按前缀缓存按位与的结果，
+    因此在已有条件后面再添加一个条件，只需与新条件的位图再做一次按位与。
+    """
+
+    def __init__(self, df, derived_columns=None):
+        self.num_rows = len(df)
+        # 字段名 -> (所在的表, 原始列名)；derived_columns 为与行号对齐的派生字段（如标准化代码）
+        self._column_lookup = {str(col): (df, col) for col in df.columns}
+        if derived_columns is not None:
+            self._column_lookup.update({str(col): (derived_columns, col) for col in derived_columns.columns})
+        self.columns = list(self._column_lookup)
+        self._typed_columns = {}
+        self._predicate_bits = {}
+        self._compiled_bits = {}
+
+    def _typed_column(self, column):
+        """按需把列转换为类型化数组：数值列为 float 数组，其余为分类编码"""
+        if column not in self._typed_columns:
+            frame, source_column = self._column_lookup[column]
+            series = frame[source_column]
+            numeric = pd.to_numeric(series, errors='coerce')
+            non_null = int(series.notna().sum())
+            if non_null and numeric.notna().sum() >= NUMERIC_COLUMN_RATIO * non_null:
+                self._typed_columns[column] = ('numeric', numeric.to_numpy(dtype=float))
+            else:
+                codes, uniques = pd.factorize(normalize_category_values(series), sort=True)
+                lookup = {value: code for code, value in enumerate(uniques)}
+                self._typed_columns[column] = ('category', (codes, list(uniques), lookup))
+        return self._typed_columns[column]
+
+    def column_kind(self, column):
+        """'numeric' 或 'category'"""
+        return self._typed_column(column)[0]
+
+    def category_values(self, column):
+        """分类字段的全部取值（已排序）"""
+        kind, data = self._typed_column(column)
+        return data[1] if kind == 'category' else []
+
+    def _evaluate(self, condition):
+        """计算单个条件的布尔数组"""
+        column, operator, value = condition
+        if column not in self._column_lookup:
+            return np.zeros(self.num_rows, dtype=bool)
+        kind, data = self._typed_column(column)
+        if kind == 'numeric':
+            target = float(value)
+            with np.errstate(invalid='ignore'):
+                if operator == '=':
+                    return data == target
+                if operator == '≠':
+                    return ~(data == target)
+                if operator == '>':
+                    return data > target
+                if operator == '≥':
+                    return data >= target
+                if operator == '<':
+                    return data < target
+                if operator == '≤':
+                    return data <= target
+        else:
+            codes, _, lookup = data
+            targets = value if operator in SET_OPERATORS else (value,)
+            target_codes = [lookup[item] for item in targets if item in lookup]
+            matched = np.isin(codes, target_codes)
+            return ~matched if operator in ('≠', '不属于') else matched
+        raise ValueError(f"不支持的筛选条件: {operator}")
+
+    def predicate_bits(self, condition):
+        """单个条件的位图，计算一次后缓存"""
+        if condition not in self._predicate_bits:
+            self._predicate_bits[condition] = np.packbits(self._evaluate(condition))
+        return self._predicate_bits[condition]
+
+    def _compile_bits(self, conditions):
+        if conditions in self._compiled_bits:
+            return self._compiled_bits[conditions]
+        if len(conditions) == 1:
+            bits = self.predicate_bits(conditions[0])
+        else:
+            bits = np.bitwise_and(self._compile_bits(conditions[:-1]), self.predicate_bits(conditions[-1]))
+        if len(self._compiled_bits) >= MAX_COMPILED_CACHE:
+            self._compiled_bits.pop(next(iter(self._compiled_bits)))
+        self._compiled_bits[conditions] = bits
+        return bits
+
+    def compile(self, conditions):
+        """把条件列表（按 AND 组合）编译为长度等于行数的布尔掩码"""
+        conditions = tuple(conditions)
+        if not conditions:
+            return np.ones(self.num_rows, dtype=bool)
+        return np.unpackbits(self._compile_bits(conditions), count=self.num_rows).astype(bool)
+
+
+def describe_condition(condition):
+    """条件的显示文本，例如 '挂科 > 0'"""
+    column, operator, value = condition
+    if operator in SET_OPERATORS:
+        value = '、'.join(value)
+    elif isinstance(value, float):
+        value = f"{value:g}"
+    return f"{column} {operator} {value}"
+
+
+def _add_condition(state_key, condition):
+    if condition not in st.session_state[state_key]:
+        st.session_state[state_key].append(condition)
+
+
+def _remove_condition(state_key, index):
+    st.session_state[state_key].pop(index)
+
+
+def _clear_conditions(state_key):
+    st.session_state[state_key] = []
+
+
+def render_filter_builder(engine, key_prefix='filter'):
+    """组合筛选器界面：条件保存在 session_state 中，返回编译后的布尔掩码"""
+    state_key = f'{key_prefix}_conditions'
+    if state_key not in st.session_state:
+        st.session_state[state_key] = []
+    # 换了数据集后丢弃引用不存在字段的条件
+    conditions = [cond for cond in st.session_state[state_key] if cond[0] in engine.columns]
+    st.session_state[state_key] = conditions
+
+    with st.expander(f"🧰 组合筛选（已添加 {len(conditions)} 个条件）", expanded=bool(conditions)):
+        col1, col2, col3, col4 = st.columns([2, 1, 2, 1])
+        with col1:
+            column = st.selectbox("字段", options=engine.columns, key=f'{key_prefix}_column')
+        kind = engine.column_kind(column)
+        with col2:
+            operator = st.selectbox(
+                "条件", options=NUMERIC_OPERATORS if kind == 'numeric' else CATEGORY_OPERATORS,
+                key=f'{key_prefix}_operator_{kind}'
+            )
+        with col3:
+            if kind == 'numeric':
+                value = float(st.number_input("取值", value=0.0, key=f'{key_prefix}_number'))
+            elif operator in SET_OPERATORS:
+                value = tuple(st.multiselect("取值", options=engine.category_values(column), key=f'{key_prefix}_values'))
+            else:
+                value = st.selectbox("取值", options=engine.category_values(column), key=f'{key_prefix}_value')
+        with col4:
+            st.markdown("<div style='height: 1.75rem;'></div>", unsafe_allow_html=True)
+            st.button(
+                "添加条件", key=f'{key_prefix}_add', disabled=value is None or value == (),
+                on_click=_add_condition, args=(state_key, (column, operator, value))
+            )
+
+        for i, condition in enumerate(conditions):
+            cond_col, remove_col = st.columns([5, 1])
+            with cond_col:
+                st.markdown(f"`{describe_condition(condition)}`")
+            with remove_col:
+                st.button("✖ 删除", key=f'{key_prefix}_remove_{i}', on_click=_remove_condition, args=(state_key, i))
+        if conditions:
+            st.button("清空全部条件", key=f'{key_prefix}_clear', on_click=_clear_conditions, args=(state_key,))
+
+    return engine.compile(conditions)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from cohort_filters import normalize_category_values
+from session_cache import get_dataset_artifact
+
+# 辅导员范围：上传时按辅导员把学生行号分组，选定范围后搜索、选择和统计都只在该组内进行
+
+COUNSELOR_COLUMN = '辅导员'
+ALL_COUNSELORS = '全部学生'
+
+
+def build_counselor_partitions(df):
+    """按辅导员分组的行号数组 {辅导员: 升序行号}，一次稳定排序完成分组"""
+    if COUNSELOR_COLUMN not in df.columns:
+        return {}
+    codes, names = pd.factorize(normalize_category_values(df[COUNSELOR_COLUMN]), sort=True)
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+    return {name: order[bounds[i]:bounds[i + 1]] for i, name in enumerate(names)}
+
+
+def _on_scope_change():
+    st.session_state.counselor_scope = st.session_state.counselor_scope_selector
+
+
+def get_scope_positions(df):
+    """当前辅导员范围内学生的行号数组（升序），未选择范围时为全部学生"""
+    partitions = get_dataset_artifact('counselor_partitions', lambda: build_counselor_partitions(df))
+    scope = st.session_state.get('counselor_scope', ALL_COUNSELORS)
+    if scope in partitions:
+        return partitions[scope]
+    return get_dataset_artifact('all_positions', lambda: np.arange(len(df)))
+
+
+def restrict_to_scope(positions, scope_positions):
+    """positions 中在范围内的行号（保持原顺序）；按升序的范围二分查找，耗时只与 positions 的长度有关"""
+    if not len(scope_positions):
+        return positions[:0]
+    found = np.minimum(np.searchsorted(scope_positions, positions), len(scope_positions) - 1)
+    return positions[scope_positions[found] == positions]
+
+
+def render_counselor_scope(df):
+    """辅导员范围选择框，返回范围内学生的行号数组
+
+    所选范围保存在 session_state.counselor_scope 中（不随控件清除），切换页面后仍然有效。
+    """
+    partitions = get_dataset_artifact('counselor_partitions', lambda: build_counselor_partitions(df))
+    if not partitions:
+        st.session_state.counselor_scope = ALL_COUNSELORS  # 没有辅导员列时不显示选择框，范围为全部学生
+        return get_scope_positions(df)
+    options = [ALL_COUNSELORS] + list(partitions)
+    scope = st.session_state.get('counselor_scope', ALL_COUNSELORS)
+    if scope not in options:
+        scope = ALL_COUNSELORS  # 换了数据集后原来的辅导员可能不存在
+    st.session_state.counselor_scope = scope
+    st.selectbox(
+        "👩‍🏫 辅导员范围", options=options, index=options.index(scope),
+        format_func=lambda name: name if name == ALL_COUNSELORS else f"{name}（{len(partitions[name])}人）",
+        key='counselor_scope_selector', on_change=_on_scope_change
+    )
+    return get_scope_positions(df)
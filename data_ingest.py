@@ -0,0 +1,297 @@
+import importlib.util
+import io
+import os
+import sqlite3
+import time
+from datetime import datetime
+import pandas as pd
+import streamlit as st
+from pandas.io.parsers import TextParser
+from background_jobs import cancel_job, clear_job, get_job, start_job, wait_for_job
+from dataset_pipeline import start_dataset_pipeline
+from roster_store import list_uploads, load_roster, save_roster
+from session_cache import install_dataset
+
+# 上传文件的读取：解析和校验在后台线程中完成，页面保持可操作，完成后在脚本线程中一次性切换到新数据集；
+# 切换后群体级的预计算结果由 dataset_pipeline 在后台继续计算
+
+# 每读取这么多行汇报一次进度（同时检查是否已取消）
+INGEST_CHUNK_ROWS = 500
+# 解析表格在整个读取过程中所占的进度比例，其余为校验与预计算
+INGEST_PARSE_SHARE = 0.8
+INGEST_LABEL = "正在读取上传的文件"
+# 上传控件接受的文件类型
+UPLOAD_TYPES = ['xlsx', 'xls', 'csv', 'parquet']
+# 教务系统导出的 CSV 可能是 UTF-8（可能带 BOM）或 GBK，依次尝试；GB18030 兼容 GBK
+CSV_ENCODINGS = ['utf-8-sig', 'gb18030']
+# xlsx 读取引擎，可通过环境变量 XLSX_READER 配置；配置的引擎不可用时使用默认引擎
+DEFAULT_XLSX_READER = 'openpyxl-stream'
+XLSX_READER = os.environ.get('XLSX_READER', DEFAULT_XLSX_READER)
+
+
+def _convert_cell(value):
+    """与 pandas 读取 Excel 时的单元格转换一致：空单元格为空串，整数值的浮点数转为整数"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def read_xlsx_rows(data, job=None):
+    """以只读模式逐行读取 xlsx 的第一个工作表，按块汇报进度"""
+    from openpyxl import load_workbook  # 只在读取 xlsx 时导入
+    workbook = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        total = sheet.max_row or 0
+        rows = []
+        for row in sheet.iter_rows(values_only=True):
+            rows.append([_convert_cell(value) for value in row])
+            if job is not None and len(rows) % INGEST_CHUNK_ROWS == 0:
+                job.report(INGEST_PARSE_SHARE * len(rows) / max(total, len(rows) + 1), f"已读取 {len(rows)} 行")
+    finally:
+        workbook.close()
+    # 去掉末尾的空行（pandas 读取 Excel 时同样会忽略）
+    while rows and all(value == '' for value in rows[-1]):
+        rows.pop()
+    return rows
+
+
+def _rows_to_frame(rows):
+    """与 pd.read_excel 相同，交给 TextParser 处理表头（重复列名、空列名）和类型推断"""
+    if not rows:
+        return pd.DataFrame()
+    return TextParser(rows, header=0).read()
+
+
+def _read_xlsx_stream(data, job=None):
+    return _rows_to_frame(read_xlsx_rows(data, job))
+
+
+def _read_xlsx_pandas(data, job=None):
+    return pd.read_excel(io.BytesIO(data), engine='openpyxl')
+
+
+def _read_xlsx_calamine(data, job=None):
+    from python_calamine import CalamineWorkbook
+    workbook = CalamineWorkbook.from_filelike(io.BytesIO(data))
+    rows = [[_convert_cell(value) for value in row] for row in workbook.get_sheet_by_index(0).to_python()]
+    while rows and all(value == '' for value in rows[-1]):
+        rows.pop()
+    return _rows_to_frame(rows)
+
+
+# xlsx 读取引擎：名称 -> (显示名称, 读取函数, 依赖的模块)
+XLSX_READERS = {
+    'openpyxl-stream': ('openpyxl 逐行读取（可显示进度、可取消）', _read_xlsx_stream, 'openpyxl'),
+    'openpyxl': ('pandas + openpyxl', _read_xlsx_pandas, 'openpyxl'),
+    'calamine': ('calamine（Rust 实现）', _read_xlsx_calamine, 'python_calamine')
+}
+
+
+def available_xlsx_readers():
+    """当前环境中可用的 xlsx 读取引擎名称"""
+    return [name for name, (_, _, module) in XLSX_READERS.items() if importlib.util.find_spec(module) is not None]
+
+
+def get_xlsx_reader(name=None):
+    """按名称（默认取配置 XLSX_READER）返回可用的 xlsx 读取引擎名称"""
+    name = name or XLSX_READER
+    return name if name in available_xlsx_readers() else DEFAULT_XLSX_READER
+
+
+def detect_csv_encoding(data):
+    """按 CSV_ENCODINGS 的顺序返回第一个能完整解码的编码"""
+    for encoding in CSV_ENCODINGS:
+        try:
+            data.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("无法识别 CSV 文件的编码，请另存为 UTF-8 或 GBK 编码后重新上传")
+
+
+def read_csv_table(data, job=None):
+    """读取 CSV（自动识别 UTF-8 / GBK）
+
+    整表一次读取而不分块：分块读取时各块单独推断类型，含"缺考"等文字的成绩列会得到与整表读取不同的结果。
+    """
+    encoding = detect_csv_encoding(data)
+    if job is not None:
+        job.report(0.1, f"解析 CSV（{encoding}）")
+    return pd.read_csv(io.BytesIO(data), encoding=encoding)
+
+
+def read_parquet_table(data, job=None):
+    return pd.read_parquet(io.BytesIO(data))
+
+
+def read_uploaded_table(data, file_name, job=None, xlsx_reader=None):
+    """把上传文件的内容解析为 DataFrame，返回 (DataFrame, 使用的读取方式)
+
+    xlsx 按配置的引擎读取，xls 交给 pandas，CSV 自动识别编码，Parquet 直接读取；
+    各种格式得到的表格随后走同样的校验和预计算流程。
+    """
+    extension = file_name.lower().rsplit('.', 1)[-1]
+    if extension == 'csv':
+        return read_csv_table(data, job), 'CSV'
+    if extension == 'parquet':
+        return read_parquet_table(data, job), 'Parquet'
+    if extension != 'xlsx':
+        return pd.read_excel(io.BytesIO(data)), 'pandas（xls）'
+    reader = get_xlsx_reader(xlsx_reader)
+    label, read, _ = XLSX_READERS[reader]
+    return read(data, job), label
+
+
+def benchmark_xlsx_readers(data, job=None):
+    """用所有可用的 xlsx 读取引擎分别读取同一个文件，返回各引擎的耗时表"""
+    readers = available_xlsx_readers()
+    records = []
+    for i, name in enumerate(readers):
+        label, read, _ = XLSX_READERS[name]
+        if job is not None:
+            job.report(i / len(readers), f"正在测试 {label}")
+        start = time.perf_counter()
+        df = read(data)
+        records.append({'读取引擎': label, '配置名': name, '耗时(秒)': round(time.perf_counter() - start, 3), '行数': len(df)})
+    table = pd.DataFrame(records)
+    if len(table):
+        table['相对最快'] = (table['耗时(秒)'] / table['耗时(秒)'].min()).round(2).astype(str) + 'x'
+    return table
+
+
+def start_ingest(uploaded_file, prepare):
+    """在后台线程中读取上传的文件
+
+    prepare(df) 在后台线程中执行，返回 (错误信息或 None, {预计算结果名: 结果})，
+    用于表头校验和切换数据集时必须准备好的少量结果；它不能调用 st.* 接口。
+    """
+    data = uploaded_file.getvalue()
+    file_name = uploaded_file.name
+    token = uploaded_file.file_id
+
+    def run(job):
+        job.report(0.0, "解析表格")
+        start = time.perf_counter()
+        df, reader = read_uploaded_table(data, file_name, job)
+        read_seconds = time.perf_counter() - start
+        job.report(INGEST_PARSE_SHARE, f"共 {len(df)} 行，正在校验")
+        error, artifacts = prepare(df)
+        stats = {'file_name': file_name, 'reader': reader, 'read_seconds': read_seconds, 'store_error': None}
+        if error is None:
+            # 校验通过的数据保存到本地数据库，重启后也能读取
+            job.report(0.9, "保存到本地数据库")
+            try:
+                artifacts['roster_upload_id'] = save_roster(df, token, file_name)
+            except (sqlite3.Error, OSError) as e:
+                stats['store_error'] = str(e)
+        return {'token': token, 'data': df, 'error': error, 'artifacts': artifacts, 'stats': stats}
+
+    start_job('ingest', run, signature=token)
+
+
+def render_ingest_status(error_prefix):
+    """上传区域中的读取状态
+
+    读取中显示取消按钮并返回进度条占位区域（由 wait_for_ingest 在脚本末尾更新）；
+    读取完成后把数据、标识和预计算结果一次性替换到 session_state 中。
+    """
+    job = get_job('ingest')
+    if job is None:
+        return None
+    if job.running:
+        st.button("取消读取", key='ingest_cancel', on_click=cancel_job, args=('ingest',))
+        placeholder = st.empty()
+        placeholder.progress(job.progress, text=INGEST_LABEL)
+        return placeholder
+    if job.cancelled:
+        st.info("已取消读取，当前仍显示之前的数据。如需读取该文件请重新上传。")
+        return None
+
+    clear_job('ingest')
+    if job.error is not None:
+        st.session_state.upload_error = f"{error_prefix}{str(job.error)}"
+        st.session_state.students_data = None
+    elif job.result['error']:
+        st.session_state.upload_error = job.result['error']
+        st.session_state.students_data = None  # 清空数据，阻止后续执行
+    else:
+        result = job.result
+        install_dataset(result['data'], result['token'], result['artifacts'])
+        start_dataset_pipeline(result['data'])
+        st.session_state.upload_error = None
+        st.session_state.ingest_stats = result['stats']
+    return None
+
+
+def render_ingest_benchmark(uploaded_file):
+    """显示本次上传的读取耗时；xlsx 文件可以在后台用各读取引擎分别读取一遍做对比"""
+    stats = st.session_state.get('ingest_stats')
+    if stats is not None:
+        st.caption(f"⏱️ 读取 {stats['file_name']} 用时 {stats['read_seconds']:.2f} 秒（{stats['reader']}）")
+        if stats['store_error']:
+            st.warning(f"⚠️ 数据未能保存到本地数据库: {stats['store_error']}")
+    if uploaded_file is None or not uploaded_file.name.lower().endswith('.xlsx'):
+        return
+    with st.expander("⏱️ xlsx 读取引擎对比", expanded=False):
+        st.caption(f"当前配置的引擎：{get_xlsx_reader()}（可通过环境变量 XLSX_READER 修改，可选：{'、'.join(XLSX_READERS)}）")
+        data = uploaded_file.getvalue()
+        st.button(
+            "开始对比", key='ingest_benchmark_start',
+            on_click=start_job, args=('ingest_benchmark', lambda job: benchmark_xlsx_readers(data, job)),
+            kwargs={'signature': uploaded_file.file_id}
+        )
+        job = get_job('ingest_benchmark')
+        if job is None or job.signature != uploaded_file.file_id:
+            return
+        if job.running:
+            wait_for_job(job, "正在对比读取引擎")
+        if job.error is not None:
+            st.error(f"❌ 对比失败: {job.error}")
+        elif job.result is not None:
+            st.dataframe(job.result, use_container_width=True, hide_index=True)
+
+
+def wait_for_ingest(placeholder):
+    """在脚本末尾调用：页面其余部分已经渲染，在这里等待后台读取结束，然后重新运行以切换到新数据集"""
+    job = get_job('ingest')
+    if placeholder is None or job is None or not job.running:
+        return
+    wait_for_job(job, INGEST_LABEL, placeholder)
+    st.rerun()
+
+
+def _load_stored_roster(upload, prepare):
+    df = load_roster(upload['id'])
+    error, artifacts = prepare(df)
+    if error:
+        st.session_state.upload_error = error
+        return
+    install_dataset(df, f"roster:{upload['id']}", {**artifacts, 'roster_upload_id': upload['id']})
+    start_dataset_pipeline(df)
+    st.session_state.upload_error = None
+
+
+def _upload_label(upload):
+    saved_at = datetime.fromtimestamp(upload['uploaded_at']).strftime('%Y-%m-%d %H:%M')
+    return f"{upload['file_name']}，{upload['row_count']} 名学生，{saved_at}"
+
+
+def render_stored_roster_loader(prepare):
+    """还没有数据时，提供读取本地数据库中保存的数据的入口（保存过多次时可以选择读取哪一次）"""
+    try:
+        uploads = list_uploads()
+    except sqlite3.Error:
+        return
+    if not uploads:
+        return
+    if len(uploads) == 1:
+        upload = uploads[0]
+        label = f"📂 读取上次保存的数据（{_upload_label(upload)}）"
+    else:
+        labels = [f"#{upload['id']} {_upload_label(upload)}" for upload in uploads]
+        upload = uploads[labels.index(st.selectbox("📂 本地数据库中保存的数据", labels, key='roster_choice'))]
+        label = "📂 读取所选的数据"
+    st.button(label, key='roster_load', on_click=_load_stored_roster, args=(upload, prepare))
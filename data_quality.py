@@ -0,0 +1,300 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from canonical_codes import first_existing_column
+from cohort_analysis import RADAR_FIELDS, build_schema_index
+from display_values import CLASS_DISPLAY_COLUMNS
+from session_cache import get_dataset_artifact
+from shared_matrix import get_score_blocks
+
+# 数据质量检查：上传时对整张表做一次向量化扫描，结果随数据集缓存
+
+# 体测评级与体测成绩的对应关系（国家学生体质健康标准）：(评级, 最低分)
+PHYSICAL_RATING_THRESHOLDS = [('优秀', 90), ('良好', 80), ('及格', 60), ('不及格', -np.inf)]
+# 除学期绩点外也按绩点范围检查的列
+EXTRA_GPA_COLUMNS = ['总绩点', '平均学分绩点']
+GPA_RANGE = (0, 4)
+# 问题明细最多展示的行数
+MAX_ISSUE_ROWS = 500
+# 成绩异常检查：综测总分按各分项加权求和重新计算（权重按学院的综测办法调整），差值超过容差记为不一致
+TOTAL_SCORE_WEIGHTS = {'德育': 1.0, '智育': 1.0, '体测成绩': 1.0, '附加分': 1.0}
+TOTAL_SCORE_TOLERANCE = 0.5
+# 相邻两个有成绩的学期绩点变化达到该值记为跳变
+GPA_JUMP_THRESHOLD = 2.0
+PHYSICAL_SCORE_RANGE = (0, 120)
+# 班级内 z 分数的绝对值超过该值记为离群；人数少于 OUTLIER_MIN_CLASS_SIZE 的班级 z 分数不可能超过 3，不检查
+OUTLIER_Z_THRESHOLD = 3.0
+OUTLIER_MIN_CLASS_SIZE = 10
+ANOMALY_TYPES = ['综测总分不一致', '班级内离群', '绩点跳变', '体测成绩超出范围']
+
+
+def _blank_mask(series):
+    """空值或纯空白字符串"""
+    mask = series.isna()
+    if series.dtype == object:
+        mask |= series.astype(str).str.strip().eq('')
+    return mask
+
+
+def _issue_frame(df, rows, issue_type, column, values):
+    """把某类问题涉及的行整理为明细表"""
+    return pd.DataFrame({
+        '行号': rows + 2,  # Excel 中的行号（表头占第 1 行）
+        '学号': df['学号'].iloc[rows].astype(str).to_numpy() if '学号' in df.columns else '',
+        '姓名': df['姓名'].iloc[rows].astype(str).to_numpy() if '姓名' in df.columns else '',
+        '问题类型': issue_type,
+        '列名': str(column),
+        '值': pd.Series(values).astype(str).to_numpy()
+    })
+
+
+def profile_dataset(df, schema_index=None):
+    """对上传的数据做一次完整的质量检查
+
+    返回 dict：columns 为逐列概况（空值率、非数字值数量及示例），
+    issues 为逐行的问题明细（成绩列非数字、绩点超出范围、学号重复、体测评级与成绩不符），
+    summary 为各问题类型的计数。
+    """
+    schema_index = schema_index or build_schema_index(df.columns)
+    blank = df.apply(_blank_mask)
+    column_profile = pd.DataFrame({
+        '列名': [str(col) for col in df.columns],
+        '空值率': blank.mean().to_numpy().round(4),
+        '非数字值数': 0,
+        '非数字示例': ''
+    })
+    issue_frames = []
+
+    # 成绩列中的非数字内容（如"无"、"缺考"）
+    score_columns = list(schema_index['semester_columns'])
+    for fields in schema_index['year_fields'].values():
+        score_columns += [column for field, column in fields.items() if field != '体测评级']
+    score_columns += [col for col in EXTRA_GPA_COLUMNS if col in df.columns]
+    numeric_scores = {}
+    for column in score_columns:
+        series = df[column]
+        numeric = pd.to_numeric(series, errors='coerce')
+        numeric_scores[column] = numeric
+        non_numeric = (~blank[column] & numeric.isna()).to_numpy()
+        if non_numeric.any():
+            rows = np.flatnonzero(non_numeric)
+            position = df.columns.get_loc(column)
+            column_profile.loc[position, '非数字值数'] = len(rows)
+            column_profile.loc[position, '非数字示例'] = '、'.join(series.iloc[rows].astype(str).value_counts().index[:5])
+            issue_frames.append(_issue_frame(df, rows, '成绩非数字', column, series.iloc[rows]))
+
+    # 绩点超出 0-4 范围
+    for column in schema_index['semester_columns'] + [col for col in EXTRA_GPA_COLUMNS if col in df.columns]:
+        numeric = numeric_scores[column]
+        rows = np.flatnonzero(((numeric < GPA_RANGE[0]) | (numeric > GPA_RANGE[1])).to_numpy())
+        if len(rows):
+            issue_frames.append(_issue_frame(df, rows, '绩点超出范围', column, numeric.iloc[rows]))
+
+    # 学号重复
+    if '学号' in df.columns:
+        student_ids = df['学号'].astype(str).str.strip()
+        duplicated = (student_ids.duplicated(keep=False) & ~blank['学号']).to_numpy()
+        if duplicated.any():
+            rows = np.flatnonzero(duplicated)
+            issue_frames.append(_issue_frame(df, rows, '学号重复', '学号', student_ids.iloc[rows]))
+
+    # 体测评级与体测成绩不符
+    labels = [label for label, _ in PHYSICAL_RATING_THRESHOLDS]
+    for year_num, fields in schema_index['year_fields'].items():
+        if '体测成绩' not in fields or '体测评级' not in fields:
+            continue
+        scores = numeric_scores[fields['体测成绩']].to_numpy()
+        ratings = df[fields['体测评级']].astype(str).str.strip().to_numpy()
+        expected = np.select([scores >= threshold for _, threshold in PHYSICAL_RATING_THRESHOLDS], labels, default='')
+        mismatch = ~np.isnan(scores) & np.isin(ratings, labels) & (ratings != expected)
+        if mismatch.any():
+            rows = np.flatnonzero(mismatch)
+            values = [f"{rating}（成绩 {score:g}，应为{exp}）" for rating, score, exp in zip(ratings[rows], scores[rows], expected[rows])]
+            issue_frames.append(_issue_frame(df, rows, '体测评级与成绩不符', fields['体测评级'], values))
+
+    issues = pd.concat(issue_frames, ignore_index=True) if issue_frames else _issue_frame(df, np.array([], dtype=int), '', '', [])
+    return {
+        'row_count': len(df),
+        'column_count': len(df.columns),
+        'columns': column_profile,
+        'issues': issues,
+        'summary': issues['问题类型'].value_counts().to_dict()
+    }
+
+
+def _class_codes(df):
+    """班级编号数组（没有班级的学生为 -1）"""
+    column = first_existing_column(df, CLASS_DISPLAY_COLUMNS)
+    if column is None:
+        return np.full(len(df), -1, dtype=np.int64)
+    classes = df[column].astype(str).str.strip()
+    codes, _ = pd.factorize(classes.where(~_blank_mask(df[column]) & classes.ne('无')))
+    return codes
+
+
+def class_z_scores(values, class_codes):
+    """values 为 (学生数, 列数) 的矩阵，返回各列在班级内的 z 分数和所在班级的有效人数；缺失值和没有班级的学生为 NaN"""
+    num_classes = class_codes.max() + 1 if len(class_codes) else 0
+    if num_classes <= 0:
+        # 没有班级列或班级全部为空：不做班级内比较
+        empty = np.full(values.shape, np.nan)
+        return empty, np.zeros(values.shape), empty
+    valid = ~np.isnan(values) & (class_codes >= 0)[:, None]
+    codes = np.where(class_codes >= 0, class_codes, 0)
+    filled = np.where(valid, values, 0.0)
+    counts = np.zeros((num_classes, values.shape[1]))
+    sums = np.zeros((num_classes, values.shape[1]))
+    np.add.at(counts, codes, valid)
+    np.add.at(sums, codes, filled)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+        deviations = np.where(valid, values - means[codes], 0.0)
+        squares = np.zeros((num_classes, values.shape[1]))
+        np.add.at(squares, codes, deviations ** 2)
+        stds = np.sqrt(squares / counts)
+        z = np.where(valid & (stds[codes] > 0), deviations / stds[codes], np.nan)
+    return z, np.where(valid, counts[codes], 0), means[codes]
+
+
+def detect_score_anomalies(df, schema_index, score_blocks):
+    """对全体学生做一次成绩异常检查：综测总分与分项之和不符、班级内离群、相邻学期绩点跳变、体测成绩超出范围
+
+    返回 dict：issues 为问题明细（格式与数据质量报告相同，按行号排序），positions 为各条问题对应的整表行号，
+    summary 为各问题类型的计数。
+    """
+    raw = np.asarray(score_blocks['radar_raw'], dtype=float)
+    gpa = np.asarray(score_blocks['gpa'], dtype=float)
+    years = schema_index['years']
+    issue_frames = []
+
+    def column_of(year_idx, field):
+        return schema_index['year_fields'][years[year_idx]].get(field, f"第{years[year_idx]}学年{field}")
+
+    def add(rows, issue_type, column, values):
+        if len(rows):
+            issue_frames.append(_issue_frame(df, rows, issue_type, column, values))
+
+    # 综测总分与分项加权和（缺少任一分项的学年不检查）
+    total_idx = RADAR_FIELDS.index('综测总分')
+    component_idx = [RADAR_FIELDS.index(field) for field in TOTAL_SCORE_WEIGHTS]
+    expected = (raw[:, :, component_idx] * np.array(list(TOTAL_SCORE_WEIGHTS.values()))).sum(axis=2)
+    difference = raw[:, :, total_idx] - expected
+    with np.errstate(invalid='ignore'):
+        mismatch = np.abs(difference) > TOTAL_SCORE_TOLERANCE
+    for year_idx in np.flatnonzero(mismatch.any(axis=0)):
+        rows = np.flatnonzero(mismatch[:, year_idx])
+        values = [f"综测总分 {total:g}，分项之和 {exp:g}（差 {diff:+.2f}）"
+                  for total, exp, diff in zip(raw[rows, year_idx, total_idx], expected[rows, year_idx], difference[rows, year_idx])]
+        add(rows, '综测总分不一致', column_of(year_idx, '综测总分'), values)
+
+    # 各学年各维度在班级内的 z 分数（所有学年、维度一起计算）
+    num_students = len(df)
+    flat = raw.reshape(num_students, -1)
+    z, counts, means = class_z_scores(flat, _class_codes(df))
+    with np.errstate(invalid='ignore'):
+        outliers = (np.abs(z) > OUTLIER_Z_THRESHOLD) & (counts >= OUTLIER_MIN_CLASS_SIZE)
+    for flat_idx in np.flatnonzero(outliers.any(axis=0)):
+        year_idx, field_idx = divmod(flat_idx, len(RADAR_FIELDS))
+        rows = np.flatnonzero(outliers[:, flat_idx])
+        field = RADAR_FIELDS[field_idx]
+        values = [f"{field} {value:g}，班级平均 {mean:.1f}（z={score:+.1f}）"
+                  for value, mean, score in zip(flat[rows, flat_idx], means[rows, flat_idx], z[rows, flat_idx])]
+        add(rows, '班级内离群', column_of(year_idx, field), values)
+
+    # 与上一个有成绩的学期相比的绩点变化
+    if gpa.shape[1] > 1:
+        previous = pd.DataFrame(gpa).ffill(axis=1).to_numpy()[:, :-1]
+        change = gpa[:, 1:] - previous
+        with np.errstate(invalid='ignore'):
+            jumps = np.abs(change) >= GPA_JUMP_THRESHOLD
+        for semester_idx in np.flatnonzero(jumps.any(axis=0)):
+            rows = np.flatnonzero(jumps[:, semester_idx])
+            values = [f"{before:.2f} → {after:.2f}（{delta:+.2f}）"
+                      for before, after, delta in zip(previous[rows, semester_idx], gpa[rows, semester_idx + 1], change[rows, semester_idx])]
+            add(rows, '绩点跳变', schema_index['semester_columns'][semester_idx + 1], values)
+
+    # 体测成绩超出范围
+    physical = raw[:, :, RADAR_FIELDS.index('体测成绩')]
+    with np.errstate(invalid='ignore'):
+        out_of_range = (physical < PHYSICAL_SCORE_RANGE[0]) | (physical > PHYSICAL_SCORE_RANGE[1])
+    for year_idx in np.flatnonzero(out_of_range.any(axis=0)):
+        rows = np.flatnonzero(out_of_range[:, year_idx])
+        add(rows, '体测成绩超出范围', column_of(year_idx, '体测成绩'), [f"{value:g}" for value in physical[rows, year_idx]])
+
+    if issue_frames:
+        issues = pd.concat(issue_frames, ignore_index=True).sort_values('行号', kind='stable', ignore_index=True)
+    else:
+        issues = _issue_frame(df, np.array([], dtype=int), '', '', [])
+    return {
+        'issues': issues,
+        'positions': issues['行号'].to_numpy(dtype=np.int64) - 2,
+        'summary': issues['问题类型'].value_counts().to_dict()
+    }
+
+
+def get_score_anomalies(df):
+    """读取（必要时计算）当前数据集的成绩异常检查结果，每个数据集只计算一次"""
+    schema_index = get_dataset_artifact('schema_index', lambda: build_schema_index(df.columns))
+    return get_dataset_artifact(
+        'score_anomalies', lambda: detect_score_anomalies(df, schema_index, get_score_blocks(df, schema_index))
+    )
+
+
+def student_anomalies(anomalies, position):
+    """某个学生（整表行号）的成绩异常明细"""
+    start, stop = np.searchsorted(anomalies['positions'], [position, position + 1])
+    return anomalies['issues'].iloc[start:stop]
+
+
+def render_data_profile(profile):
+    """显示上传时生成的数据质量报告（只读取缓存结果，不重新计算）"""
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("总行数", profile['row_count'])
+    with col2:
+        st.metric("总列数", profile['column_count'])
+    with col3:
+        st.metric("问题记录数", len(profile['issues']))
+
+    if profile['summary']:
+        st.write("**问题汇总:** " + "，".join(f"{issue_type} {count} 条" for issue_type, count in profile['summary'].items()))
+        issues = profile['issues']
+        if len(issues) > MAX_ISSUE_ROWS:
+            st.caption(f"仅显示前 {MAX_ISSUE_ROWS} 条问题记录")
+        st.dataframe(issues.head(MAX_ISSUE_ROWS), use_container_width=True, hide_index=True)
+    else:
+        st.write("✅ 未发现数据质量问题")
+
+    st.write("**逐列概况:**")
+    st.dataframe(profile['columns'], use_container_width=True, hide_index=True)
+
+
+def render_score_anomalies(anomalies):
+    """数据质量报告中的成绩异常明细"""
+    issues = anomalies['issues']
+    st.write("**成绩异常检查:** " + ("，".join(f"{issue_type} {count} 条" for issue_type, count in anomalies['summary'].items())
+                                  if anomalies['summary'] else "✅ 未发现异常"))
+    if len(issues):
+        if len(issues) > MAX_ISSUE_ROWS:
+            st.caption(f"仅显示前 {MAX_ISSUE_ROWS} 条异常记录")
+        st.dataframe(issues.head(MAX_ISSUE_ROWS), use_container_width=True, hide_index=True)
+    st.caption(f"综测总分按 {'+'.join(TOTAL_SCORE_WEIGHTS)} 重新计算（容差 {TOTAL_SCORE_TOLERANCE:g}）；"
+               f"班级内 |z| > {OUTLIER_Z_THRESHOLD:g} 记为离群（{OUTLIER_MIN_CLASS_SIZE} 人以上的班级）；"
+               f"相邻学期绩点变化 ≥ {GPA_JUMP_THRESHOLD:g} 记为跳变；体测成绩应在 {PHYSICAL_SCORE_RANGE[0]}-{PHYSICAL_SCORE_RANGE[1]} 之间")
+
+
+def render_student_anomalies(issues):
+    """学生详情中该学生的成绩异常提示"""
+    if not len(issues):
+        return
+    items = "".join(
+        f'<div style="margin: 0.25rem 0;"><span class="status-badge status-help">{issue_type}</span> '
+        f'<span style="color:#6b7280;">{column}：</span>{value}</div>'
+        for issue_type, column, value in zip(issues['问题类型'], issues['列名'], issues['值'])
+    )
+    st.markdown(f"""
+    <div style="background: #fef3c7; padding: 1rem; border-radius: 8px; border: 1px solid #fde68a; margin-bottom: 1rem;">
+        <div style="font-weight: 600; color: #b45309; margin-bottom: 0.5rem;">⚠️ 成绩记录疑似有误（共 {len(issues)} 处），请核对原始数据</div>
+        {items}
+    </div>
+    """, unsafe_allow_html=True)
@@ -0,0 +1,89 @@
+import time
+import streamlit as st
+from background_jobs import POLL_INTERVAL, STAGE_FAILED, STAGE_PENDING, STAGE_READY, STAGE_RUNNING, STAGE_SKIPPED
+from canonical_codes import build_canonical_codes
+from cohort_analysis import build_radar_matrix, build_schema_index, compute_gpa_trajectories
+from cohort_export import build_export_metrics
+from data_quality import detect_score_anomalies, profile_dataset
+from radar_settings import normalization_arguments
+from session_cache import get_artifact_pipeline, get_dataset_artifact, start_artifact_pipeline
+from shared_matrix import load_score_blocks
+from student_search import StudentSearchIndex
+
+# 上传后的预计算流水线：新数据集安装后，在后台线程池中按依赖关系并行计算群体级的结果，
+# 每一项完成后立即写入数据集缓存；页面用到还没算完的结果时等待流水线，而不是重新计算
+
+# 流水线中的结果及显示名称（按提交顺序排列，依赖链较长的成绩矩阵先开始）
+PIPELINE_LABELS = {
+    'score_blocks': '成绩矩阵',
+    'search_index': '搜索索引',
+    'canonical_codes': '标准代码',
+    'data_profile': '数据质量报告',
+    'radar_matrix': '归一化矩阵',
+    'score_anomalies': '成绩异常检查',
+    'gpa_trajectories': '绩点轨迹',
+    'export_metrics': '百分位与风险标记'
+}
+STATUS_ICONS = {STAGE_PENDING: '⏳', STAGE_RUNNING: '🔄', STAGE_READY: '✅', STAGE_FAILED: '⚠️', STAGE_SKIPPED: '⏭️'}
+
+
+def dataset_pipeline_stages(df, normalization_params, year_overrides):
+    """流水线的各个步骤 [(结果名, 依赖, 函数)]；schema_index 由调用方作为输入提供
+
+    雷达图矩阵按启动时的归一化设置计算，之后设置变化时由 get_radar_matrix 增量重算。
+    """
+    return [
+        ('score_blocks', ['schema_index'], lambda deps: load_score_blocks(df, deps['schema_index'])),
+        ('search_index', [], lambda deps: StudentSearchIndex(df)),
+        ('canonical_codes', [], lambda deps: build_canonical_codes(df)),
+        ('data_profile', ['schema_index'], lambda deps: profile_dataset(df, deps['schema_index'])),
+        ('radar_matrix', ['schema_index', 'score_blocks'], lambda deps: build_radar_matrix(
+            df, deps['schema_index'], normalization_params, raw=deps['score_blocks']['radar_raw'], year_overrides=year_overrides
+        )),
+        ('score_anomalies', ['schema_index', 'score_blocks'], lambda deps: detect_score_anomalies(
+            df, deps['schema_index'], deps['score_blocks']
+        )),
+        ('gpa_trajectories', ['score_blocks'], lambda deps: compute_gpa_trajectories(deps['score_blocks']['gpa'])),
+        ('export_metrics', ['radar_matrix', 'gpa_trajectories', 'canonical_codes'], lambda deps: build_export_metrics(
+            df, deps['radar_matrix'], deps['gpa_trajectories'], deps['canonical_codes']
+        ))
+    ]
+
+
+def start_dataset_pipeline(df):
+    """新数据集安装后在脚本线程中调用，启动后台预计算"""
+    schema_index = get_dataset_artifact('schema_index', lambda: build_schema_index(df.columns))
+    normalization_params, year_overrides = normalization_arguments()
+    return start_artifact_pipeline(
+        dataset_pipeline_stages(df, normalization_params, year_overrides), inputs={'schema_index': schema_index}
+    )
+
+
+def _status_caption(placeholder, pipeline):
+    items = "　".join(f"{STATUS_ICONS[pipeline.status[name]]} {label}" for name, label in PIPELINE_LABELS.items() if name in pipeline.status)
+    if pipeline.running:
+        head = "⚙️ 后台预计算中"
+    else:
+        head = f"⚙️ 预计算完成（{pipeline.elapsed:.2f} 秒）"
+    errors = "；".join(f"{PIPELINE_LABELS.get(name, name)}: {error}" for name, error in pipeline.errors.items())
+    placeholder.caption(f"{head}：{items}", help=f"未完成的项目会在用到时重新计算。{errors}" if errors else None)
+
+
+def render_pipeline_status():
+    """上传区域中各预计算结果的状态；返回占位区域，由 wait_for_pipeline 在脚本末尾继续刷新"""
+    pipeline = get_artifact_pipeline()
+    if pipeline is None:
+        return None
+    placeholder = st.empty()
+    _status_caption(placeholder, pipeline)
+    return placeholder
+
+
+def wait_for_pipeline(placeholder):
+    """在脚本末尾调用：页面其余部分已经渲染，在这里刷新预计算状态直到全部完成（用户的操作会中断等待）"""
+    pipeline = get_artifact_pipeline()
+    if placeholder is None or pipeline is None or not pipeline.running:
+        return
+    while pipeline.running:
+        time.sleep(POLL_INTERVAL)
+        _status_caption(placeholder, pipeline)
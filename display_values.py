@@ -0,0 +1,77 @@
+import functools
+import numpy as np
+import pandas as pd
+from runtime_metrics import register_cache_info
+from session_cache import get_dataset_artifact
+
+# 显示字符串：上传后整表按列一次性转换为页面上显示的文字，渲染学生信息时只需按行号查表
+
+# 空值的显示文字
+EMPTY_DISPLAY = '无'
+# 转为小写后视为空值的文字
+EMPTY_MARKERS = ['nan', 'none', '']
+# 单个值显示文字的记忆条数
+FORMAT_CACHE_SIZE = 4096
+# 个人信息中"新班级"依次尝试的列
+CLASS_DISPLAY_COLUMNS = ['新班级', '班级_基本信息', '班 级_基本信息', '班级', '班 级']
+
+
+def _format(value, strip_blank):
+    if pd.isna(value) or value is None:
+        return EMPTY_DISPLAY
+    text = str(value)
+    check = text.strip() if strip_blank else text
+    return EMPTY_DISPLAY if check.lower() in EMPTY_MARKERS else text
+
+
+# typed=True：1、1.0、True 相等且哈希相同，但显示文字不同，需要分开记忆
+@functools.lru_cache(maxsize=FORMAT_CACHE_SIZE, typed=True)
+def _format_cached(value, strip_blank):
+    return _format(value, strip_blank)
+
+
+register_cache_info('format_value', _format_cached.cache_info)
+
+
+def format_display_value(value, strip_blank=False):
+    """单个值的显示字符串，规则与 build_display_frame 相同；可哈希的值会记住结果"""
+    try:
+        return _format_cached(value, strip_blank)
+    except TypeError:  # 不可哈希的值
+        return _format(value, strip_blank)
+
+
+def build_display_frame(df, strip_blank=False):
+    """整表的显示字符串（与行号对齐）：空值、NaN、None 等替换为'无'，其余为 str(值)
+
+    strip_blank 为 True 时，只含空格的字符串也视为空值。
+    """
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        # 先转为 object 再转字符串，与逐个调用 str() 的结果一致（日期时间列也是如此）
+        text = values.astype(object).astype(str)
+        check = text.str.strip() if strip_blank else text
+        empty = values.isna().to_numpy() | check.str.lower().isin(EMPTY_MARKERS).to_numpy()
+        columns[column] = np.where(empty, EMPTY_DISPLAY, text.to_numpy())
+    return pd.DataFrame(columns, index=df.index, dtype=object)
+
+
+def get_display_frame(df, strip_blank=False):
+    name = 'display_frame:strip' if strip_blank else 'display_frame'
+    return get_dataset_artifact(name, lambda: build_display_frame(df, strip_blank))
+
+
+def get_student_display(df, position, strip_blank=False):
+    """某一行学生的 {列名: 显示字符串}，按列名 get 即可（缺少的列由调用方给默认值）"""
+    display = get_display_frame(df, strip_blank)
+    return dict(zip(display.columns, display.iloc[position].tolist()))
+
+
+def first_display(display, columns):
+    """依次取 columns 中第一个有值的显示字符串，都没有时为'无'"""
+    for column in columns:
+        value = display.get(column, EMPTY_DISPLAY)
+        if value != EMPTY_DISPLAY:
+            return value
+    return EMPTY_DISPLAY
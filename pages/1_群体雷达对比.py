@@ -0,0 +1,165 @@
+import streamlit as st
+import pandas as pd
+import plotly.graph_objects as go
+import numpy as np
+from cohort_analysis import RADAR_FIELDS, build_schema_index
+from counselor_scope import render_counselor_scope
+from radar_settings import get_radar_matrix
+from session_cache import get_dataset_artifact
+
+# 页面配置
+st.set_page_config(
+    page_title="群体雷达对比",
+    page_icon="👥",
+    layout="wide",
+    initial_sidebar_state="collapsed"
+)
+
+# 单张图最多绘制的学生数，小多图每行的个数
+MAX_COHORT_SIZE = 300
+SMALL_MULTIPLE_COLUMNS = 10
+SMALL_MULTIPLE_SPACING = 2.6
+
+
+def closed_polygons(x, y):
+    """把 (学生数, 维度数) 的顶点坐标首尾闭合，并用 NaN 断开不同学生，拼成一条轨迹"""
+    n = x.shape[0]
+    gap = np.full((n, 1), np.nan)
+    xs = np.concatenate([x, x[:, :1], gap], axis=1).ravel()
+    ys = np.concatenate([y, y[:, :1], gap], axis=1).ravel()
+    # 坐标保留三位小数即可，显著减小传给浏览器的 JSON 体积
+    return np.round(xs, 3), np.round(ys, 3)
+
+
+def create_small_multiples_figure(values, names):
+    """小多图：所有学生的雷达图平铺在同一坐标系中，共用一条 WebGL 轨迹"""
+    n, num_fields = values.shape
+    theta = np.arange(num_fields) * 2 * np.pi / num_fields
+    rows, cols = np.divmod(np.arange(n), SMALL_MULTIPLE_COLUMNS)
+    center_x = cols * SMALL_MULTIPLE_SPACING
+    center_y = -rows * SMALL_MULTIPLE_SPACING
+
+    rho = values / 100.0
+    data_x, data_y = closed_polygons(center_x[:, None] + rho * np.cos(theta),
+                                     center_y[:, None] + rho * np.sin(theta))
+    frame_x, frame_y = closed_polygons(center_x[:, None] + np.cos(theta)[None, :],
+                                       center_y[:, None] + np.sin(theta)[None, :])
+
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(
+        x=frame_x, y=frame_y, mode='lines', hoverinfo='skip',
+        line=dict(color='#e5e7eb', width=1)
+    ))
+    fig.add_trace(go.Scattergl(
+        x=data_x, y=data_y, mode='lines', fill='toself', hoverinfo='skip',
+        line=dict(color='#3b82f6', width=1), fillcolor='rgba(59, 130, 246, 0.3)'
+    ))
+    fig.add_trace(go.Scattergl(
+        x=center_x, y=center_y - 1.25, mode='text', text=names,
+        textfont=dict(size=10, color='#374151'),
+        hovertext=[
+            f"{name}<br>" + "<br>".join(f"{field}: {value:.0f}" for field, value in zip(RADAR_FIELDS, row))
+            for name, row in zip(names, values)
+        ],
+        hoverinfo='text'
+    ))
+    num_rows = int(rows.max()) + 1 if n else 1
+    fig.update_layout(
+        xaxis=dict(visible=False),
+        yaxis=dict(visible=False, scaleanchor='x'),
+        showlegend=False,
+        height=max(300, 140 * num_rows),
+        margin=dict(t=20, b=20, l=20, r=20),
+        plot_bgcolor='rgba(0,0,0,0)'
+    )
+    return fig
+
+
+def create_overlay_figure(values):
+    """叠加密度图：全部学生的雷达轮廓以低透明度叠加，并标出平均和中位轮廓"""
+    n, num_fields = values.shape
+    categories = np.array(RADAR_FIELDS + [RADAR_FIELDS[0], RADAR_FIELDS[0]])
+    gap = np.full((n, 1), np.nan)
+    r = np.concatenate([values, values[:, :1], gap], axis=1).ravel()
+    theta = np.tile(categories, n)
+    opacity = float(np.clip(6.0 / max(n, 1), 0.03, 0.5))
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatterpolargl(
+        r=r, theta=theta, mode='lines', name='学生', hoverinfo='skip',
+        line=dict(color=f'rgba(59, 130, 246, {opacity})', width=1)
+    ))
+    for label, profile, color in [('平均', values.mean(axis=0), '#dc2626'),
+                                  ('中位数', np.median(values, axis=0), '#16a34a')]:
+        fig.add_trace(go.Scatterpolar(
+            r=np.append(profile, profile[0]), theta=categories[:-1], mode='lines+markers',
+            name=label, line=dict(color=color, width=3)
+        ))
+    fig.update_layout(
+        polar=dict(radialaxis=dict(visible=True, range=[0, 100], gridcolor='#e5e7eb'), angularaxis=dict(gridcolor='#e5e7eb')),
+        showlegend=True, height=550, margin=dict(t=50, b=50, l=50, r=50)
+    )
+    return fig
+
+
+st.markdown("## 👥 群体雷达对比")
+
+df = st.session_state.get('students_data')
+if df is None:
+    st.info("请先在主页上传学生数据")
+    st.stop()
+
+schema_index = get_dataset_artifact('schema_index', lambda: build_schema_index(df.columns))
+radar_matrix = get_radar_matrix(df, schema_index)
+
+if not radar_matrix['years']:
+    st.info("📊 暂无综合素质评价数据")
+    st.stop()
+
+# 只在所选辅导员的学生中分组对比
+scope_positions = render_counselor_scope(df)
+group_options = [col for col in [schema_index['class_column'], '分流专业'] if col and col in df.columns]
+
+col1, col2, col3, col4 = st.columns([1, 2, 1, 1])
+with col1:
+    group_column = st.selectbox("分组方式", options=group_options) if group_options else None
+with col2:
+    if group_column:
+        group_values = get_dataset_artifact(f'group_values:{group_column}', lambda: df[group_column].astype(str).to_numpy())
+        selected_group = st.selectbox("选择分组", options=sorted(pd.unique(group_values[scope_positions])))
+with col3:
+    year_num = st.selectbox("学年", options=radar_matrix['years'], format_func=lambda year: f"第{year}学年")
+with col4:
+    view_mode = st.radio("显示方式", options=["小多图", "叠加密度"], horizontal=True)
+
+year_idx = radar_matrix['years'].index(year_num)
+mask = radar_matrix['valid'][scope_positions, year_idx]
+if group_column:
+    mask &= group_values[scope_positions] == selected_group
+selected_rows = scope_positions[mask]
+
+if len(selected_rows) == 0:
+    st.warning("🔍 该分组在所选学年没有有效的综测数据")
+    st.stop()
+
+# 按综测总分从高到低排列，超出上限时只取前 MAX_COHORT_SIZE 名
+total_scores = radar_matrix['raw'][selected_rows, year_idx, RADAR_FIELDS.index('综测总分')]
+selected_rows = selected_rows[np.argsort(-total_scores, kind='stable')]
+if len(selected_rows) > MAX_COHORT_SIZE:
+    st.caption(f"共 {len(selected_rows)} 名学生，仅显示综测总分前 {MAX_COHORT_SIZE} 名")
+    selected_rows = selected_rows[:MAX_COHORT_SIZE]
+
+values = radar_matrix['normalized'][selected_rows, year_idx, :]
+if view_mode == "小多图":
+    names = df['姓名'].astype(str).to_numpy()[selected_rows] if '姓名' in df.columns else selected_rows.astype(str)
+    fig = create_small_multiples_figure(values, names)
+else:
+    fig = create_overlay_figure(values)
+st.plotly_chart(fig, use_container_width=True)
+
+# 分组的原始得分统计
+raw_values = pd.DataFrame(radar_matrix['raw'][selected_rows, year_idx, :], columns=RADAR_FIELDS)
+summary = raw_values.agg(['mean', 'median', 'min', 'max']).T.round(2)
+summary.columns = ['平均', '中位数', '最低', '最高']
+st.markdown(f"#### 📋 第{year_num}学年得分统计（{len(selected_rows)}人）")
+st.dataframe(summary, use_container_width=True)
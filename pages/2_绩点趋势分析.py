@@ -0,0 +1,113 @@
+import streamlit as st
+import pandas as pd
+import plotly.graph_objects as go
+import numpy as np
+from cohort_analysis import (
+    TRAJECTORY_INSUFFICIENT, TRAJECTORY_LABELS, build_schema_index, compute_gpa_trajectories
+)
+from counselor_scope import render_counselor_scope
+from shared_matrix import get_score_blocks
+from session_cache import get_dataset_artifact
+
+# 页面配置
+st.set_page_config(
+    page_title="绩点趋势分析",
+    page_icon="📈",
+    layout="wide",
+    initial_sidebar_state="collapsed"
+)
+
+TRAJECTORY_COLORS = {'上升': '#16a34a', '平稳': '#3b82f6', '下降': '#dc2626'}
+
+
+def build_trajectory_table(df, schema_index, trajectories):
+    """把轨迹指标数组拼成群体列表（每名学生一行）"""
+    table = pd.DataFrame({
+        '学号': df['学号'].astype(str).to_numpy() if '学号' in df.columns else np.arange(len(df)).astype(str),
+        '姓名': df['姓名'].astype(str).to_numpy() if '姓名' in df.columns else '',
+    })
+    for column in [schema_index['class_column'], '分流专业']:
+        if column and column in df.columns:
+            table[column] = df[column].astype(str).to_numpy()
+    table['有效学期数'] = trajectories['semester_count']
+    table['平均绩点'] = trajectories['mean_gpa'].round(2)
+    table['每学期变化'] = trajectories['slope'].round(3)
+    table['波动'] = trajectories['volatility'].round(3)
+    table['最大降幅'] = trajectories['largest_drop'].round(2)
+    table['轨迹类型'] = trajectories['label']
+    return table
+
+
+def create_trajectory_scatter(table):
+    """斜率-波动散点图，每个轨迹类型一条 WebGL 轨迹"""
+    fig = go.Figure()
+    for label in TRAJECTORY_LABELS:
+        rows = table[table['轨迹类型'] == label]
+        fig.add_trace(go.Scattergl(
+            x=rows['每学期变化'], y=rows['波动'], mode='markers', name=label,
+            marker=dict(size=6, color=TRAJECTORY_COLORS[label], opacity=0.6),
+            text=rows['姓名'], hovertemplate='%{text}<br>每学期变化: %{x:+.2f}<br>波动: %{y:.2f}<extra></extra>'
+        ))
+    fig.update_layout(
+        xaxis_title="每学期绩点变化", yaxis_title="波动",
+        height=400, margin=dict(t=30, b=30, l=30, r=30)
+    )
+    return fig
+
+
+st.markdown("## 📈 绩点趋势分析")
+
+df = st.session_state.get('students_data')
+if df is None:
+    st.info("请先在主页上传学生数据")
+    st.stop()
+
+schema_index = get_dataset_artifact('schema_index', lambda: build_schema_index(df.columns))
+if not schema_index['semester_columns']:
+    st.info("📊 暂无绩点数据")
+    st.stop()
+
+trajectories = get_dataset_artifact(
+    'gpa_trajectories', lambda: compute_gpa_trajectories(get_score_blocks(df, schema_index)['gpa'])
+)
+table = get_dataset_artifact('gpa_trajectory_table', lambda: build_trajectory_table(df, schema_index, trajectories))
+
+# 人数统计和筛选只在所选辅导员的学生中进行
+scope_positions = render_counselor_scope(df)
+scoped_table = table.iloc[scope_positions]
+scoped_labels = trajectories['label'][scope_positions]
+
+# 各轨迹类型人数
+count_cols = st.columns(len(TRAJECTORY_LABELS) + 1)
+for count_col, label in zip(count_cols, TRAJECTORY_LABELS + [TRAJECTORY_INSUFFICIENT]):
+    with count_col:
+        st.metric(label, int((scoped_labels == label).sum()))
+
+# 筛选条件
+col1, col2, col3 = st.columns([2, 2, 1])
+with col1:
+    selected_labels = st.multiselect("轨迹类型", options=TRAJECTORY_LABELS, default=TRAJECTORY_LABELS)
+with col2:
+    group_columns = [col for col in [schema_index['class_column'], '分流专业'] if col and col in table.columns]
+    group_filter = {}
+    if group_columns:
+        group_column = st.selectbox("分组方式", options=group_columns)
+        group_value = st.selectbox("选择分组", options=["全部"] + sorted(scoped_table[group_column].unique()))
+        if group_value != "全部":
+            group_filter[group_column] = group_value
+with col3:
+    min_drop = st.number_input("最大降幅不低于", min_value=0.0, max_value=4.0, value=0.0, step=0.1)
+
+mask = np.isin(scoped_labels, selected_labels)
+for column, value in group_filter.items():
+    mask &= scoped_table[column].to_numpy() == value
+if min_drop > 0:
+    mask &= np.nan_to_num(trajectories['largest_drop'][scope_positions], nan=0.0) >= min_drop
+filtered_table = scoped_table[mask].sort_values('每学期变化', kind='stable')
+
+st.metric("筛选结果", len(filtered_table))
+if len(filtered_table) > 0:
+    st.plotly_chart(create_trajectory_scatter(filtered_table), use_container_width=True)
+    st.dataframe(filtered_table, use_container_width=True, hide_index=True)
+else:
+    st.warning("🔍 没有符合条件的学生，请调整筛选条件")
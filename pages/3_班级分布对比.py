@@ -0,0 +1,176 @@
+import streamlit as st
+import pandas as pd
+import plotly.graph_objects as go
+import numpy as np
+from canonical_codes import build_canonical_codes
+from cohort_analysis import (
+    BOX_STAT_NAMES, RADAR_FIELDS, binned_group_distribution, build_schema_index, group_rates
+)
+from cohort_filters import normalize_category_values
+from counselor_scope import render_counselor_scope
+from radar_settings import get_radar_matrix
+from shared_matrix import get_score_blocks
+from session_cache import get_dataset_artifact
+
+# 页面配置
+st.set_page_config(
+    page_title="班级分布对比",
+    page_icon="📊",
+    layout="wide",
+    initial_sidebar_state="collapsed"
+)
+
+# 默认参与对比的分组数（按人数从多到少）
+DEFAULT_COMPARE_GROUPS = 8
+COMPARE_MODES = ["综测总分", "学期绩点", "四六级通过率"]
+
+
+def build_group_codes(df, column):
+    """分组列的 (组编号数组, 按名称排序的组名数组)"""
+    codes, names = pd.factorize(normalize_category_values(df[column]), sort=True)
+    return codes, np.asarray(names, dtype=object)
+
+
+def scoped_group_codes(codes, scope_positions):
+    """不在辅导员范围内的学生组编号记为 -1，不参与统计"""
+    if len(scope_positions) == len(codes):
+        return codes
+    scoped = np.full(len(codes), -1)
+    scoped[scope_positions] = codes[scope_positions]
+    return scoped
+
+
+def create_box_figure(names, stats, value_label):
+    """用预先算好的分位数画箱线图，每组只传一行统计值"""
+    column = {name: idx for idx, name in enumerate(BOX_STAT_NAMES)}
+    fig = go.Figure(go.Box(
+        x=names, q1=stats[:, column['下四分位']], median=stats[:, column['中位数']], q3=stats[:, column['上四分位']],
+        lowerfence=stats[:, column['下须']], upperfence=stats[:, column['上须']], mean=stats[:, column['平均']],
+        marker_color='#3b82f6', name=value_label, boxpoints=False
+    ))
+    fig.update_layout(yaxis_title=value_label, height=420, margin=dict(t=30, b=30, l=30, r=30), showlegend=False)
+    return fig
+
+
+def create_histogram_heatmap(names, edges, counts, value_label):
+    """分箱直方图：每行一个分组，颜色为该分数段人数占组内人数的比例"""
+    totals = counts.sum(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        shares = np.where(totals > 0, counts / totals * 100, 0.0)
+    centers = (edges[:-1] + edges[1:]) / 2
+    fig = go.Figure(go.Heatmap(
+        z=np.round(shares, 1), x=np.round(centers, 2), y=names, colorscale='Blues',
+        colorbar=dict(title='占比%'), customdata=counts,
+        hovertemplate=f'%{{y}}<br>{value_label}≈%{{x}}<br>%{{customdata}}人（%{{z}}%）<extra></extra>'
+    ))
+    fig.update_layout(
+        xaxis_title=value_label, height=max(300, 28 * len(names) + 120), margin=dict(t=30, b=30, l=30, r=30)
+    )
+    return fig
+
+
+def create_rate_figure(names, rates):
+    """各组四级、六级通过率并排柱状图"""
+    fig = go.Figure()
+    for label, values, color in zip(['四级', '六级'], rates, ['#3b82f6', '#8b5cf6']):
+        fig.add_trace(go.Bar(
+            x=names, y=np.round(values, 1), name=f'{label}通过率', marker_color=color,
+            hovertemplate='%{x}<br>%{y}%<extra></extra>'
+        ))
+    fig.update_layout(
+        barmode='group', yaxis=dict(title='通过率 (%)', range=[0, 100]), height=420, margin=dict(t=30, b=30, l=30, r=30)
+    )
+    return fig
+
+
+st.markdown("## 📊 班级分布对比")
+
+df = st.session_state.get('students_data')
+if df is None:
+    st.info("请先在主页上传学生数据")
+    st.stop()
+
+schema_index = get_dataset_artifact('schema_index', lambda: build_schema_index(df.columns))
+group_options = [col for col in [schema_index['class_column'], '分流专业'] if col and col in df.columns]
+if not group_options:
+    st.info("📊 数据中没有班级或分流专业列，无法分组对比")
+    st.stop()
+
+# 只在所选辅导员的学生中对比
+scope_positions = render_counselor_scope(df)
+scope = st.session_state.get('counselor_scope')
+
+col1, col2 = st.columns([1, 3])
+with col1:
+    group_column = st.selectbox("分组方式", options=group_options)
+    compare_mode = st.radio("对比内容", options=COMPARE_MODES)
+
+codes, names = get_dataset_artifact(f'group_codes:{group_column}', lambda: build_group_codes(df, group_column))
+group_codes = scoped_group_codes(codes, scope_positions)
+group_sizes = np.bincount(group_codes[group_codes >= 0], minlength=len(names))
+present = np.flatnonzero(group_sizes)
+default_groups = present[np.argsort(-group_sizes[present], kind='stable')[:DEFAULT_COMPARE_GROUPS]]
+with col2:
+    selected_names = st.multiselect(
+        "参与对比的分组", options=list(names[present]), default=list(names[np.sort(default_groups)])
+    )
+if not selected_names:
+    st.warning("请至少选择一个分组")
+    st.stop()
+selected = np.flatnonzero(np.isin(names, selected_names))
+
+
+def get_distribution(metric_key, values_builder):
+    """按数据集、分组方式、辅导员范围和指标缓存全部分组的分箱结果，切换参与对比的分组时不重算"""
+    return get_dataset_artifact(
+        f'group_distribution:{group_column}:{scope}:{metric_key}',
+        lambda: binned_group_distribution(values_builder(), group_codes, len(names))
+    )
+
+
+if compare_mode == "综测总分":
+    radar_matrix = get_radar_matrix(df, schema_index)
+    if not radar_matrix['years']:
+        st.info("📊 暂无综合素质评价数据")
+        st.stop()
+    year_num = st.selectbox("学年", options=radar_matrix['years'], format_func=lambda year: f"第{year}学年")
+    year_idx = radar_matrix['years'].index(year_num)
+    total_idx = RADAR_FIELDS.index('综测总分')
+    distribution = get_distribution(
+        f'total:{year_num}', lambda: radar_matrix['raw'][:, year_idx, total_idx]
+    )
+    value_label = f"第{year_num}学年综测总分"
+elif compare_mode == "学期绩点":
+    if not schema_index['semester_columns']:
+        st.info("📊 暂无绩点数据")
+        st.stop()
+    semester = st.selectbox("学期", options=schema_index['semesters'])
+    semester_idx = schema_index['semesters'].index(semester)
+    gpa_matrix = get_score_blocks(df, schema_index)['gpa']
+    distribution = get_distribution(f'gpa:{semester}', lambda: gpa_matrix[:, semester_idx])
+    value_label = f"{semester}绩点"
+else:
+    canonical_codes = get_dataset_artifact('canonical_codes', lambda: build_canonical_codes(df))
+    rates = get_dataset_artifact(
+        f'group_cet_rates:{group_column}:{scope}',
+        lambda: [group_rates(canonical_codes[key], group_codes, len(names)) for key in ['cet4_passed', 'cet6_passed']]
+    )
+    st.plotly_chart(create_rate_figure(names[selected], [values[selected] for values in rates]), use_container_width=True)
+    st.dataframe(
+        pd.DataFrame({'人数': group_sizes[selected], '四级通过率(%)': rates[0][selected].round(1),
+                      '六级通过率(%)': rates[1][selected].round(1)}, index=names[selected]),
+        use_container_width=True
+    )
+    st.stop()
+
+st.plotly_chart(create_box_figure(names[selected], distribution['stats'][selected], value_label), use_container_width=True)
+st.plotly_chart(
+    create_histogram_heatmap(names[selected], distribution['edges'], distribution['counts'][selected], value_label),
+    use_container_width=True
+)
+
+# 各组统计（与箱线图相同的预计算结果）
+summary = pd.DataFrame(distribution['stats'][selected], columns=BOX_STAT_NAMES, index=names[selected])
+summary['人数'] = summary['人数'].astype(int)
+st.markdown(f"#### 📋 {value_label}分组统计")
+st.dataframe(summary.drop(columns=['下须', '上须']).round(2), use_container_width=True)
@@ -0,0 +1,101 @@
+import streamlit as st
+import numpy as np
+from cohort_analysis import build_schema_index
+from counselor_scope import ALL_COUNSELORS, get_scope_positions
+from scholarship_ranking import (
+    AWARD_TYPES, DEFAULT_QUOTA_PERCENT, DEFAULT_WEIGHTS, RANKING_METRICS, default_rules, get_ranking, ranking_table
+)
+from session_cache import get_dataset_artifact
+from student_navigation import focus_student
+
+# 页面配置
+st.set_page_config(
+    page_title="奖助学金评定",
+    page_icon="🏆",
+    layout="wide",
+    initial_sidebar_state="collapsed"
+)
+
+
+def show_student_details(df, position):
+    """跳转到主页的学生详情（其中有该学生的奖学金信息卡片）"""
+    if not np.isin(position, get_scope_positions(df)):
+        st.session_state.counselor_scope = ALL_COUNSELORS  # 学生不在当前辅导员范围内时改为全部学生
+    focus_student(position)
+    st.switch_page(st.session_state.home_page)
+
+
+st.markdown("## 🏆 奖助学金评定")
+
+df = st.session_state.get('students_data')
+if df is None:
+    st.info("请先在主页上传学生数据")
+    st.stop()
+
+schema_index = get_dataset_artifact('schema_index', lambda: build_schema_index(df.columns))
+if not schema_index['years']:
+    st.info("📊 暂无综合素质评价数据")
+    st.stop()
+
+# 评定规则
+col1, col2, col3 = st.columns([1, 1, 2])
+with col1:
+    award = st.radio("评定类型", options=AWARD_TYPES, horizontal=True)
+    year_num = st.selectbox("学年", options=schema_index['years'], format_func=lambda year: f"第{year}学年")
+with col2:
+    require_no_fail = st.checkbox("无挂科", value=True)
+    require_fitness_pass = st.checkbox("体测评级不为不及格", value=True)
+    if award == '助学金':
+        st.caption("助学金另要求该学年有困难等级")
+    quota_percent = st.number_input("推荐比例 (%)", min_value=1, max_value=100, value=DEFAULT_QUOTA_PERCENT)
+with col3:
+    st.markdown("**成绩权重**（按组内百分位加权）")
+    weight_cols = st.columns(len(RANKING_METRICS))
+    weights = {}
+    for weight_col, name in zip(weight_cols, RANKING_METRICS):
+        with weight_col:
+            weights[name] = st.number_input(name, min_value=0.0, max_value=1.0, value=DEFAULT_WEIGHTS[name], step=0.05)
+
+rules = default_rules(year_num, award)
+rules.update({
+    'weights': weights,
+    'require_no_fail': require_no_fail,
+    'require_fitness_pass': require_fitness_pass,
+    'quota_percent': int(quota_percent)
+})
+if not any(weights.values()):
+    st.warning("请至少为一项成绩设置大于 0 的权重")
+    st.stop()
+
+ranking, inputs, group_names = get_ranking(df, rules)
+ranked_groups = np.unique(ranking['group_codes'])
+if len(ranked_groups) == 0:
+    st.warning("🔍 没有满足条件的学生")
+    st.stop()
+
+col1, col2, col3 = st.columns([2, 1, 1])
+with col1:
+    group_index = st.selectbox("年级 · 分流专业", options=ranked_groups, format_func=lambda code: group_names[code])
+table = ranking_table(df, ranking, inputs, group_index)
+with col2:
+    st.metric("参与排名", len(table))
+with col3:
+    st.metric("推荐人数", int((table['推荐'] != '').sum()))
+st.caption(f"全体学生中共 {ranking['eligible_count']} 人满足硬性条件")
+
+if award != '助学金':
+    table = table.drop(columns=['困难等级'])
+st.dataframe(table, use_container_width=True, hide_index=True)
+
+# 查看名单中某名学生的详细信息（含奖学金信息卡片）
+group_positions = ranking['positions'][ranking['group_codes'] == group_index]
+col1, col2 = st.columns([3, 1])
+with col1:
+    cursor = st.selectbox(
+        "查看学生", options=range(len(group_positions)),
+        format_func=lambda i: f"第{table['名次'].iat[i]}名 {table['姓名'].iat[i]} - {table['学号'].iat[i]}"
+    )
+with col2:
+    st.markdown('<div style="height: 1.75rem;"></div>', unsafe_allow_html=True)
+    if st.button("👤 查看学生详情", disabled='home_page' not in st.session_state):
+        show_student_details(df, int(group_positions[cursor]))
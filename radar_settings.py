@@ -0,0 +1,157 @@
+import sqlite3
+import streamlit as st
+from cohort_analysis import (
+    DEFAULT_NORMALIZATION_PARAMS, RADAR_FIELDS, build_radar_matrix, normalization_bounds, renormalize_radar_matrix
+)
+from roster_store import load_user_setting, save_user_setting
+from session_cache import discard_dataset_artifacts, get_dataset_artifact
+from shared_matrix import get_score_blocks
+
+# 雷达图归一化设置：各维度的 (最小值, 最大值) 及按学年的覆盖值，按用户保存到本地数据库。
+# 设置保存在 st.session_state.user_normalization_params 中，结构为
+# {'default': {维度: {'min': 最小值, 'max': 最大值}}, 'years': {学年: {维度: {'min': ..., 'max': ...}}}}
+
+SETTING_NAME = 'radar_normalization'
+ALL_YEARS = '全部学年'
+# 依赖归一化结果的数据集预计算结果，范围变化时丢弃
+NORMALIZATION_DEPENDENT_ARTIFACTS = ['export_metrics']
+
+
+def current_user():
+    """当前用户的标识：部署后取登录邮箱，本地运行或未登录时为 'local'"""
+    return st.experimental_user.get('email') or 'local'
+
+
+def default_normalization_settings():
+    return {
+        'default': {field: {'min': float(low), 'max': float(high)} for field, (low, high) in DEFAULT_NORMALIZATION_PARAMS.items()},
+        'years': {}
+    }
+
+
+def get_normalization_settings():
+    """当前用户的归一化设置；会话中第一次使用时从数据库读取，没有保存过或读取失败时为默认值"""
+    if 'user_normalization_params' not in st.session_state:
+        try:
+            saved = load_user_setting(current_user(), SETTING_NAME)
+        except sqlite3.Error:
+            saved = None
+        st.session_state.user_normalization_params = saved or default_normalization_settings()
+    return st.session_state.user_normalization_params
+
+
+def _as_tuples(ranges):
+    return {field: (item['min'], item['max']) for field, item in ranges.items()}
+
+
+def year_ranges(year, settings=None):
+    """某学年各维度的归一化范围 {维度: (最小值, 最大值)}，按学年的覆盖值优先"""
+    settings = settings or get_normalization_settings()
+    return {**_as_tuples(settings['default']), **_as_tuples(settings['years'].get(year, {}))}
+
+
+def normalization_arguments(settings=None):
+    """build_radar_matrix 使用的 (各维度默认范围, {学年: 覆盖范围})"""
+    settings = settings or get_normalization_settings()
+    return _as_tuples(settings['default']), {year: _as_tuples(ranges) for year, ranges in settings['years'].items()}
+
+
+def radar_section_name(year, ranges):
+    """单个学生雷达图的缓存板块名，含该学年的归一化范围：范围变化时只有该学年的图表需要重新计算"""
+    return f"radar_{year}:" + ",".join(f"{ranges[field][0]:g}~{ranges[field][1]:g}" for field in RADAR_FIELDS if field in ranges)
+
+
+def get_radar_matrix(df, schema_index):
+    """全体学生的雷达图矩阵，按当前用户的归一化设置
+
+    矩阵按数据集缓存；设置变化后再次读取时只重算范围有变化的 (学年, 维度)，
+    并丢弃依赖归一化结果的预计算结果（如导出用的派生指标）。
+    """
+    params, overrides = normalization_arguments()
+    matrix = get_dataset_artifact('radar_matrix', lambda: build_radar_matrix(
+        df, schema_index, params, raw=get_score_blocks(df, schema_index)['radar_raw'], year_overrides=overrides
+    ))
+    mins, maxs = normalization_bounds(matrix['years'], params, overrides)
+    if renormalize_radar_matrix(matrix, mins, maxs):
+        discard_dataset_artifacts(NORMALIZATION_DEPENDENT_ARTIFACTS)
+    return matrix
+
+
+def _widget_key(scope, field, bound):
+    return f"normalization_range_{scope}_{field}_{bound}"
+
+
+def _clear_widgets():
+    # 设置变化后让输入框按新的设置重新取值
+    for key in [key for key in st.session_state if str(key).startswith('normalization_range_')]:
+        del st.session_state[key]
+
+
+def _save(settings):
+    st.session_state.user_normalization_params = settings
+    _clear_widgets()
+    try:
+        save_user_setting(current_user(), SETTING_NAME, settings)
+    except (sqlite3.Error, OSError) as e:
+        st.session_state.normalization_message = ('warning', f"设置已应用，但未能保存到本地数据库：{e}")
+
+
+def _apply(scope):
+    settings = get_normalization_settings()
+    ranges = {field: {'min': float(st.session_state[_widget_key(scope, field, 'min')]),
+                      'max': float(st.session_state[_widget_key(scope, field, 'max')])}
+              for field in RADAR_FIELDS}
+    invalid = [field for field, item in ranges.items() if item['max'] <= item['min']]
+    if invalid:
+        st.session_state.normalization_message = ('error', f"最大值须大于最小值：{'、'.join(invalid)}")
+        return
+    st.session_state.normalization_message = ('success', "已应用新的归一化范围")
+    if scope == ALL_YEARS:
+        new_settings = {'default': ranges, 'years': settings['years']}
+    else:
+        # 学年设置中只保存与全部学年不同的维度
+        overrides = {field: item for field, item in ranges.items() if item != settings['default'].get(field)}
+        years = {year: item for year, item in settings['years'].items() if year != scope}
+        if overrides:
+            years[scope] = overrides
+        new_settings = {'default': settings['default'], 'years': years}
+    _save(new_settings)
+
+
+def _reset(scope):
+    settings = get_normalization_settings()
+    if scope == ALL_YEARS:
+        new_settings = default_normalization_settings()
+    else:
+        new_settings = {'default': settings['default'], 'years': {year: item for year, item in settings['years'].items() if year != scope}}
+    st.session_state.normalization_message = ('success', "已恢复默认范围")
+    _save(new_settings)
+
+
+def render_normalization_settings(years):
+    """雷达图归一化设置面板：选择全部学年或某一学年，编辑各维度的最小值、最大值"""
+    with st.expander("⚙️ 雷达图归一化设置"):
+        settings = get_normalization_settings()
+        scope = st.selectbox(
+            "适用范围", options=[ALL_YEARS] + list(years), key='normalization_scope_selector',
+            format_func=lambda year: year if year == ALL_YEARS else f"第{year}学年"
+        )
+        ranges = _as_tuples(settings['default']) if scope == ALL_YEARS else year_ranges(scope, settings)
+        with st.form(f'normalization_form_{scope}', border=False):
+            for field in RADAR_FIELDS:
+                low, high = ranges.get(field, (0.0, 100.0))
+                overridden = scope != ALL_YEARS and field in settings['years'].get(scope, {})
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.number_input(f"{field} 最小值{'（本学年）' if overridden else ''}", value=float(low), key=_widget_key(scope, field, 'min'))
+                with col2:
+                    st.number_input(f"{field} 最大值{'（本学年）' if overridden else ''}", value=float(high), key=_widget_key(scope, field, 'max'))
+            col1, col2 = st.columns(2)
+            with col1:
+                st.form_submit_button("✅ 应用", on_click=_apply, args=(scope,))
+            with col2:
+                st.form_submit_button("↩️ 恢复默认", on_click=_reset, args=(scope,))
+        message = st.session_state.pop('normalization_message', None)
+        if message is not None:
+            getattr(st, message[0])(message[1])
+        st.caption("得分按 (得分 - 最小值) / (最大值 - 最小值) 换算为 0-100，超出范围的按 0 或 100 显示；设置按用户保存，群体页面同样使用")
@@ -0,0 +1,147 @@
+import io
+import numpy as np
+
+# 回归测试用的合成工作簿：每个夹具由一份规格描述，按固定随机种子生成，每次生成的内容相同。
+# app.py 使用固定表头；app2.py 的夹具覆盖 1-8 个学期、1-4 个学年、缺列、"无"/空白/缺考取值和重复列名（如 助学金.1）
+
+YEAR_NAMES = '一二三四五六七八'
+# app.py 上传时校验的表头（与 app.py 中 prepare_uploaded_dataset 的 required_columns 相同）
+APP_REQUIRED_COLUMNS = [
+    "序号", "学号", "姓名", "原班级", "新班级", "原专业", "分流专业", "辅导员", "政治面貌",
+    "入团申请书编号", "是否递交入党申请书", "是否积极分子", "民族", "性别", "是否过四级", "是否过六级",
+    "第一学期绩点", "第二学期绩点", "第三学期绩点", "第一学年德育", "第一学年智育", "第一学年附加分",
+    "第一学年体测成绩", "第一学年体测评级", "第一学年综测总分", "心理评测等级", "第一学年困难等级",
+    "第二学年困难等级", "有无需要学院协助解决的困难", "有何困难", "去年困难生", "今年困难生",
+    "挂科", "所获学分", "奖项", "人民奖学金", "助学奖学金", "助学金"
+]
+# 不会被置空的列（学生选择框的选项文字依赖这些列）
+KEY_COLUMNS = ['序号', '学号', '姓名']
+# 置空时使用的取值；成绩列另外可能是"缺考"
+BLANK_VALUES = ['无', '', None, ' ']
+
+# 夹具规格：app 为渲染该工作簿的主页脚本；semesters / years 为学期、学年个数（app.py 固定表头时不使用）；
+# drop 为删除的列；blank_ratio 为随机置空的单元格比例；duplicate 为重复出现的列名；
+# errors 为故意写错的单元格 [(行, 列名, 取值)]，用于成绩异常检查
+FIXTURES = [
+    {'name': 'app_fixed', 'app': 'app.py', 'rows': 16, 'seed': 1},
+    {'name': 'app2_minimal', 'app': 'app2.py', 'rows': 8, 'semesters': 1, 'years': 1, 'seed': 2},
+    {'name': 'app2_standard', 'app': 'app2.py', 'rows': 16, 'semesters': 4, 'years': 2, 'seed': 3,
+     'errors': [(0, '第一学年综测总分', 60.5), (15, '第二学年体测成绩', 135)]},
+    {'name': 'app2_full', 'app': 'app2.py', 'rows': 16, 'semesters': 8, 'years': 4, 'seed': 4},
+    {'name': 'app2_missing_columns', 'app': 'app2.py', 'rows': 12, 'semesters': 5, 'years': 3, 'seed': 5,
+     'drop': ['第三学期绩点', '第二学年体测成绩', '第三学年综测总分', '心理评测等级', '辅导员', '是否过四级', '新班级']},
+    {'name': 'app2_blank_values', 'app': 'app2.py', 'rows': 16, 'semesters': 6, 'years': 3, 'seed': 6, 'blank_ratio': 0.25},
+    {'name': 'app2_duplicate_columns', 'app': 'app2.py', 'rows': 12, 'semesters': 4, 'years': 2, 'seed': 7,
+     'duplicate': ['助学金', '第一学年助学金', '奖项']},
+]
+
+
+def get_fixture(name):
+    return next(spec for spec in FIXTURES if spec['name'] == name)
+
+
+def _choice(rng, options, n):
+    return [options[i] for i in rng.integers(0, len(options), n)]
+
+
+def _base_columns(rng, n):
+    """个人信息及全局字段（两个主页共用）"""
+    return {
+        '序号': list(range(1, n + 1)),
+        '学号': [f'2023{1000 + i:04d}' for i in range(n)],
+        '姓名': [f'学生{i:02d}' for i in range(n)],
+        '原班级': _choice(rng, ['航空2301', '航空2302', '飞设2301'], n),
+        '新班级': _choice(rng, ['航空2301', '航空2302', '飞设2301', '动力2301'], n),
+        '原专业': _choice(rng, ['航空航天类', '飞行器设计'], n),
+        '分流专业': _choice(rng, ['飞行器设计与工程', '飞行器动力工程', '材料成型'], n),
+        '辅导员': _choice(rng, ['王老师', '李老师', '赵老师'], n),
+        '政治面貌': _choice(rng, ['共青团员', '群众', '中共预备党员'], n),
+        '入团申请书编号': _choice(rng, ['T2023001', '', '无'], n),
+        '是否递交入党申请书': _choice(rng, ['是', '否'], n),
+        '是否积极分子': _choice(rng, ['是', '否'], n),
+        '民族': _choice(rng, ['汉族', '回族', '壮族'], n),
+        '性别': _choice(rng, ['男', '女'], n),
+        '是否过四级': _choice(rng, ['是', '否', 512, '无'], n),
+        '是否过六级': _choice(rng, ['是', '否', 430], n),
+        '心理评测等级': _choice(rng, ['1级', '2级', '3级', '良好', None], n),
+        '有无需要学院协助解决的困难': _choice(rng, ['无', '有', '否'], n),
+        '有何困难': _choice(rng, ['经济困难', '学业困难', '无'], n),
+        '去年困难生': _choice(rng, ['是', '否'], n),
+        '今年困难生': _choice(rng, ['是', '否'], n),
+        '挂科': rng.integers(0, 3, n).tolist(),
+        '所获学分': rng.integers(40, 60, n).tolist(),
+        '奖项': _choice(rng, ['', '数学建模省二等奖', '无'], n),
+        '人民奖学金': _choice(rng, ['', '一等', '二等', '三等'], n),
+        '助学奖学金': _choice(rng, ['', '无', '国家助学金'], n),
+        '助学金': _choice(rng, ['', '一档', '二档'], n),
+    }
+
+
+def _year_columns(rng, n, year):
+    moral = np.round(rng.uniform(12, 15, n), 1)
+    intellect = np.round(rng.uniform(50, 95, n), 2)
+    bonus = np.round(rng.uniform(-1, 6, n), 1)
+    physical = np.round(rng.uniform(55, 110, n), 1)
+    return {
+        f'第{year}学年德育': moral.tolist(),
+        f'第{year}学年智育': intellect.tolist(),
+        f'第{year}学年体测成绩': physical.tolist(),
+        f'第{year}学年体测评级': _choice(rng, ['优秀', '良好', '及格', '不及格'], n),
+        f'第{year}学年附加分': bonus.tolist(),
+        f'第{year}学年综测总分': np.round(moral + intellect + physical + bonus, 2).tolist(),
+        f'第{year}学年困难等级': _choice(rng, ['无', '一般困难', '困难', '特别困难'], n),
+        f'第{year}学年人民奖学金': _choice(rng, ['', '一等', '二等', '三等'], n),
+        f'第{year}学年助学金': _choice(rng, ['', '一档', '二档'], n),
+        f'第{year}学年奖项': _choice(rng, ['', '校级优秀学生', '无'], n),
+    }
+
+
+def build_fixture_columns(spec):
+    """按规格生成 [(表头, 取值列表)]；表头可以重复（重复列名写入工作簿后由读取程序改名）"""
+    rng = np.random.default_rng(spec['seed'])
+    n = spec['rows']
+    columns = _base_columns(rng, n)
+    if spec['app'] == 'app.py':
+        columns.update({f'第{YEAR_NAMES[s]}学期绩点': np.round(rng.uniform(1.0, 4.0, n), 2).tolist() for s in range(3)})
+        columns.update(_year_columns(rng, n, '一'))
+        columns['第二学年困难等级'] = _choice(rng, ['无', '一般困难', '特别困难'], n)
+        items = [(name, columns[name]) for name in APP_REQUIRED_COLUMNS]
+    else:
+        for s in range(spec['semesters']):
+            columns[f'第{YEAR_NAMES[s]}学期绩点'] = np.round(rng.uniform(1.0, 4.0, n), 2).tolist()
+        for y in range(spec['years']):
+            columns.update(_year_columns(rng, n, YEAR_NAMES[y]))
+        items = [(name, values) for name, values in columns.items() if name not in spec.get('drop', [])]
+
+    for name in spec.get('duplicate', []):
+        # 重复列的取值与原列不同，以便发现读取时取错了列
+        items.append((name, _choice(rng, ['', '重复列取值A', '重复列取值B'], n)))
+
+    columns = dict(items)
+    for row, name, value in spec.get('errors', []):
+        columns[name][row] = value
+
+    ratio = spec.get('blank_ratio', 0)
+    if ratio:
+        for name, values in items:
+            if name in KEY_COLUMNS:
+                continue
+            score_column = '绩点' in name or name.endswith(('德育', '智育', '体测成绩', '附加分', '综测总分'))
+            blanks = BLANK_VALUES + (['缺考'] if score_column else [])
+            for i in np.flatnonzero(rng.random(n) < ratio):
+                values[i] = blanks[rng.integers(0, len(blanks))]
+    return items
+
+
+def build_workbook(spec):
+    """按规格生成 xlsx 文件内容（bytes）"""
+    from openpyxl import Workbook
+    workbook = Workbook()
+    sheet = workbook.active
+    items = build_fixture_columns(spec)
+    sheet.append([name for name, _ in items])
+    for row in zip(*(values for _, values in items)):
+        sheet.append([None if value == '' else value for value in row])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
@@ -0,0 +1,261 @@
+import os
+import tempfile
+
+# 回归测试使用独立的本地数据库和共享矩阵目录，不读取本机保存的设置，也不写入正式数据；
+# 这些环境变量须在导入任何页面模块之前设置
+_SANDBOX = tempfile.mkdtemp(prefix='student_regression_')
+os.environ['ROSTER_DB_PATH'] = os.path.join(_SANDBOX, 'roster.sqlite3')
+os.environ['SHARED_MATRIX_DIR'] = os.path.join(_SANDBOX, 'score_matrices')
+os.environ.pop('METRICS_DIR', None)
+os.environ.pop('SHOW_STARTUP_TIMING', None)
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+from streamlit.testing.v1 import AppTest
+from data_ingest import read_uploaded_table
+from regression.fixtures import FIXTURES, build_workbook
+
+# 渲染结果的回归测试：对每个合成工作簿，按上传流程读取后，在无界面的 AppTest 中运行主页和各分析页面，
+# 把页面元素整理成 JSON 与 regression/golden 下的基准结果比较，同时记录每个夹具的耗时。
+# 页面抛出未捕获的异常时该夹具直接判为失败（--update 时也不写入基准结果）。
+# 在仓库根目录运行：
+#   python -m regression.harness              比较全部夹具
+#   python -m regression.harness --update     重新生成基准结果（确认输出变化符合预期后再提交）
+#   python -m regression.harness -f app2_full --timings timings.json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GOLDEN_DIR = os.path.join(ROOT, 'regression', 'golden')
+ANALYSIS_PAGES = sorted(os.path.join('pages', name) for name in os.listdir(os.path.join(ROOT, 'pages')) if name.endswith('.py'))
+RUN_TIMEOUT = 120
+# 展开板块开关时最多再运行的次数（展开后可能出现新的开关，如各学年的详细数据）
+MAX_TOGGLE_PASSES = 4
+# 图表中保留比较的字段
+PLOTLY_TRACE_KEYS = ['type', 'name', 'mode', 'x', 'y', 'z', 'r', 'theta', 'text', 'q1', 'median', 'q3', 'lowerfence', 'upperfence']
+FLOAT_DIGITS = 6
+CONTAINER_TYPES = {'root', 'main', 'sidebar', 'event', 'horizontal', 'vertical', 'column', 'expandable', 'form', 'tab', 'tab_container', 'chat_message', 'status'}
+WIDGET_TYPES = {'button', 'checkbox', 'toggle', 'radio', 'selectbox', 'multiselect', 'text_input', 'number_input',
+                'slider', 'select_slider', 'text_area', 'date_input', 'time_input', 'color_picker'}
+
+
+class RenderError(Exception):
+    """页面运行时抛出了未捕获的异常：该夹具直接判为失败，不写入也不比较基准结果"""
+
+    def __init__(self, script, exceptions):
+        self.script = script
+        self.exceptions = exceptions
+        super().__init__(f"{script}: {exceptions[0]['message']}")
+
+
+def _exception_details(nodes):
+    return [{'message': node.value, 'stack': list(node.stack_trace)[-3:]} for node in nodes]
+
+
+def _round(value):
+    if isinstance(value, float):
+        return round(value, FLOAT_DIGITS)
+    if isinstance(value, list):
+        return [_round(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _round(item) for key, item in value.items()}
+    return value
+
+
+def _text(value):
+    # 样式表只比较摘要，避免基准文件过大
+    text = str(value)
+    if text.lstrip().startswith('<style>'):
+        return 'style:' + hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+    return text
+
+
+def _plotly(node):
+    spec = json.loads(node.proto.figure.spec)
+    layout = spec.get('layout', {})
+    title = layout.get('title')
+    return {
+        'traces': [_round({key: trace[key] for key in PLOTLY_TRACE_KEYS if key in trace}) for trace in spec.get('data', [])],
+        'title': title.get('text') if isinstance(title, dict) else title
+    }
+
+
+def serialize_element(node):
+    """把一个页面元素整理为可比较的 JSON 对象（容器返回其子元素的列表）"""
+    element_type = getattr(node, 'type', type(node).__name__)
+    children = getattr(node, 'children', None)
+    if element_type in CONTAINER_TYPES and children is not None:
+        items = [serialize_element(child) for child in children.values()]
+        label = getattr(getattr(node, 'proto', None), 'expandable', None)
+        block = {'block': element_type, 'children': items}
+        if label is not None and element_type == 'expandable':
+            block['label'] = label.label
+        return block
+    if element_type == 'plotly_chart':
+        return {'plotly_chart': _plotly(node)}
+    if element_type == 'metric':
+        return {'metric': [node.label, str(node.value), str(node.delta)]}
+    if element_type in ('dataframe', 'table'):
+        frame = node.value
+        return {element_type: {'columns': [str(col) for col in frame.columns], 'rows': frame.astype(str).values.tolist()}}
+    if element_type in WIDGET_TYPES:
+        item = {element_type: getattr(node, 'label', ''), 'value': _round(_json_value(getattr(node, 'value', None)))}
+        options = getattr(node, 'options', None)
+        if options is not None:
+            item['options'] = len(options)
+        return item
+    if element_type == 'exception':
+        raise RenderError('', _exception_details([node]))
+    if hasattr(node, 'value'):
+        return {element_type: _text(node.value)}
+    return {element_type: None}
+
+
+def _json_value(value):
+    if isinstance(value, (list, tuple)):
+        return [_json_value(item) for item in value]
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _new_app(script, df, state):
+    at = AppTest.from_file(os.path.join(ROOT, script), default_timeout=RUN_TIMEOUT)
+    at.session_state.students_data = df
+    for key, value in state.items():
+        at.session_state[key] = value
+    return at
+
+
+def render(script, df, state=None, expand=True):
+    """在新会话中运行页面，返回 (元素列表, 最后一次运行的耗时)；expand 时把页面上的板块开关全部打开后再运行"""
+    state = dict(state or {})
+    toggles = {}
+    for _ in range(MAX_TOGGLE_PASSES if expand else 1):
+        at = _new_app(script, df, {**state, **toggles})
+        start = time.perf_counter()
+        at.run()
+        seconds = time.perf_counter() - start
+        if len(at.exception):
+            raise RenderError(script, _exception_details(at.exception))
+        found = {toggle.key: True for toggle in at.toggle if toggle.key and not toggle.value}
+        if not expand or not found:
+            break
+        toggles.update(found)
+    return serialize_element(at.main)['children'], seconds
+
+
+def run_fixture(spec):
+    """生成并读取一个夹具，运行它的主页（首屏、第一行和最后一行学生）和各分析页面，返回 (结果, 耗时)"""
+    timings = {}
+    start = time.perf_counter()
+    data = build_workbook(spec)
+    timings['生成工作簿'] = time.perf_counter() - start
+    start = time.perf_counter()
+    df, reader = read_uploaded_table(data, f"{spec['name']}.xlsx")
+    timings['读取'] = time.perf_counter() - start
+
+    renders = {}
+    first_paint, timings['主页首屏'] = render(spec['app'], df, expand=False)
+    renders[f"{spec['app']}#首屏"] = first_paint
+    # 与从排名列表跳转相同，通过 student_focus 选中学生（新会话第一次取筛选结果时会把光标重置为 0）
+    for position in sorted({0, len(df) - 1}):
+        key = f"{spec['app']}#学生{position}"
+        renders[key], timings[key] = render(spec['app'], df, {'student_focus': position})
+    for page in ANALYSIS_PAGES:
+        key = page.replace(os.sep, '/')
+        renders[key], timings[key] = render(page, df, {'home_page': spec['app']}, expand=False)
+    timings['合计'] = sum(timings.values())
+    result = {
+        'fixture': spec['name'],
+        'reader': reader,
+        'shape': list(df.shape),
+        'columns': [str(col) for col in df.columns],
+        'renders': renders
+    }
+    return result, {name: round(seconds, 4) for name, seconds in timings.items()}
+
+
+def golden_path(name):
+    return os.path.join(GOLDEN_DIR, f'{name}.json')
+
+
+def first_difference(expected, actual, path=''):
+    """两个 JSON 对象第一处不同的位置和取值，相同时返回 None"""
+    if type(expected) is not type(actual):
+        return path, expected, actual
+    if isinstance(expected, dict):
+        for key in list(expected) + [key for key in actual if key not in expected]:
+            if key not in expected or key not in actual:
+                return f'{path}/{key}', expected.get(key), actual.get(key)
+            found = first_difference(expected[key], actual[key], f'{path}/{key}')
+            if found:
+                return found
+        return None
+    if isinstance(expected, list):
+        for index, (left, right) in enumerate(zip(expected, actual)):
+            found = first_difference(left, right, f'{path}[{index}]')
+            if found:
+                return found
+        if len(expected) != len(actual):
+            return f'{path}[{min(len(expected), len(actual))}]', len(expected), len(actual)
+        return None
+    return None if expected == actual else (path, expected, actual)
+
+
+def _short(value, limit=160):
+    text = json.dumps(value, ensure_ascii=False)
+    return text if len(text) <= limit else text[:limit] + '…'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="渲染结果回归测试：与 regression/golden 中的基准结果比较")
+    parser.add_argument('--update', action='store_true', help="用本次结果覆盖基准结果")
+    parser.add_argument('-f', '--fixture', action='append', help="只运行指定的夹具（可重复）")
+    parser.add_argument('--timings', help="把各夹具的耗时写入该 JSON 文件")
+    args = parser.parse_args(argv)
+
+    specs = [spec for spec in FIXTURES if not args.fixture or spec['name'] in args.fixture]
+    unknown = set(args.fixture or []) - {spec['name'] for spec in specs}
+    if unknown:
+        parser.error(f"未知的夹具：{', '.join(sorted(unknown))}")
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+    all_timings = {}
+    failures = 0
+    for spec in specs:
+        try:
+            result, timings = run_fixture(spec)
+        except RenderError as e:
+            failures += 1
+            print(f"{spec['name']:<24} 页面异常  {e.script}")
+            for item in e.exceptions:
+                print(f"    {item['message']}\n    " + "\n    ".join(item['stack']))
+            continue
+        all_timings[spec['name']] = timings
+        path = golden_path(spec['name'])
+        if args.update or not os.path.exists(path):
+            with open(path, 'w', encoding='utf-8', newline='\r\n') as f:
+                json.dump(result, f, ensure_ascii=False, indent=1)
+                f.write('\n')
+            status = '已更新' if args.update else '新建基准'
+        else:
+            with open(path, encoding='utf-8') as f:
+                expected = json.load(f)
+            difference = first_difference(expected, json.loads(json.dumps(result)))
+            status = '一致' if difference is None else '不一致'
+            if difference is not None:
+                failures += 1
+        print(f"{spec['name']:<24} {status:<6} 合计 {timings['合计']:.2f}s  " +
+              "  ".join(f"{name} {seconds:.3f}s" for name, seconds in timings.items() if name != '合计'))
+        if status == '不一致':
+            where, expected_value, actual_value = difference
+            print(f"    位置 {where}\n    基准 {_short(expected_value)}\n    本次 {_short(actual_value)}")
+    if args.timings:
+        with open(args.timings, 'w', encoding='utf-8') as f:
+            json.dump(all_timings, f, ensure_ascii=False, indent=1)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
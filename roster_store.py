@@ -0,0 +1,365 @@
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import streamlit as st
+from canonical_codes import PSYCH_COLUMN_CANDIDATES
+from cohort_analysis import build_schema_index
+from session_cache import get_dataset_artifact
+
+# 本地花名册数据库：上传的数据按实体拆表保存到 SQLite，重启后仍可读取；
+# 学号、姓名、新班级、分流专业、辅导员建有索引：保存过的数据集搜索时先按索引做前缀查询，
+# 单个学生页面按学号做索引点查询读取该学生的全部字段。
+# 每次上传的完整数据都按 upload_id 保留；困难等级、心理评测等级和学期绩点另按学号记录每次上传相对上一次的变化。
+# 另有按用户保存的页面设置
+
+ROSTER_DB_PATH = os.environ.get(
+    'ROSTER_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'roster.sqlite3')
+)
+# 建索引的学生字段（students 表中的列名同原表头）
+INDEXED_COLUMNS = ['学号', '姓名', '新班级', '分流专业', '辅导员']
+YEAR_SCHOLARSHIP_PATTERN = re.compile(r'第([一二三四五六七八\d]+)学年(.*(?:奖学金|助学金|奖项).*)$')
+# 前缀查询的上界（比任何常用字符都大）
+PREFIX_UPPER_BOUND = '\U0010ffff'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    token TEXT,
+    file_name TEXT,
+    uploaded_at REAL,
+    row_count INTEGER,
+    columns TEXT
+);
+CREATE TABLE IF NOT EXISTS students (
+    upload_id INTEGER,
+    student_id INTEGER,
+    学号 TEXT, 姓名 TEXT, 新班级 TEXT, 分流专业 TEXT, 辅导员 TEXT,
+    record TEXT,
+    PRIMARY KEY (upload_id, student_id)
+);
+-- 各实体表按 (上传, 学生, 列名) 聚簇存储：读回整次上传和读取单个学生都是连续的范围扫描
+CREATE TABLE IF NOT EXISTS semester_gpa (
+    upload_id INTEGER, student_id INTEGER, 学期 TEXT, 序号 INTEGER, 列名 TEXT, 绩点,
+    PRIMARY KEY (upload_id, student_id, 列名)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS yearly_scores (
+    upload_id INTEGER, student_id INTEGER, 学年 TEXT, 字段 TEXT, 列名 TEXT, 值,
+    PRIMARY KEY (upload_id, student_id, 列名)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS scholarships (
+    upload_id INTEGER, student_id INTEGER, 学年 TEXT, 项目 TEXT, 列名 TEXT, 值,
+    PRIMARY KEY (upload_id, student_id, 列名)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS poverty_levels (
+    upload_id INTEGER, student_id INTEGER, 学年 TEXT, 列名 TEXT, 困难等级,
+    PRIMARY KEY (upload_id, student_id, 列名)
+) WITHOUT ROWID;
+-- 历次上传的变化记录：只保存与该学生上一次记录不同的取值
+CREATE TABLE IF NOT EXISTS student_history (
+    学号 TEXT, 列名 TEXT, upload_id INTEGER, 值,
+    PRIMARY KEY (学号, 列名, upload_id)
+) WITHOUT ROWID;
+-- 每个学号、每个跟踪字段的最新取值，保存新上传时据此计算变化
+CREATE TABLE IF NOT EXISTS student_latest (
+    学号 TEXT, 列名 TEXT, upload_id INTEGER, 值,
+    PRIMARY KEY (学号, 列名)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_students_学号 ON students (upload_id, 学号);
+CREATE INDEX IF NOT EXISTS idx_students_姓名 ON students (upload_id, 姓名);
+CREATE INDEX IF NOT EXISTS idx_students_新班级 ON students (upload_id, 新班级);
+CREATE INDEX IF NOT EXISTS idx_students_分流专业 ON students (upload_id, 分流专业);
+CREATE INDEX IF NOT EXISTS idx_students_辅导员 ON students (upload_id, 辅导员);
+-- 按用户保存的页面设置（如雷达图归一化范围），值为 JSON
+CREATE TABLE IF NOT EXISTS user_settings (
+    user TEXT, name TEXT, value TEXT, updated_at REAL,
+    PRIMARY KEY (user, name)
+) WITHOUT ROWID;
+"""
+# 各实体表：表名 -> 除 upload_id、student_id、列名、值以外的列
+ENTITY_TABLES = {
+    'semester_gpa': ['学期', '序号'],
+    'yearly_scores': ['学年', '字段'],
+    'scholarships': ['学年', '项目'],
+    'poverty_levels': ['学年']
+}
+ENTITY_VALUE_COLUMNS = {'semester_gpa': '绩点', 'yearly_scores': '值', 'scholarships': '值', 'poverty_levels': '困难等级'}
+
+
+def connect(path=None):
+    """打开数据库（不存在时建表）；每个线程使用自己的连接"""
+    conn = sqlite3.connect(path or ROSTER_DB_PATH)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _text_values(series):
+    """建索引用的文本：去空格，3.0 这类整数浮点数写成 3，空值为 None"""
+    values = series.astype(str).str.strip().str.replace(r'^(\d+)\.0$', r'\1', regex=True)
+    return values.mask(series.isna(), None).tolist()
+
+
+def _raw_values(series):
+    """原始取值转为 SQLite 可保存的 Python 对象，缺失值为 None"""
+    values = series.astype(object).where(series.notna(), None)
+    return [value if value is None or isinstance(value, (int, float, str)) else str(value) for value in values]
+
+
+def classify_columns(columns):
+    """把表头按实体分组：返回 {列名: (表名, 键列取值)}，不属于任何实体的列保存在 students.record 中"""
+    schema_index = build_schema_index(columns)
+    entities = {}
+    for order, (label, column) in enumerate(zip(schema_index['semesters'], schema_index['semester_columns'])):
+        entities[column] = ('semester_gpa', (label, order))
+    for year, fields in schema_index['year_fields'].items():
+        for field, column in fields.items():
+            entities[column] = ('yearly_scores', (year, field))
+    for year, column in schema_index['poverty_columns'].items():
+        entities[column] = ('poverty_levels', (year,))
+    for column in columns:
+        match = YEAR_SCHOLARSHIP_PATTERN.match(str(column))
+        if match and column not in entities:
+            entities[column] = ('scholarships', (match.group(1), match.group(2)))
+    return entities
+
+
+def history_columns(columns):
+    """需要跟踪历次变化的列：各学年困难等级、心理评测等级、各学期绩点"""
+    schema_index = build_schema_index(columns)
+    psych_columns = [col for col in PSYCH_COLUMN_CANDIDATES if col in columns]
+    return list(schema_index['poverty_columns'].values()) + psych_columns + schema_index['semester_columns']
+
+
+def student_id_text(value):
+    """学号的标准文本形式（与数据库中的学号一致）"""
+    return _text_values(pd.Series([value]))[0]
+
+
+def _record_history(conn, df, upload_id):
+    """按学号对比跟踪字段与上一次的取值，只写入发生变化的部分"""
+    columns = history_columns(df.columns)
+    if '学号' not in df.columns or not columns:
+        return
+    student_ids = pd.Series(_text_values(df['学号']))
+    rows = np.flatnonzero((student_ids.notna() & ~student_ids.duplicated(keep='last')).to_numpy())
+    latest = {(sid, column): value for sid, column, value in conn.execute("SELECT 学号, 列名, 值 FROM student_latest")}
+    changes = []
+    for column in columns:
+        name = str(column)
+        values = _raw_values(df[column].iloc[rows])
+        for sid, value in zip(student_ids.iloc[rows], values):
+            key = (sid, name)
+            if key in latest:
+                if latest[key] == value:
+                    continue
+            elif value is None:
+                continue
+            changes.append((sid, name, upload_id, value))
+    conn.executemany("INSERT INTO student_history (学号, 列名, upload_id, 值) VALUES (?, ?, ?, ?)", changes)
+    conn.executemany("INSERT OR REPLACE INTO student_latest (学号, 列名, upload_id, 值) VALUES (?, ?, ?, ?)", changes)
+
+
+def save_roster(df, token=None, file_name=None, path=None):
+    """把一张上传的表保存到数据库，返回 upload_id
+
+    student_id 为学生在原表中的行号，读回时保持原来的行顺序；之前上传的完整数据仍然保留，
+    历次上传的版本记录在 uploads 表中，跟踪字段的变化记录在 student_history 表中。
+    """
+    entities = classify_columns(df.columns)
+    record_columns = [col for col in df.columns if col not in entities]
+    student_ids = np.arange(len(df))
+    with closing(connect(path)) as conn, conn:
+        cursor = conn.execute(
+            "INSERT INTO uploads (token, file_name, uploaded_at, row_count, columns) VALUES (?, ?, ?, ?, ?)",
+            (token, file_name, time.time(), len(df), json.dumps([str(col) for col in df.columns], ensure_ascii=False))
+        )
+        upload_id = cursor.lastrowid
+
+        record_names = [str(col) for col in record_columns]
+        records = [dict(zip(record_names, row)) for row in zip(*(_raw_values(df[col]) for col in record_columns))] or [{}] * len(df)
+        indexed = [
+            _text_values(df[col]) if col in df.columns else [None] * len(df)
+            for col in INDEXED_COLUMNS
+        ]
+        conn.executemany(
+            "INSERT INTO students (upload_id, student_id, 学号, 姓名, 新班级, 分流专业, 辅导员, record) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ((upload_id, int(i), *values, json.dumps(record, ensure_ascii=False))
+             for i, record, *values in zip(student_ids, records, *indexed))
+        )
+
+        for column, (table, keys) in entities.items():
+            key_columns = ENTITY_TABLES[table]
+            conn.executemany(
+                f"INSERT INTO {table} (upload_id, student_id, {', '.join(key_columns)}, 列名, {ENTITY_VALUE_COLUMNS[table]}) "
+                f"VALUES ({', '.join('?' * (len(key_columns) + 4))})",
+                ((upload_id, int(sid), *keys, str(column), value) for sid, value in zip(student_ids, _raw_values(df[column])))
+            )
+
+        _record_history(conn, df, upload_id)
+    return upload_id
+
+
+def list_uploads(path=None):
+    """保存过的各次上传记录（dict 列表，最近的在前），没有时返回空列表"""
+    if not os.path.exists(path or ROSTER_DB_PATH):
+        return []
+    with closing(connect(path)) as conn:
+        rows = conn.execute(
+            "SELECT id, token, file_name, uploaded_at, row_count FROM uploads ORDER BY id DESC"
+        ).fetchall()
+    return [dict(zip(['id', 'token', 'file_name', 'uploaded_at', 'row_count'], row)) for row in rows]
+
+
+def load_roster(upload_id, path=None):
+    """从数据库读回一次上传的完整宽表（列顺序、行顺序与上传时相同）"""
+    with closing(connect(path)) as conn:
+        row_count, columns = conn.execute("SELECT row_count, columns FROM uploads WHERE id = ?", (upload_id,)).fetchone()
+        columns = json.loads(columns)
+        data = {}
+        records = [json.loads(record) for (record,) in conn.execute(
+            "SELECT record FROM students WHERE upload_id = ? ORDER BY student_id", (upload_id,)
+        )]
+        for column in (records[0].keys() if records else []):
+            data[column] = [record[column] for record in records]
+        for table, value_column in ENTITY_VALUE_COLUMNS.items():
+            for column, student_id, value in conn.execute(
+                f"SELECT 列名, student_id, {value_column} FROM {table} WHERE upload_id = ?", (upload_id,)
+            ):
+                if column not in data:
+                    data[column] = [None] * row_count
+                data[column][student_id] = value
+    return pd.DataFrame({column: data.get(column, [None] * row_count) for column in columns})
+
+
+def search_students(upload_id, term, path=None):
+    """按索引查找学号、姓名、新班级、分流专业或辅导员以 term 开头的学生，返回行号数组（升序）"""
+    term = term.strip()
+    if not term:
+        return np.array([], dtype=np.int64)
+    query = " UNION ".join(
+        f"SELECT student_id FROM students WHERE upload_id = ? AND {col} >= ? AND {col} < ?" for col in INDEXED_COLUMNS
+    )
+    params = [value for _ in INDEXED_COLUMNS for value in (upload_id, term, term + PREFIX_UPPER_BOUND)]
+    with closing(connect(path)) as conn:
+        rows = conn.execute(query, params).fetchall()
+    return np.sort(np.array([student_id for (student_id,) in rows], dtype=np.int64))
+
+
+def load_student(upload_id, student_id_value, path=None):
+    """按学号读取单个学生的全部字段（索引点查询），返回以原表头为索引、以行号为名称的 Series；
+    没有该学号时返回 None，学号重复时返回行号最小的一条"""
+    with closing(connect(path)) as conn:
+        row = conn.execute(
+            "SELECT student_id, record FROM students WHERE upload_id = ? AND 学号 = ? ORDER BY student_id LIMIT 1",
+            (upload_id, student_id_value)
+        ).fetchone()
+        if row is None:
+            return None
+        student_id, record = row
+        columns = json.loads(conn.execute("SELECT columns FROM uploads WHERE id = ?", (upload_id,)).fetchone()[0])
+        values = json.loads(record)
+        for table, value_column in ENTITY_VALUE_COLUMNS.items():
+            values.update(conn.execute(
+                f"SELECT 列名, {value_column} FROM {table} WHERE upload_id = ? AND student_id = ?", (upload_id, student_id)
+            ).fetchall())
+    return pd.Series({column: values.get(column) for column in columns}, name=student_id)
+
+
+def current_roster_upload():
+    """当前数据集保存在数据库中时返回其 upload_id，否则返回 None（在脚本线程中调用）"""
+    return get_dataset_artifact('roster_upload_id', lambda: None)
+
+
+def search_current_roster(upload_id, term):
+    """保存过的数据集按索引做前缀搜索，返回行号数组；未保存或查询失败时返回 None"""
+    if upload_id is None:
+        return None
+    try:
+        return search_students(upload_id, term)
+    except sqlite3.Error:
+        return None
+
+
+def load_roster_student(upload_id, df, position):
+    """读取第 position 行学生的全部字段：保存过的数据集按学号从数据库点查询，
+    未保存、查询失败或学号对应的不是这一行（学号重复）时从内存中的表读取"""
+    if upload_id is not None and '学号' in df.columns:
+        try:
+            student = load_student(upload_id, student_id_text(df['学号'].iat[position]))
+        except sqlite3.Error:
+            student = None
+        if student is not None and student.name == position:
+            student.name = df.index[position]
+            return student
+    return df.iloc[position]
+
+
+def load_user_setting(user, name, path=None):
+    """读取用户保存的设置，没有保存过时返回 None"""
+    if not os.path.exists(path or ROSTER_DB_PATH):
+        return None
+    with closing(connect(path)) as conn:
+        row = conn.execute("SELECT value FROM user_settings WHERE user = ? AND name = ?", (user, name)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def save_user_setting(user, name, value, path=None):
+    """保存（覆盖）用户的设置，value 须可序列化为 JSON"""
+    with closing(connect(path)) as conn, conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO user_settings (user, name, value, updated_at) VALUES (?, ?, ?, ?)",
+            (user, name, json.dumps(value, ensure_ascii=False), time.time())
+        )
+
+
+def load_student_history(student_id, path=None):
+    """按学号读取跟踪字段的历次取值（主键前缀查询）
+
+    返回以上传时间为行、字段为列的表。每次上传只记录了变化的字段：没有记录的沿用上一次的取值，
+    记录为空值（该次上传清空了字段）的保持为空。
+    """
+    if not os.path.exists(path or ROSTER_DB_PATH):
+        return pd.DataFrame()
+    with closing(connect(path)) as conn:
+        rows = conn.execute(
+            "SELECT h.upload_id, u.uploaded_at, u.file_name, h.列名, h.值 FROM student_history h "
+            "JOIN uploads u ON u.id = h.upload_id WHERE h.学号 = ?", (student_id,)
+        ).fetchall()
+    if not rows:
+        return pd.DataFrame()
+    changes = pd.DataFrame(rows, columns=['upload_id', 'uploaded_at', 'file_name', '列名', '值'])
+    changes['file_name'] = changes['file_name'].fillna('')
+    index = ['upload_id', 'uploaded_at', 'file_name']
+    values = changes.pivot(index=index, columns='列名', values='值')
+    # 只向前填充该次上传没有记录的单元格：按记录是否存在取每个单元格最近一次有记录的行
+    recorded = changes.assign(recorded=True).pivot(index=index, columns='列名', values='recorded').notna().to_numpy()
+    source = np.maximum.accumulate(np.where(recorded, np.arange(len(values))[:, None], -1), axis=0)
+    filled = values.to_numpy(dtype=object)[np.maximum(source, 0), np.arange(values.shape[1])]
+    history = pd.DataFrame(np.where(source >= 0, filled, None), index=values.index, columns=values.columns)
+    history = history.reset_index().drop(columns='upload_id')
+    history.columns.name = None
+    history.insert(0, '上传时间', history.pop('uploaded_at').map(
+        lambda timestamp: datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M')
+    ))
+    history = history.rename(columns={'file_name': '文件'})
+    # 字段按 困难等级、心理评测等级、学期绩点 的顺序排列
+    names = list(changes['列名'].unique())
+    ordered = [col for col in history_columns(names) if col in names]
+    return history[['上传时间', '文件'] + ordered + [col for col in names if col not in ordered]]
+
+
+def render_student_history(student_id):
+    """单个学生页面中的历次上传变化（只有一次上传记录时不显示表格）"""
+    try:
+        history = load_student_history(student_id_text(student_id))
+    except sqlite3.Error:
+        history = pd.DataFrame()
+    if len(history) < 2:
+        st.info("📜 暂无历次上传的变化记录（该学生只出现在一次上传中，或数据未保存到本地数据库）")
+        return
+    st.dataframe(history.astype(str).replace({'None': '无', 'nan': '无'}), use_container_width=True, hide_index=True)
@@ -0,0 +1,241 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，不统计进程峰值内存
+    resource = None
+
+# 运行指标：进程内汇总各会话的数据集内存占用、缓存命中率和主页（app.py / app2.py）各板块的运行耗时，
+# 定期写成 JSON 和 Prometheus 文本格式（textfile collector）供多实例部署时做容量规划。
+# 耗时和活跃会话由主页脚本末尾的 finish_run 记录，pages/ 下的分析页面不计入
+
+# 设置 METRICS_DIR 后每隔 METRICS_DUMP_INTERVAL 秒写出 metrics-<实例>.json 和 metrics-<实例>.prom；未设置时不写文件。
+# 多个进程可以共用同一个目录，各自写自己的文件
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_DUMP_INTERVAL = float(os.environ.get('METRICS_DUMP_INTERVAL', '30'))
+# 实例标识：默认取主机名和进程号，可用 METRICS_INSTANCE 指定
+METRICS_INSTANCE = os.environ.get('METRICS_INSTANCE') or f'{socket.gethostname()}-{os.getpid()}'
+# 会话在这么多秒内有过运行才算活跃
+ACTIVE_SESSION_SECONDS = 300
+# 每个板块保留的耗时样本数，及输出的百分位
+LATENCY_SAMPLES = 500
+LATENCY_PERCENTILES = [50, 90, 99]
+
+_lock = threading.Lock()
+_cache_counts = defaultdict(lambda: [0, 0])  # 缓存名 -> [命中, 未命中]
+_cache_info_sources = {}  # 缓存名 -> 返回 functools 风格 cache_info() 的函数
+_latencies = defaultdict(lambda: deque(maxlen=LATENCY_SAMPLES))  # (页面, 板块) -> 最近的耗时
+_sessions = {}  # 会话标识 -> 最近一次运行时的状态
+_dumper_started = False
+logger = logging.getLogger(__name__)
+
+
+def record_cache(name, hit):
+    """记录一次缓存查询的结果"""
+    with _lock:
+        _cache_counts[name][0 if hit else 1] += 1
+
+
+def register_cache_info(name, cache_info):
+    """登记一个 functools.lru_cache 风格的缓存，汇总时读取它的 hits / misses"""
+    with _lock:
+        _cache_info_sources[name] = cache_info
+
+
+def record_run(page, marks):
+    """记录一次主页脚本运行的各板块耗时；marks 为 {标记: 从脚本开始的累计秒数}，按顺序相减得到每个板块的耗时"""
+    previous = 0.0
+    with _lock:
+        for section, elapsed in marks.items():
+            _latencies[(page, section)].append(elapsed - previous)
+            previous = elapsed
+        _latencies[(page, '整次运行')].append(previous)
+
+
+def object_nbytes(value):
+    """估算预计算结果占用的内存：NumPy 数组和 DataFrame 按实际大小，容器递归累加"""
+    if isinstance(value, np.memmap):
+        return 0  # 共享成绩矩阵映射自文件，由各进程共用，不计入会话内存
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(index=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if isinstance(value, dict):
+        return sum(object_nbytes(item) for item in list(value.values()))  # 预计算流水线可能同时在写入
+    if isinstance(value, (list, tuple)):
+        return sum(object_nbytes(item) for item in value)
+    return 0
+
+
+def _dataset_nbytes(df, token):
+    # 含字符串内容的精确大小需要逐个对象统计，只在数据集变化时计算一次
+    cached = st.session_state.get('metrics_dataset_nbytes')
+    if cached is None or cached[0] != token:
+        cached = (token, int(df.memory_usage(index=True, deep=True).sum()))
+        st.session_state.metrics_dataset_nbytes = cached
+    return cached[1]
+
+
+def touch_session(page):
+    """在脚本末尾调用：记录当前会话仍然活跃，以及它持有的数据集和预计算结果的大小"""
+    if 'metrics_session_id' not in st.session_state:
+        st.session_state.metrics_session_id = uuid.uuid4().hex
+    df = st.session_state.get('students_data')
+    token = st.session_state.get('dataset_token')
+    state = {
+        'page': page,
+        'last_seen': time.time(),
+        'dataset_rows': 0 if df is None else len(df),
+        'dataset_bytes': 0 if df is None else _dataset_nbytes(df, token),
+        'artifact_bytes': object_nbytes(st.session_state.get('dataset_artifacts', {})),
+        'running_jobs': sum(job.running for job in st.session_state.get('background_jobs', {}).values())
+    }
+    with _lock:
+        _sessions[st.session_state.metrics_session_id] = state
+    start_metrics_dumper()
+
+
+def _process_rss_bytes():
+    # 当前常驻内存：/proc/self/statm 的第二项为常驻页数（只有 Linux 有，其他系统不统计）
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _process_peak_rss_bytes():
+    if resource is None:
+        return None
+    # Linux 上 ru_maxrss 的单位是 KB（峰值常驻内存，只增不减）
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def snapshot():
+    """当前进程的全部指标（可直接序列化为 JSON）"""
+    now = time.time()
+    with _lock:
+        # 过期会话不再计入（会话关闭时没有通知，只能按最近运行时间判断）
+        for session_id in [sid for sid, state in _sessions.items() if now - state['last_seen'] > ACTIVE_SESSION_SECONDS]:
+            del _sessions[session_id]
+        sessions = list(_sessions.values())
+        caches = {name: {'hits': hits, 'misses': misses} for name, (hits, misses) in _cache_counts.items()}
+        info_sources = dict(_cache_info_sources)
+        latencies = {key: np.array(samples) for key, samples in _latencies.items() if samples}
+    for name, cache_info in info_sources.items():
+        info = cache_info()
+        caches[name] = {'hits': info.hits, 'misses': info.misses}
+    for counts in caches.values():
+        total = counts['hits'] + counts['misses']
+        counts['hit_rate'] = round(counts['hits'] / total, 4) if total else None
+    return {
+        'timestamp': now,
+        'instance': METRICS_INSTANCE,
+        'pid': os.getpid(),
+        'process_rss_bytes': _process_rss_bytes(),
+        'process_peak_rss_bytes': _process_peak_rss_bytes(),
+        'active_sessions': len(sessions),
+        'sessions_by_page': {page: sum(s['page'] == page for s in sessions) for page in sorted({s['page'] for s in sessions})},
+        'datasets_in_memory': sum(s['dataset_rows'] > 0 for s in sessions),
+        'dataset_bytes': sum(s['dataset_bytes'] for s in sessions),
+        'artifact_bytes': sum(s['artifact_bytes'] for s in sessions),
+        'largest_dataset_bytes': max((s['dataset_bytes'] for s in sessions), default=0),
+        'running_background_jobs': sum(s['running_jobs'] for s in sessions),
+        'caches': caches,
+        'latency_seconds': [
+            {'page': page, 'section': section, 'count': len(samples),
+             **{f'p{q}': round(float(value), 4) for q, value in zip(LATENCY_PERCENTILES, np.percentile(samples, LATENCY_PERCENTILES))}}
+            for (page, section), samples in sorted(latencies.items())
+        ]
+    }
+
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def prometheus_text(metrics):
+    """把 snapshot() 的结果写成 Prometheus 文本格式"""
+    lines = []
+
+    def gauge(name, help_text, samples):
+        lines.append(f'# HELP student_app_{name} {help_text}')
+        lines.append(f'# TYPE student_app_{name} gauge')
+        for labels, value in samples:
+            if value is None:
+                continue
+            # 同一目录下各实例的文件会被合并采集，每条样本都带上实例标签以免重复
+            labels = {'app_instance': metrics['instance'], **labels}
+            label_text = ','.join(f'{key}="{_label_value(val)}"' for key, val in labels.items())
+            lines.append(f'student_app_{name}{{{label_text}}} {value}')
+
+    gauge('active_sessions', '最近有运行的会话数', [({}, metrics['active_sessions'])])
+    gauge('sessions_by_page', '各主页的活跃会话数', [({'page': page}, count) for page, count in metrics['sessions_by_page'].items()])
+    gauge('datasets_in_memory', '持有数据集的会话数', [({}, metrics['datasets_in_memory'])])
+    gauge('dataset_bytes', '各会话数据集占用的内存合计', [({}, metrics['dataset_bytes'])])
+    gauge('largest_dataset_bytes', '单个会话数据集占用的最大内存', [({}, metrics['largest_dataset_bytes'])])
+    gauge('artifact_bytes', '各会话预计算结果占用的内存合计', [({}, metrics['artifact_bytes'])])
+    gauge('running_background_jobs', '正在运行的后台任务数（上传读取、导出等）', [({}, metrics['running_background_jobs'])])
+    gauge('process_rss_bytes', '进程当前常驻内存', [({}, metrics['process_rss_bytes'])])
+    gauge('process_peak_rss_bytes', '进程峰值常驻内存', [({}, metrics['process_peak_rss_bytes'])])
+    gauge('cache_hits', '缓存命中次数', [({'cache': name}, c['hits']) for name, c in metrics['caches'].items()])
+    gauge('cache_misses', '缓存未命中次数', [({'cache': name}, c['misses']) for name, c in metrics['caches'].items()])
+    gauge('cache_hit_rate', '缓存命中率', [({'cache': name}, c['hit_rate']) for name, c in metrics['caches'].items()])
+    gauge('section_latency_seconds', '主页各板块运行耗时的百分位', [
+        ({'page': item['page'], 'section': item['section'], 'quantile': f'0.{q:02d}'}, item[f'p{q}'])
+        for item in metrics['latency_seconds'] for q in LATENCY_PERCENTILES
+    ])
+    return '\n'.join(lines) + '\n'
+
+
+def _write_atomic(path, text):
+    # 先写临时文件再替换，采集程序不会读到写了一半的文件；临时文件名带进程号，不与其他进程冲突
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+
+def dump_metrics(directory):
+    """把当前指标写到 directory 下本实例的 metrics-<实例>.json 和 metrics-<实例>.prom"""
+    metrics = snapshot()
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, f'metrics-{METRICS_INSTANCE}')
+    _write_atomic(f'{base}.json', json.dumps(metrics, ensure_ascii=False, indent=2))
+    _write_atomic(f'{base}.prom', prometheus_text(metrics))
+
+
+def _dump_loop(directory):
+    logged = False
+    while True:
+        try:
+            dump_metrics(directory)
+        except Exception:
+            # 写文件或汇总失败（如登记的 cache_info 出错）不影响页面，线程继续运行下次再试；同样的失败只记录一次日志
+            if not logged:
+                logger.exception("写出运行指标失败，之后每隔 %s 秒重试", METRICS_DUMP_INTERVAL)
+                logged = True
+        time.sleep(METRICS_DUMP_INTERVAL)
+
+
+def start_metrics_dumper():
+    """配置了 METRICS_DIR 时启动定期写出指标的后台线程（每个进程一个）"""
+    global _dumper_started
+    if not METRICS_DIR:
+        return
+    with _lock:
+        if _dumper_started:
+            return
+        _dumper_started = True
+    threading.Thread(target=_dump_loop, args=(METRICS_DIR,), name='metrics-dumper', daemon=True).start()
@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+from cohort_analysis import RADAR_FIELDS, build_schema_index, get_year_sort_key, numeric_column
+from cohort_filters import normalize_category_values
+from shared_matrix import get_score_blocks
+from session_cache import get_dataset_artifact
+
+# 奖助学金评定：按 年级 × 分流专业 分组，对全体学生按加权成绩排名，硬性条件不满足的学生不参与排名
+
+AWARD_TYPES = ['人民奖学金', '助学金']
+# 参与加权的成绩项，及默认权重
+RANKING_METRICS = ['综测总分', '智育', '学年绩点']
+DEFAULT_WEIGHTS = {'综测总分': 0.6, '智育': 0.2, '学年绩点': 0.2}
+# 默认推荐比例（组内参与排名人数的百分比，向上取整）
+DEFAULT_QUOTA_PERCENT = 10
+# 体测评级为这些值时不能评奖
+FAILED_FITNESS_RATINGS = ['不及格']
+# 助学金要求该学年有困难等级，困难等级为这些值时视为没有
+NO_POVERTY_VALUES = ['无', '否', '不困难']
+GRADE_COLUMN = '年级'
+MAJOR_COLUMN = '分流专业'
+
+
+def default_rules(year, award=AWARD_TYPES[0]):
+    """评定规则：评定类型、学年、各成绩项权重、硬性条件和推荐比例"""
+    return {
+        'award': award,
+        'year': year,
+        'weights': dict(DEFAULT_WEIGHTS),
+        'require_no_fail': True,
+        'require_fitness_pass': True,
+        'quota_percent': DEFAULT_QUOTA_PERCENT
+    }
+
+
+def rules_signature(rules):
+    """规则的可哈希表示，作为排名结果的缓存键"""
+    return tuple(sorted((key, tuple(sorted(value.items())) if isinstance(value, dict) else value)
+                        for key, value in rules.items()))
+
+
+def student_grades(df):
+    """年级：有'年级'列时直接使用，否则取学号前四位（入学年份）"""
+    if GRADE_COLUMN in df.columns:
+        return normalize_category_values(df[GRADE_COLUMN])
+    if '学号' not in df.columns:
+        return pd.Series('无', index=df.index)
+    years = df['学号'].astype(str).str.extract(r'^(\d{4})', expand=False)
+    return (years + '级').fillna('无')
+
+
+def build_ranking_groups(df):
+    """分组编号数组和组名数组（年级 · 分流专业）"""
+    majors = normalize_category_values(df[MAJOR_COLUMN]) if MAJOR_COLUMN in df.columns else pd.Series('无', index=df.index)
+    codes, names = pd.factorize(student_grades(df) + ' · ' + majors, sort=True)
+    return codes, np.asarray(names, dtype=object)
+
+
+def year_gpa(gpa_matrix, schema_index, year):
+    """某学年两个学期绩点的平均值（第 n 学年对应第 2n-1、2n 学期），没有绩点为 NaN"""
+    year_number = get_year_sort_key(year)
+    semester_idx = [idx for idx, label in enumerate(schema_index['semesters'])
+                    if (get_year_sort_key(label[1:-2]) + 1) // 2 == year_number]
+    if not semester_idx:
+        return np.full(len(gpa_matrix), np.nan)
+    matrix = gpa_matrix[:, semester_idx]
+    with np.errstate(invalid='ignore'):
+        counts = (~np.isnan(matrix)).sum(axis=1)
+        return np.where(counts > 0, np.nansum(matrix, axis=1) / np.maximum(counts, 1), np.nan)
+
+
+def build_year_inputs(df, schema_index, score_blocks, year):
+    """某学年参与评定的数值列和硬性条件列（与行号对齐），同一学年的不同规则共用
+
+    成绩取自共享成绩矩阵 score_blocks（见 shared_matrix）。
+    """
+    fields = schema_index['year_fields'].get(year, {})
+    year_scores = score_blocks['radar_raw'][:, schema_index['years'].index(year), :]
+    fitness = normalize_category_values(df[fields['体测评级']]) if '体测评级' in fields else None
+    poverty_column = schema_index['poverty_columns'].get(year)
+    poverty = normalize_category_values(df[poverty_column]) if poverty_column else pd.Series('无', index=df.index)
+    return {
+        'metrics': {
+            '综测总分': year_scores[:, RADAR_FIELDS.index('综测总分')],
+            '智育': year_scores[:, RADAR_FIELDS.index('智育')],
+            '学年绩点': year_gpa(score_blocks['gpa'], schema_index, year)
+        },
+        # 挂科为空视为没有挂科
+        'failed': np.nan_to_num(numeric_column(df, '挂科'), nan=0.0) > 0,
+        'fitness_failed': fitness.isin(FAILED_FITNESS_RATINGS).to_numpy() if fitness is not None else np.zeros(len(df), dtype=bool),
+        'poverty': poverty.to_numpy(dtype=object),
+        'has_poverty': ~poverty.isin(NO_POVERTY_VALUES).to_numpy()
+    }
+
+
+def rank_students(inputs, group_codes, rules):
+    """按规则对全体学生排名，返回按 (组, 组内名次) 排好序的行号和各项结果
+
+    加权得分为各成绩项在组内参与排名学生中的百分位（0-100）按权重加权；
+    同分时依次比较综测总分、智育、学年绩点，再按行号。一次 lexsort 完成所有组的排序。
+    """
+    metrics = inputs['metrics']
+    eligible = ~np.isnan(metrics['综测总分']) & (group_codes >= 0)
+    if rules['require_no_fail']:
+        eligible &= ~inputs['failed']
+    if rules['require_fitness_pass']:
+        eligible &= ~inputs['fitness_failed']
+    if rules['award'] == '助学金':
+        eligible &= inputs['has_poverty']
+
+    positions = np.flatnonzero(eligible)
+    codes = group_codes[positions]
+    weights = {name: float(rules['weights'].get(name, 0)) for name in RANKING_METRICS}
+    total_weight = sum(weights.values()) or 1.0
+    score = np.zeros(len(positions))
+    for name, weight in weights.items():
+        if weight:
+            percentile = pd.Series(metrics[name][positions]).groupby(codes).rank(pct=True).to_numpy() * 100
+            score += np.nan_to_num(percentile, nan=0.0) * weight / total_weight
+
+    # lexsort 以最后一个键为主键：组编号 → 加权得分 → 综测总分 → 智育 → 学年绩点 → 行号
+    order = np.lexsort((
+        positions,
+        -metrics['学年绩点'][positions],
+        -metrics['智育'][positions],
+        -metrics['综测总分'][positions],
+        -score,
+        codes
+    ))
+    positions, codes, score = positions[order], codes[order], score[order]
+    group_starts = np.searchsorted(codes, codes, side='left')
+    group_sizes = np.searchsorted(codes, codes, side='right') - group_starts
+    rank = np.arange(len(positions)) - group_starts + 1
+    quota = np.ceil(group_sizes * rules['quota_percent'] / 100).astype(int)
+    return {
+        'positions': positions,
+        'group_codes': codes,
+        'score': score,
+        'rank': rank,
+        'recommended': rank <= quota,
+        'eligible_count': int(eligible.sum())
+    }
+
+
+def get_ranking(df, rules):
+    """读取（必要时计算）当前数据集按该规则的排名，按规则缓存，切换分组查看时不重算"""
+    schema_index = get_dataset_artifact('schema_index', lambda: build_schema_index(df.columns))
+    group_codes, group_names = get_dataset_artifact('ranking_groups', lambda: build_ranking_groups(df))
+    inputs = get_dataset_artifact(
+        f"ranking_inputs:{rules['year']}", lambda: build_year_inputs(df, schema_index, get_score_blocks(df, schema_index), rules['year'])
+    )
+    ranking = get_dataset_artifact(
+        f'scholarship_ranking:{rules_signature(rules)}', lambda: rank_students(inputs, group_codes, rules)
+    )
+    return ranking, inputs, group_names
+
+
+def ranking_table(df, ranking, inputs, group_index):
+    """某一组的排名列表（按名次排列）"""
+    rows = ranking['group_codes'] == group_index
+    positions = ranking['positions'][rows]
+    metrics = inputs['metrics']
+    return pd.DataFrame({
+        '名次': ranking['rank'][rows],
+        '推荐': np.where(ranking['recommended'][rows], '✅', ''),
+        '学号': df['学号'].astype(str).to_numpy()[positions] if '学号' in df.columns else positions.astype(str),
+        '姓名': df['姓名'].astype(str).to_numpy()[positions] if '姓名' in df.columns else '',
+        '加权得分': ranking['score'][rows].round(1),
+        '综测总分': metrics['综测总分'][positions].round(2),
+        '智育': metrics['智育'][positions].round(2),
+        '学年绩点': metrics['学年绩点'][positions].round(2),
+        '困难等级': inputs['poverty'][positions]
+    })
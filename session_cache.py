@@ -0,0 +1,179 @@
+import threading
+from collections import OrderedDict
+import streamlit as st
+from background_jobs import StagePipeline
+from runtime_metrics import record_cache
+
+# 按学生缓存板块结果时最多保留的学生数（当前学生 + 预取的相邻学生）
+STUDENT_CACHE_SIZE = 8
+
+
+class StudentSectionCache:
+    """按学生缓存板块计算结果的 LRU，后台预取线程可以安全地写入"""
+
+    def __init__(self, max_students=STUDENT_CACHE_SIZE):
+        self.max_students = max_students
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _touch(self, owner):
+        sections = self._entries.get(owner)
+        if sections is None:
+            sections = self._entries[owner] = {}
+        self._entries.move_to_end(owner)
+        while len(self._entries) > self.max_students:
+            self._entries.popitem(last=False)
+        return sections
+
+    def get(self, owner, section_name, builder):
+        with self._lock:
+            sections = self._entries.get(owner)
+            if sections is not None and section_name in sections:
+                self._entries.move_to_end(owner)
+                record_cache('student_section', True)
+                return sections[section_name]
+        record_cache('student_section', False)
+        # 在锁外计算，避免阻塞后台预取
+        value = builder()
+        with self._lock:
+            return self._touch(owner).setdefault(section_name, value)
+
+    def missing(self, owner, section_names):
+        """返回该学生尚未缓存的板块名"""
+        with self._lock:
+            sections = self._entries.get(owner, {})
+            return [name for name in section_names if name not in sections]
+
+    def prefill(self, owner, sections):
+        """写入预取结果（已有的板块不覆盖）"""
+        with self._lock:
+            entry = self._touch(owner)
+            for name, value in sections.items():
+                entry.setdefault(name, value)
+
+
+# 工具函数：会话级缓存
+def get_dataset_token():
+    """返回当前数据集的标识（随上传文件变化），用于区分不同数据集的缓存"""
+    return st.session_state.get('dataset_token')
+
+
+def reset_section_cache():
+    """清空按学生缓存的板块计算结果"""
+    st.session_state.section_cache = StudentSectionCache()
+
+
+def reset_dataset_cache():
+    """上传新数据时调用：清空整个数据集的预计算结果和学生板块缓存"""
+    st.session_state.dataset_artifacts = {}
+    reset_section_cache()
+
+
+def install_dataset(df, token, artifacts=None):
+    """切换到新数据集：数据、标识和上传时预计算的结果一起替换，旧数据集的缓存全部丢弃"""
+    _cancel_artifact_pipeline()
+    st.session_state.dataset_artifacts = {(token, name): value for name, value in (artifacts or {}).items()}
+    reset_section_cache()
+    st.session_state.dataset_token = token
+    st.session_state.students_data = df
+
+
+def get_dataset_artifact(name, builder):
+    """按数据集缓存群体级的计算结果（如归一化矩阵），同一数据集只计算一次"""
+    if 'dataset_artifacts' not in st.session_state:
+        st.session_state.dataset_artifacts = {}
+    artifacts = st.session_state.dataset_artifacts
+    key = (get_dataset_token(), name)
+    pipeline = get_artifact_pipeline()
+    if key not in artifacts and pipeline is not None and pipeline.pending(name):
+        # 后台流水线正在计算该结果：等它完成，不重复计算
+        pipeline.wait(name)
+    record_cache('dataset_artifact', key in artifacts)
+    if key not in artifacts:
+        artifacts[key] = builder()
+    return artifacts[key]
+
+
+def discard_dataset_artifacts(names):
+    """丢弃当前数据集的某些预计算结果（其依赖的数据或设置已变化），下次读取时重新计算"""
+    artifacts = st.session_state.get('dataset_artifacts', {})
+    token = get_dataset_token()
+    pipeline = get_artifact_pipeline()
+    if pipeline is not None:
+        pipeline.forget(names)
+    for name in names:
+        artifacts.pop((token, name), None)
+
+
+def start_artifact_pipeline(stages, inputs=None):
+    """在后台线程池中预先计算当前数据集的结果，每一项完成后立即写入数据集缓存
+
+    stages 的格式见 background_jobs.StagePipeline；页面读取尚未完成的结果时会等待流水线，而不是重复计算。
+    """
+    _cancel_artifact_pipeline()
+    if 'dataset_artifacts' not in st.session_state:
+        st.session_state.dataset_artifacts = {}
+    artifacts = st.session_state.dataset_artifacts
+    token = get_dataset_token()
+
+    def publish(name, value):
+        # 页面已经按需算出的结果不覆盖
+        artifacts.setdefault((token, name), value)
+
+    st.session_state.artifact_pipeline = StagePipeline(stages, publish, inputs, signature=token)
+    return st.session_state.artifact_pipeline
+
+
+def get_artifact_pipeline():
+    """当前数据集的预计算流水线，没有时返回 None"""
+    pipeline = st.session_state.get('artifact_pipeline')
+    return pipeline if pipeline is not None and pipeline.signature == get_dataset_token() else None
+
+
+def _cancel_artifact_pipeline():
+    pipeline = st.session_state.pop('artifact_pipeline', None)
+    if pipeline is not None:
+        pipeline.cancel()
+
+
+def _get_section_cache():
+    if 'section_cache' not in st.session_state:
+        reset_section_cache()
+    return st.session_state.section_cache
+
+
+def get_student_section(student_key, section_name, builder):
+    """板块展开时才调用 builder 计算，结果按学生缓存
+
+    缓存只保留最近的 STUDENT_CACHE_SIZE 名学生，避免会话中累积过多图表对象。
+    """
+    return _get_section_cache().get((get_dataset_token(), student_key), section_name, builder)
+
+
+def prefetch_student_sections(jobs):
+    """在后台线程中预先计算其他学生（通常是相邻学生）的板块数据
+
+    jobs 为 (student_key, 板块名列表, builder) 的列表，builder 返回 {板块名: 结果}；
+    已全部缓存的学生会被跳过。builder 在后台线程中执行，不能调用 st.* 接口。
+    """
+    cache = _get_section_cache()
+    token = get_dataset_token()
+    pending = [((token, student_key), builder) for student_key, section_names, builder in jobs
+               if cache.missing((token, student_key), section_names)]
+    if not pending:
+        return
+
+    def run():
+        for owner, builder in pending:
+            try:
+                cache.prefill(owner, builder())
+            except Exception:
+                # 预取失败不影响页面，翻到该学生时会按需重新计算
+                continue
+
+    threading.Thread(target=run, name='student-prefetch', daemon=True).start()
+
+
+def lazy_section(label, key, default=False):
+    """按需展开的板块开关：关闭时板块内的图表与指标卡片不会被计算"""
+    return st.toggle(label, value=default, key=key)
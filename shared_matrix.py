@@ -0,0 +1,89 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from cohort_analysis import RADAR_FIELDS, build_gpa_matrix, build_radar_raw
+from session_cache import get_dataset_artifact
+
+# 共享成绩矩阵：同一台机器上的多个 Streamlit 进程共用一份成绩数值矩阵。
+# 矩阵按成绩列内容的哈希写成 .npy 文件，各进程以只读内存映射打开，不再各自保存一份副本
+
+# 矩阵文件目录，可通过环境变量 SHARED_MATRIX_DIR 配置（多个进程需配置为同一目录）
+SHARED_MATRIX_DIR = os.environ.get('SHARED_MATRIX_DIR', os.path.join(tempfile.gettempdir(), 'student_score_matrices'))
+# 最多保留的数据集个数，超出时删除最早写入的（已映射的进程不受影响，Windows 上删除失败则跳过）
+SHARED_MATRIX_KEEP = 20
+SCORE_BLOCKS = ['gpa', 'radar_raw']
+
+
+def score_columns(schema_index):
+    """参与共享矩阵的列：各学期绩点，以及各学年的德育、智育、体测成绩、附加分、综测总分"""
+    columns = list(schema_index['semester_columns'])
+    for year in schema_index['years']:
+        fields = schema_index['year_fields'][year]
+        columns.extend(fields[field] for field in RADAR_FIELDS if field in fields)
+    return columns
+
+
+def dataset_hash(df, schema_index):
+    """成绩列内容（含列名和顺序）的哈希；成绩相同的数据集在各进程中得到相同的哈希"""
+    columns = score_columns(schema_index)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((len(df), [str(col) for col in columns], schema_index['years'])).encode('utf-8'))
+    if columns:
+        digest.update(pd.util.hash_pandas_object(df[columns], index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _block_path(directory, name):
+    return os.path.join(directory, f'{name}.npy')
+
+
+def _open_blocks(directory):
+    """以只读内存映射打开已写好的矩阵，缺少文件时返回 None"""
+    if not all(os.path.exists(_block_path(directory, name)) for name in SCORE_BLOCKS):
+        return None
+    return {name: np.load(_block_path(directory, name), mmap_mode='r') for name in SCORE_BLOCKS}
+
+
+def _write_blocks(directory, blocks):
+    # 每个文件先写到临时文件再替换，其他进程不会映射到写了一半的文件
+    os.makedirs(directory, exist_ok=True)
+    for name in SCORE_BLOCKS:
+        temp_path = os.path.join(directory, f'{name}.{os.getpid()}.tmp')
+        with open(temp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(blocks[name]))
+        os.replace(temp_path, _block_path(directory, name))
+
+
+def _prune(root, keep):
+    entries = [os.path.join(root, name) for name in os.listdir(root)]
+    entries = sorted((path for path in entries if os.path.isdir(path)), key=os.path.getmtime, reverse=True)
+    for path in entries[keep:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def load_score_blocks(df, schema_index, root=SHARED_MATRIX_DIR):
+    """返回 {'gpa': (学生数, 学期数), 'radar_raw': (学生数, 学年数, 维度数)} 的只读内存映射矩阵
+
+    其他进程已经写过同一数据集时直接映射；否则计算一次写入文件后再映射。
+    目录不可写时退回为进程内的普通数组。
+    """
+    directory = os.path.join(root, dataset_hash(df, schema_index))
+    try:
+        blocks = _open_blocks(directory)
+        if blocks is None:
+            _write_blocks(directory, {'gpa': build_gpa_matrix(df, schema_index), 'radar_raw': build_radar_raw(df, schema_index)})
+            _prune(root, SHARED_MATRIX_KEEP)
+            blocks = _open_blocks(directory)
+        if blocks is not None:
+            return blocks
+    except (OSError, ValueError):
+        pass
+    return {'gpa': build_gpa_matrix(df, schema_index), 'radar_raw': build_radar_raw(df, schema_index)}
+
+
+def get_score_blocks(df, schema_index):
+    """当前数据集的共享成绩矩阵，按数据集缓存（同一会话中只哈希、映射一次）"""
+    return get_dataset_artifact('score_blocks', lambda: load_score_blocks(df, schema_index))
@@ -0,0 +1,88 @@
+import os
+import re
+import threading
+import time
+import streamlit as st
+from runtime_metrics import record_run, touch_session
+
+# 启动耗时：每次脚本运行记录服务端脚本执行到首屏内容（上传区域）结束、到脚本结束的时间，
+# 进程内的第一次运行（冷启动）单独保存；这些都是脚本时间，不含网络传输和浏览器渲染。
+# 重型依赖（plotly 图表、openpyxl）在用到时才导入，首屏脚本之后在后台线程中预热
+
+# 设置环境变量 SHOW_STARTUP_TIMING=1 时在页面底部显示本次运行的耗时
+SHOW_STARTUP_TIMING = os.environ.get('SHOW_STARTUP_TIMING', '') not in ('', '0')
+# 冷启动时首屏脚本时间的预算（秒），超出时在耗时说明中提醒
+FIRST_PAINT_BUDGET = float(os.environ.get('FIRST_PAINT_BUDGET', '1.5'))
+
+_lock = threading.Lock()
+_minified_css = {}
+# 进程内第一次运行的耗时 {标记: 秒}，以及是否已经开始预热
+_cold_start = {}
+_prewarm_started = False
+
+
+def start_run_timer(page):
+    """在脚本最开始调用，返回本次运行的计时器"""
+    return {'page': page, 'start': time.perf_counter(), 'marks': {}}
+
+
+def mark(timer, name):
+    """记录从脚本开始到此处的耗时（秒）；相邻两个标记之间的时间计为后一个标记所在板块的耗时"""
+    timer['marks'][name] = time.perf_counter() - timer['start']
+
+
+def _minify_css(css):
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    return re.sub(r'\s*([{};:,>])\s*', r'\1', css).replace('<style> ', '<style>').strip()
+
+
+def inject_css(css):
+    """注入页面样式；去掉注释和空白后的样式按原文缓存，每次重新运行只发送压缩后的文本"""
+    minified = _minified_css.get(css)
+    if minified is None:
+        minified = _minified_css.setdefault(css, _minify_css(css))
+    st.markdown(minified, unsafe_allow_html=True)
+
+
+def _prewarm():
+    # 第一次创建 plotly 图表时要加载全部图形校验器，耗时约 0.2 秒，提前在后台完成
+    import plotly.graph_objects as go
+    go.Figure(go.Scatter())
+    go.Figure(go.Scatterpolar())
+    import openpyxl  # 上传和导出时才用到
+
+
+def prewarm_heavy_imports():
+    """首屏脚本执行完后在后台线程中预先导入图表和 Excel 依赖（每个进程只做一次）"""
+    global _prewarm_started
+    with _lock:
+        if _prewarm_started:
+            return
+        _prewarm_started = True
+    threading.Thread(target=_prewarm, name='startup-prewarm', daemon=True).start()
+
+
+def get_cold_start_timings():
+    """进程内第一次运行的耗时 {标记: 秒}，尚未运行过时为空"""
+    with _lock:
+        return dict(_cold_start)
+
+
+def finish_run(timer):
+    """在脚本末尾调用：保存本次耗时，冷启动时另外记录，汇总到运行指标中，并按需显示"""
+    mark(timer, '脚本结束')
+    record_run(timer['page'], timer['marks'])
+    touch_session(timer['page'])
+    with _lock:
+        cold = not _cold_start
+        if cold:
+            _cold_start.update(timer['marks'])
+    st.session_state.startup_timings = dict(timer['marks'])
+    prewarm_heavy_imports()
+    if SHOW_STARTUP_TIMING:
+        text = " · ".join(f"{name} {seconds:.3f}s" for name, seconds in timer['marks'].items())
+        st.caption(f"⏱️ {'冷启动' if cold else '本次运行'}：{text}")
+        first_paint = timer['marks'].get('首屏脚本')
+        if cold and first_paint is not None and first_paint > FIRST_PAINT_BUDGET:
+            st.caption(f"⚠️ 冷启动首屏脚本用时超过预算 {FIRST_PAINT_BUDGET:.1f}s")
@@ -0,0 +1,94 @@
+import numpy as np
+import streamlit as st
+from runtime_metrics import record_cache
+from session_cache import get_dataset_token
+
+# 学生导航：筛选结果（整表中的行号数组）和当前光标保存在 session_state 中，
+# 翻页时不再重新过滤、重建选项列表
+
+
+def _set_cursor(cursor):
+    st.session_state.selected_student_index = cursor
+    st.session_state.student_selector = cursor
+
+
+def _on_select():
+    st.session_state.selected_student_index = st.session_state.student_selector
+
+
+def _move_cursor(step, count):
+    cursor = st.session_state.selected_student_index + step
+    _set_cursor(max(0, min(count - 1, cursor)))
+
+
+def focus_student(position):
+    """请求在学生详情中选中整表第 position 行的学生（如从排名列表跳转过来），下次取筛选结果时生效"""
+    st.session_state.student_focus = int(position)
+
+
+def _apply_focus(positions):
+    focus = st.session_state.pop('student_focus', None)
+    if focus is None:
+        return
+    found = np.flatnonzero(positions == focus)
+    if len(found):
+        _set_cursor(int(found[0]))
+    else:
+        st.warning("要查看的学生不在当前的搜索或筛选结果中，请清除筛选条件后再查看")
+
+
+def get_filtered_positions(signature, compute_positions):
+    """返回当前筛选结果在整表中的行号数组
+
+    signature（搜索词、筛选条件等）不变时直接复用上次结果；变化时重新计算，
+    并尽量让光标停留在原来选中的学生上。
+    """
+    token = get_dataset_token()
+    navigation = st.session_state.get('navigation')
+    reuse = navigation is not None and navigation['dataset'] == token and navigation['signature'] == signature
+    record_cache('filtered_positions', reuse)
+    if reuse:
+        _apply_focus(navigation['positions'])
+        return navigation['positions']
+
+    positions = np.asarray(compute_positions(), dtype=np.int64)
+    cursor = 0
+    if navigation is not None and navigation['dataset'] == token and len(navigation['positions']):
+        previous_cursor = min(st.session_state.get('selected_student_index', 0), len(navigation['positions']) - 1)
+        found = np.flatnonzero(positions == navigation['positions'][previous_cursor])
+        if len(found):
+            cursor = int(found[0])
+    st.session_state.navigation = {'dataset': token, 'signature': signature, 'positions': positions}
+    _set_cursor(cursor)
+    _apply_focus(positions)
+    return positions
+
+
+def render_student_selector(labels, positions):
+    """学生下拉框和上一个/下一个按钮，返回当前光标（筛选结果中的序号）"""
+    count = len(positions)
+    cursor = min(st.session_state.get('selected_student_index', 0), count - 1)
+    if st.session_state.get('student_selector') != cursor:
+        _set_cursor(cursor)
+
+    st.selectbox(
+        "选择学生",
+        options=range(count),
+        format_func=lambda x: labels[positions[x]],
+        key="student_selector",
+        on_change=_on_select
+    )
+
+    # 导航按钮
+    col1, col2, col3 = st.columns([1, 1, 1])
+    with col1:
+        st.button("⬅️ 上一个", disabled=cursor == 0, on_click=_move_cursor, args=(-1, count))
+    with col3:
+        st.button("下一个 ➡️", disabled=cursor >= count - 1, on_click=_move_cursor, args=(1, count))
+    return cursor
+
+
+def neighbor_positions(positions, cursor, radius=1):
+    """光标前后 radius 名学生在整表中的行号，用于后台预取"""
+    start, stop = max(0, cursor - radius), min(len(positions), cursor + radius + 1)
+    return [int(positions[i]) for i in range(start, stop) if i != cursor]
@@ -0,0 +1,233 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from display_values import CLASS_DISPLAY_COLUMNS
+from runtime_metrics import record_cache
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:  # 未安装 pypinyin 时不支持拼音搜索，其余匹配方式照常
+    lazy_pinyin = None
+
+# 学生搜索：每个数据集建立一次搜索索引，支持子串、拼音全拼/首字母（如 zs 找张三）和错别字匹配。
+# 索引以去重后的取值为单位，每个取值拆成单字和首尾补位的二元组（n-gram）建立倒排表，
+# 查询时用倒排表预筛候选取值，只对少量候选做字符串比较和编辑距离计算。
+# 最近的查询结果按搜索词缓存；逐字输入时新搜索词以上一个搜索词开头，只需在上一次命中的取值中继续筛选
+
+# 只做子串匹配的列
+EXACT_SEARCH_COLUMNS = ['学号', '分流专业', '辅导员']
+# 另外做拼音和错别字匹配的列
+FUZZY_SEARCH_COLUMNS = ['姓名', '原班级'] + CLASS_DISPLAY_COLUMNS
+# 没有直接匹配时，错别字匹配最多返回的取值个数（每个取值对应的学生全部返回）
+FUZZY_TOP_K = 10
+# n-gram 预筛后参与编辑距离计算的候选取值个数上限
+FUZZY_CANDIDATES = 200
+# 每个数据集缓存结果的搜索词个数
+SEARCH_CACHE_SIZE = 64
+
+# 取值的种类
+TEXT, PINYIN_FULL, PINYIN_INITIALS = 0, 1, 2
+# 匹配程度，数值越小排序越靠前
+MATCH_EXACT, MATCH_PREFIX, MATCH_SUBSTRING, MATCH_PINYIN, MATCH_PINYIN_PREFIX, MATCH_FUZZY = range(6)
+
+# n-gram 编码：单字为负的码位；二元组为 左 * GRAM_BASE + 右，词首补 WORD_START，词尾为 0
+WORD_START = 0x110000
+GRAM_BASE = 0x110001
+
+
+def _char_codes(strings):
+    """字符串数组转换为 (个数, 最大长度) 的 Unicode 码位矩阵，不足的位置为 0"""
+    width = max(1, max((len(s) for s in strings), default=1))
+    return np.array(strings, dtype=f'U{width}').view(np.uint32).reshape(len(strings), width).astype(np.int64)
+
+
+def _unigrams(codes):
+    rows, cols = np.nonzero(codes)
+    return -codes[rows, cols], rows
+
+
+def _bigrams(codes, padded):
+    """二元组编码和所在行；padded 时包含词首、词尾补位的二元组（用于错别字预筛）"""
+    if padded:
+        codes = np.column_stack([np.full(len(codes), WORD_START, dtype=np.int64), codes, np.zeros(len(codes), dtype=np.int64)])
+    left, right = codes[:, :-1], codes[:, 1:]
+    valid = (left != 0) & ((right != 0) | padded)
+    rows, cols = np.nonzero(valid)
+    return left[rows, cols] * GRAM_BASE + right[rows, cols], rows
+
+
+def _edit_distance(a, b, limit):
+    """a、b 的编辑距离，超过 limit 时返回 limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _pinyin_maps(keys):
+    """每个取值的拼音全拼和首字母；逐个汉字转换一次（不含汉字的取值没有拼音）"""
+    chars = sorted({char for key in keys for char in key if '\u4e00' <= char <= '\u9fff'})
+    syllables = dict(zip(chars, (lazy_pinyin(char)[0] for char in chars)))
+    full, initials = {}, {}
+    for key in keys:
+        if any(char in syllables for char in key):
+            full[key] = ''.join(syllables.get(char, char) for char in key)
+            initials[key] = ''.join(syllables.get(char, char)[:1] for char in key)
+    return full, initials
+
+
+class StudentSearchIndex:
+    """一个数据集的搜索索引，search(term) 返回按匹配程度排序的行号数组"""
+
+    def __init__(self, df):
+        pairs = []
+        for col in EXACT_SEARCH_COLUMNS + FUZZY_SEARCH_COLUMNS:
+            if col not in df.columns:
+                continue
+            series = df[col]
+            values = series.astype(str).str.strip().str.lower()
+            present = (series.notna() & (values != '')).to_numpy()
+            pairs.append(pd.DataFrame({
+                'key': values.to_numpy()[present],
+                'kind': TEXT,
+                'fuzzy': col in FUZZY_SEARCH_COLUMNS,
+                'row': np.flatnonzero(present)
+            }))
+        pairs = pd.concat(pairs, ignore_index=True) if pairs else pd.DataFrame({'key': [], 'kind': [], 'fuzzy': [], 'row': []})
+        if lazy_pinyin is not None:
+            fuzzy_pairs = pairs[pairs['fuzzy'].astype(bool)]
+            full, initials = _pinyin_maps(fuzzy_pairs['key'].unique())
+            for kind, mapping in ((PINYIN_FULL, full), (PINYIN_INITIALS, initials)):
+                keys = fuzzy_pairs['key'].map(mapping)
+                present = keys.notna().to_numpy()
+                pairs = pd.concat([pairs, pd.DataFrame({
+                    'key': keys.to_numpy()[present], 'kind': kind, 'fuzzy': True, 'row': fuzzy_pairs['row'].to_numpy()[present]
+                })], ignore_index=True)
+
+        # 取值按 (种类, 字符串) 去重；同一取值出现在多个列中时，任一列允许错别字匹配即可
+        key_codes, _ = pd.factorize(pairs['kind'].astype(str) + '\x00' + pairs['key'].astype(str))
+        grouped = pairs.groupby(key_codes, sort=True)
+        self.keys = grouped['key'].first().to_numpy(dtype=object)
+        self.kinds = grouped['kind'].first().to_numpy(dtype=np.int8)
+        self.fuzzy = grouped['fuzzy'].max().to_numpy(dtype=bool)
+        self.lengths = np.fromiter((len(key) for key in self.keys), dtype=np.int64, count=len(self.keys))
+
+        # 取值 -> 行号（CSR：key_rows[key_offsets[k]:key_offsets[k + 1]]）
+        num_keys, num_rows = len(self.keys), max(len(df), 1)
+        combined = np.unique(key_codes.astype(np.int64) * num_rows + pairs['row'].to_numpy(dtype=np.int64))
+        self.key_rows = combined % num_rows
+        self.key_offsets = np.searchsorted(combined // num_rows, np.arange(num_keys + 1))
+
+        # n-gram -> 取值（倒排表，同一取值中重复的 n-gram 只记一次）；补位的二元组已包含相邻二元组
+        codes = _char_codes(list(self.keys)) if num_keys else np.zeros((0, 1), dtype=np.int64)
+        gram_parts = [_unigrams(codes), _bigrams(codes, padded=True)]
+        grams = np.concatenate([gram for gram, _ in gram_parts])
+        gram_keys = np.concatenate([keys for _, keys in gram_parts])
+        self.gram_values, gram_ids = np.unique(grams, return_inverse=True)
+        combined = np.unique(gram_ids.astype(np.int64) * max(num_keys, 1) + gram_keys)
+        self.posting_keys = combined % max(num_keys, 1)
+        self.posting_offsets = np.searchsorted(combined // max(num_keys, 1), np.arange(len(self.gram_values) + 1))
+
+        # 搜索词 -> (直接命中的取值编号, 排好序的行号)
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _postings(self, grams):
+        """每个 n-gram 对应取值编号的拼接（n-gram 各不相同时，某取值出现的次数即它含有的 n-gram 个数）"""
+        ids = np.searchsorted(self.gram_values, grams)
+        ids = ids[(ids < len(self.gram_values)) & (self.gram_values[np.minimum(ids, len(self.gram_values) - 1)] == grams)]
+        if not len(ids):
+            return np.array([], dtype=np.int64)
+        return np.concatenate([self.posting_keys[self.posting_offsets[i]:self.posting_offsets[i + 1]] for i in ids])
+
+    def _gram_candidates(self, term, codes):
+        """含有搜索词全部单字（一个字时）或全部相邻二元组的取值编号"""
+        grams = np.unique(_unigrams(codes)[0] if len(term) == 1 else _bigrams(codes, padded=False)[0])
+        counts = np.bincount(self._postings(grams), minlength=len(self.keys))
+        return np.flatnonzero(counts == len(grams))
+
+    def _direct_matches(self, term, candidates):
+        # 逐个确认候选取值与搜索词的子串、前缀关系
+        matches = []
+        for key_id in candidates:
+            key, pinyin = self.keys[key_id], self.kinds[key_id] != TEXT
+            if key == term:
+                matches.append((key_id, MATCH_PINYIN if pinyin else MATCH_EXACT, 0))
+            elif key.startswith(term):
+                matches.append((key_id, MATCH_PINYIN_PREFIX if pinyin else MATCH_PREFIX, 0))
+            elif not pinyin and term in key:
+                matches.append((key_id, MATCH_SUBSTRING, 0))
+        return matches
+
+    def _narrowing_base(self, term):
+        """缓存中以 term 为开头的最长搜索词直接命中的取值编号（term 的直接命中一定在其中），没有时返回 None"""
+        for end in range(len(term) - 1, 0, -1):
+            cached = self._results.get(term[:end])
+            if cached is not None:
+                return cached[0]
+        return None
+
+    def _fuzzy_matches(self, term, codes):
+        # 编辑距离上限：短词允许错 1 个字，长词（如拼音全拼、班级）允许错 2 个
+        limit = 1 if len(term) <= 4 else 2
+        counts = np.bincount(self._postings(np.unique(_bigrams(codes, padded=True)[0])), minlength=len(self.keys))
+        eligible = (counts > 0) & self.fuzzy & (self.kinds != PINYIN_INITIALS) & (np.abs(self.lengths - len(term)) <= limit)
+        candidates = np.flatnonzero(eligible)
+        if len(candidates) > FUZZY_CANDIDATES:
+            candidates = candidates[np.argpartition(-counts[candidates], FUZZY_CANDIDATES)[:FUZZY_CANDIDATES]]
+        scored = [(_edit_distance(term, self.keys[key_id], limit), -counts[key_id], key_id) for key_id in candidates]
+        scored = sorted(item for item in scored if item[0] <= limit)[:FUZZY_TOP_K]
+        return [(key_id, MATCH_FUZZY, distance) for distance, _, key_id in scored]
+
+    def search(self, term):
+        """搜索姓名、学号、班级、分流专业或辅导员中含有 term 的学生（不区分大小写），以及姓名、班级的拼音前缀
+
+        结果按 完全相同 → 开头相同 → 包含 → 拼音相同 → 拼音开头相同 排序，同一程度内按行号；
+        没有任何直接匹配时改为错别字匹配，返回编辑距离最小的 FUZZY_TOP_K 个取值对应的学生。
+        结果按搜索词缓存（最近 SEARCH_CACHE_SIZE 个），返回的数组只读。
+        """
+        term = term.strip().lower()
+        if not term or not len(self.keys):
+            return np.array([], dtype=np.int64)
+        with self._lock:
+            cached = self._results.get(term)
+            if cached is not None:
+                self._results.move_to_end(term)
+            base = self._narrowing_base(term) if cached is None else None
+        record_cache('search_results', cached is not None)
+        if cached is not None:
+            return cached[1]
+
+        codes = _char_codes([term])
+        matches = self._direct_matches(term, self._gram_candidates(term, codes) if base is None else base)
+        direct_keys = np.array([key_id for key_id, _, _ in matches], dtype=np.int64)
+        if not matches and len(term) >= 2:
+            matches = self._fuzzy_matches(term, codes)
+        positions = self._rank_rows(matches)
+        positions.flags.writeable = False  # 缓存的结果由多次运行共用，不能原地修改
+        with self._lock:
+            self._results[term] = (direct_keys, positions)
+            while len(self._results) > SEARCH_CACHE_SIZE:
+                self._results.popitem(last=False)
+        return positions
+
+    def _rank_rows(self, matches):
+        """命中的取值展开为行号，按 (匹配程度, 编辑距离, 行号) 排序，每名学生只保留一次"""
+        if not matches:
+            return np.array([], dtype=np.int64)
+        key_ids, tiers, distances = (np.array(values, dtype=np.int64) for values in zip(*matches))
+        sizes = self.key_offsets[key_ids + 1] - self.key_offsets[key_ids]
+        rows = np.concatenate([self.key_rows[self.key_offsets[k]:self.key_offsets[k + 1]] for k in key_ids])
+        order = np.lexsort((rows, np.repeat(distances, sizes), np.repeat(tiers, sizes)))
+        rows = rows[order]
+        # 同一学生有多个取值命中时保留排序最靠前的一次
+        _, first = np.unique(rows, return_index=True)
+        return rows[np.sort(first)]